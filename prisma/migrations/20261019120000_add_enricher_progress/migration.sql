@@ -0,0 +1,18 @@
+-- CreateTable
+CREATE TABLE "enricher_progress" (
+    "source" TEXT NOT NULL,
+    "source_id" TEXT NOT NULL,
+    "created_at" TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "enricher_progress_pkey" PRIMARY KEY ("source","source_id")
+);
+
+-- CreateTable
+CREATE TABLE "enricher_checkpoints" (
+    "source" TEXT NOT NULL,
+    "checkpoint" JSONB NOT NULL DEFAULT '{}',
+    "stats" JSONB NOT NULL DEFAULT '{}',
+    "last_run" TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "enricher_checkpoints_pkey" PRIMARY KEY ("source")
+);
@@ -0,0 +1,16 @@
+-- CreateTable
+CREATE TABLE "enricher_work_units" (
+    "source" TEXT NOT NULL,
+    "unit" TEXT NOT NULL,
+    "seq" INTEGER NOT NULL,
+    "status" TEXT NOT NULL DEFAULT 'pending',
+    "worker" TEXT,
+    "leased_until" TIMESTAMPTZ,
+    "attempts" INTEGER NOT NULL DEFAULT 0,
+    "done_at" TIMESTAMPTZ,
+
+    CONSTRAINT "enricher_work_units_pkey" PRIMARY KEY ("source","unit")
+);
+
+-- CreateIndex
+CREATE INDEX "enricher_work_units_source_status_seq_idx" ON "enricher_work_units"("source", "status", "seq");
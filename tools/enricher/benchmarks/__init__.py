@@ -0,0 +1 @@
+"""Standalone benchmarks — run with `python -m tools.enricher.benchmarks.<name>`."""
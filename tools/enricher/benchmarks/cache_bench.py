@@ -0,0 +1,110 @@
+"""Cache store benchmark — file-per-URL JSON vs packed SQLite.
+
+    python -m tools.enricher.benchmarks.cache_bench --entries 5000
+
+Writes synthetic boroumand-sized story pages into each store in a temp
+directory and reports write/read throughput, size on disk and file count.
+"Reopened" reads use a fresh store instance in random URL order; the OS
+page cache is still warm, so real cold reads are slower for both.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from ..utils.cache import BACKENDS, open_store
+
+
+def make_page(i: int, size_kb: int) -> str:
+    """HTML roughly like a boroumand story page (mixed Latin/Farsi)."""
+    rng = random.Random(i)
+    words = ["memorial", "story", "Tehran", "protest", "شهر", "آزادی", "علی", "<p>"]
+    parts = [f"<html><head><title>Story {i}</title></head><body>"]
+    while sum(len(p) for p in parts) < size_kb * 1024:
+        parts.append(" ".join(rng.choice(words) for _ in range(40)))
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+def dir_size(path: str) -> tuple[int, int]:
+    total = files = 0
+    for entry in os.scandir(path):
+        if entry.is_file():
+            total += entry.stat().st_size
+            files += 1
+    return total, files
+
+
+def bench(backend: str, pages: list[tuple[str, str]], root: str) -> dict:
+    cache_dir = os.path.join(root, backend)
+    store = open_store(cache_dir, backend)
+
+    t0 = time.perf_counter()
+    for url, body in pages:
+        store.put(url, body)
+    write = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for url, _ in pages:
+        store.get(url)
+    read = time.perf_counter() - t0
+    store.close()
+
+    order = [url for url, _ in pages]
+    random.Random(0).shuffle(order)
+    store = open_store(cache_dir, backend)
+    t0 = time.perf_counter()
+    for url in order:
+        store.get(url)
+    reopened = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    st = store.stats()
+    stats_time = time.perf_counter() - t0
+    store.close()
+
+    size, files = dir_size(cache_dir)
+    n = len(pages)
+    return {
+        "backend": backend,
+        "write/s": n / write,
+        "read/s": n / read,
+        "reopened read/s": n / reopened,
+        "stats (s)": stats_time,
+        "disk MB": size / 1e6,
+        "files": files,
+        "entries": st.entries,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--page-kb", type=int, default=30)
+    args = parser.parse_args()
+
+    pages = [
+        (f"https://www.iranrights.org/memorial/story/{i}/x", make_page(i, args.page_kb))
+        for i in range(args.entries)
+    ]
+    raw = sum(len(b.encode()) for _, b in pages) / 1e6
+    print(f"{args.entries} pages, {raw:.1f} MB of HTML\n")
+
+    with tempfile.TemporaryDirectory() as root:
+        rows = [bench(backend, pages, root) for backend in reversed(BACKENDS)]
+
+    keys = list(rows[0])
+    print("".join(f"{k:>17s}" for k in keys))
+    for row in rows:
+        print("".join(
+            f"{v:>17,.1f}" if isinstance(v, float) else f"{v:>17}"
+            for v in row.values()
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Fetch-layer benchmark — plugin throughput against the local stand-in.
+
+    python -m tools.enricher.benchmarks.fetch_bench --victims 500 \\
+        --latency 0.05 --error-rate 0.05 --throttle-rate 0.02
+
+Runs each plugin's fetch_all against benchmarks.standin (no real sites)
+with the given per-host limits and reports victims/s, requests by status,
+retries and time spent in backoff and limiter waits. Use it to compare
+concurrency and rate-limiter changes; ``--rate`` etc. replace each
+plugin's politeness limits, so the defaults measure the client, not the
+production rate limits.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import tempfile
+
+from ..utils import http
+from ..utils.ratelimit import reset_limiters
+from .standin import SOURCES, StandIn, run_plugin
+
+
+async def bench(args: argparse.Namespace) -> list[dict]:
+    config = {
+        "requests_per_second": args.rate,
+        "burst": args.burst,
+        "max_in_flight": args.max_in_flight,
+    }
+    rows = []
+    async with StandIn(
+        victims=args.victims,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+    ) as site:
+        for name in args.source or SOURCES:
+            reset_limiters()
+            http.clear_memory_cache()
+            with tempfile.TemporaryDirectory() as state_dir:
+                count, metrics = await run_plugin(
+                    site, name, state_dir,
+                    cache_dir=state_dir if args.cache else "",
+                    config=config,
+                )
+            hosts = metrics.hosts.values()
+            statuses: dict[str, int] = {}
+            for hs in hosts:
+                for status, n in hs.statuses.items():
+                    statuses[status] = statuses.get(status, 0) + n
+            rows.append({
+                "source": name,
+                "victims": count,
+                "seconds": metrics.elapsed,
+                "victims/s": count / metrics.elapsed if metrics.elapsed else 0.0,
+                "requests": sum(hs.requests for hs in hosts),
+                "retries": sum(hs.retries for hs in hosts),
+                "backoff (s)": sum(hs.backoff_seconds for hs in hosts),
+                "wait (s)": sum(hs.wait_seconds for hs in hosts),
+                "statuses": " ".join(f"{k}:{v}" for k, v in sorted(statuses.items())),
+            })
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", "-s", action="append", choices=SOURCES)
+    parser.add_argument("--victims", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=None)
+    parser.add_argument("--rate", type=float, default=200.0)
+    parser.add_argument("--burst", type=int, default=20)
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument(
+        "--backoff", type=float, default=0.05,
+        help="Retry backoff base in seconds (production: 5)",
+    )
+    parser.add_argument(
+        "--cache", action="store_true", help="Write the HTTP disk cache too",
+    )
+    args = parser.parse_args()
+    http.BACKOFF_BASE = args.backoff
+
+    rows = asyncio.run(bench(args))
+    keys = list(rows[0])
+    print("".join(f"{k:>15s}" for k in keys))
+    for row in rows:
+        print("".join(
+            f"{v:>15,.2f}" if isinstance(v, float) else f"{v:>15}"
+            for v in row.values()
+        ))
+
+
+if __name__ == "__main__":
+    main()
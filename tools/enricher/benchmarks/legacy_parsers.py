@@ -0,0 +1,113 @@
+"""The HTML extractors as they were before the single-scan rewrite.
+
+Kept as the baseline for parse_bench and as the reference output for
+tests/test_parse_equivalence.py. Do not use them in the pipeline.
+
+One intended difference: the old Telegram ``_strip_html`` decodes only
+``&amp; &lt; &gt; &quot; &#39;``; the current one decodes every HTML entity.
+"""
+
+from __future__ import annotations
+
+import re
+
+# ─── boroumand ──────────────────────────────────────────────────────────────
+
+
+def parse_detail_en(html: str) -> dict:
+    """Parse English detail page fields (one search per field)."""
+    data = {}
+
+    h1 = re.search(r"<h1 class='page-top'>([^<]+)</h1>", html)
+    if h1:
+        data["name"] = h1.group(1).strip()
+
+    photo = re.search(r'<img[^>]+src="(/actorphotos/[^"]+)"', html)
+    if photo:
+        data["photo_url"] = photo.group(1)
+
+    field_map = {
+        "Age": "age",
+        "Religion": "religion",
+        "Date of Killing": "date_of_killing",
+        "Location of Killing": "location",
+        "Mode of Killing": "mode_of_killing",
+        "Date of Birth": "date_of_birth",
+        "Place of Birth": "place_of_birth",
+        "Occupation": "occupation",
+    }
+
+    for m in re.finditer(r"<em>([^<]+)</em>\s*([^<]+)", html):
+        label = m.group(1).strip().rstrip(":")
+        value = m.group(2).strip()
+        if value and value != "---" and label in field_map:
+            data[field_map[label]] = value
+
+    narr = re.search(
+        r"<h2[^>]*>About this Case</h2>\s*(.*?)(?=<h2|<footer|<div\s+id=)",
+        html,
+        re.DOTALL,
+    )
+    if narr:
+        text = re.sub(r"<[^>]+>", " ", narr.group(1))
+        text = re.sub(r"&\w+;", " ", text)
+        text = re.sub(r"\s+", " ", text).strip()
+        text = re.sub(
+            r"Correct/?\s*Complete This Entry\s*[❯>]?\s*", "", text
+        ).strip()
+        text = re.sub(
+            r"The story of .+?is not complete\..+?We appreciate your support\.?\s*",
+            "",
+            text,
+            flags=re.DOTALL,
+        ).strip()
+        if len(text) > 50:
+            data["narrative"] = text[:5000]
+
+    return data
+
+
+# ─── telegram_rtn ───────────────────────────────────────────────────────────
+
+_TEXT_RE = re.compile(
+    r'tgme_widget_message_text[^>]*>(.*?)</div>',
+    re.DOTALL,
+)
+
+_PHOTO_RE = re.compile(
+    r"background-image:url\('([^']+)'\)"
+)
+
+
+def _strip_html(text: str) -> str:
+    """Strip HTML tags and decode the five basic entities."""
+    text = re.sub(r'<br\s*/?>', '\n', text)
+    text = re.sub(r'<[^>]+>', '', text)
+    text = text.replace('&amp;', '&').replace('&lt;', '<').replace('&gt;', '>')
+    text = text.replace('&quot;', '"').replace('&#39;', "'")
+    return text.strip()
+
+
+def extract_posts(html: str) -> list[dict]:
+    """Parse Telegram channel HTML page into post dicts (regex per post)."""
+    posts = []
+
+    parts = html.split('data-post="RememberTheirNames/')
+    for part in parts[1:]:  # skip first (before first post)
+        num_match = re.match(r'(\d+)"', part)
+        if not num_match:
+            continue
+
+        text_match = _TEXT_RE.search(part)
+        text = _strip_html(text_match.group(1)) if text_match else ""
+
+        photo_match = _PHOTO_RE.search(part)
+        photo_url = photo_match.group(1) if photo_match else None
+
+        posts.append({
+            "post_number": int(num_match.group(1)),
+            "text": text,
+            "photo_url": photo_url,
+        })
+
+    return posts
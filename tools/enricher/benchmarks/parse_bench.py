@@ -0,0 +1,139 @@
+"""Parser benchmark — pages/sec of the HTML extractors.
+
+    python -m tools.enricher.benchmarks.parse_bench --cache-root state/cache
+
+Recorded pages are read from the HTTP caches under ``--cache-root``
+(boroumand EN story pages, Telegram channel pages). Sources without
+recorded pages fall back to the stand-in server's pages, wrapped in
+``--pad-kb`` of page chrome (navigation, scripts) to approach real sizes.
+Each parser and its pre-rewrite version (legacy_parsers) run over the
+same pages ``--rounds`` times; the best round counts. Pages on which the
+two return different output are counted under "diff".
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import time
+from typing import Callable
+
+from ..sources.boroumand import parse_detail_en
+from ..sources.telegram_rtn import extract_posts
+from ..utils.cache import cache_dirs, existing_stores
+from . import legacy_parsers
+from .standin import StandIn
+
+# (name, parser, legacy parser, cache source, URL pattern of its pages)
+PARSERS: list[tuple[str, Callable, Callable, str, str]] = [
+    ("boroumand.parse_detail_en", parse_detail_en,
+     legacy_parsers.parse_detail_en, "boroumand",
+     r"iranrights\.org/memorial/story/"),
+    ("telegram_rtn.extract_posts", extract_posts,
+     legacy_parsers.extract_posts, "telegram_rtn",
+     r"t\.me/s/RememberTheirNames"),
+]
+
+
+def recorded_pages(cache_root: str, source: str, pattern: str) -> list[str]:
+    """Cached response bodies of ``source`` whose URL matches ``pattern``."""
+    rx = re.compile(pattern)
+    pages = []
+    for name, cache_dir in cache_dirs(cache_root):
+        if name != source:
+            continue
+        for store in existing_stores(cache_dir):
+            try:
+                pages += [e["body"] for e in store.entries() if rx.search(e["url"])]
+            finally:
+                store.close()
+    return pages
+
+
+def chrome(kb: int, seed: int) -> str:
+    """Navigation lists and inline scripts, about ``kb`` KiB of markup."""
+    rng = random.Random(seed)
+    parts = ['<div id="nav"><ul class="menu">']
+    while sum(len(p) for p in parts) < kb * 1024:
+        n = rng.randrange(1000)
+        parts.append(
+            f'<li class="leaf item-{n}"><a href="/memorial/browse/{n}" '
+            f'title="Browse {n}">Entry &amp; list {n}</a></li>'
+        )
+        if n % 25 == 0:
+            parts.append(f"<script>var cfg{n} = {{'a': {n}, 'b': '<p>'}};</script>")
+    parts.append("</ul></div>")
+    return "\n".join(parts)
+
+
+def standin_pages(source: str, count: int, pad_kb: int) -> list[str]:
+    site = StandIn(victims=max(count * 20, 100))
+    if source == "boroumand":
+        urls = [
+            f"https://www.iranrights.org/memorial/story/{i}/example-{i}"
+            for i in range(1, count + 1)
+        ]
+    else:
+        urls = [
+            f"https://t.me/s/RememberTheirNames?before={21 + 20 * i}"
+            for i in range(count)
+        ]
+    half = pad_kb // 2
+    return [
+        f"<html><body>{chrome(half, i)}{site.render(url)}{chrome(half, -i)}</body></html>"
+        for i, url in enumerate(urls)
+    ]
+
+
+def bench(parser: Callable, pages: list[str], rounds: int) -> dict:
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for html in pages:
+            parser(html)
+        best = min(best, time.perf_counter() - t0)
+    size = sum(len(p) for p in pages)
+    return {
+        "pages": len(pages),
+        "avg KB": size / len(pages) / 1024,
+        "pages/s": len(pages) / best,
+        "MB/s": size / best / 1e6,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--cache-root", default="state/cache",
+        help="Directory with the per-source HTTP caches (recorded pages)",
+    )
+    parser.add_argument(
+        "--pages", type=int, default=200,
+        help="Stand-in pages per parser when nothing is recorded",
+    )
+    parser.add_argument(
+        "--pad-kb", type=int, default=40,
+        help="Chrome markup around each stand-in page",
+    )
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'parser':<35s}{'pages':>8s}{'origin':>10s}{'avg KB':>10s}"
+          f"{'pages/s':>12s}{'MB/s':>10s}{'diff':>6s}")
+    for name, func, legacy, source, pattern in PARSERS:
+        pages = recorded_pages(args.cache_root, source, pattern)
+        origin = "recorded"
+        if not pages:
+            pages = standin_pages(source, args.pages, args.pad_kb)
+            origin = "stand-in"
+        diff = sum(func(html) != legacy(html) for html in pages)
+        for label, parser in ((f"{name} (old)", legacy), (name, func)):
+            row = bench(parser, pages, args.rounds)
+            print(f"{label:<35s}{row['pages']:>8d}{origin:>10s}"
+                  f"{row['avg KB']:>10.1f}{row['pages/s']:>12,.0f}"
+                  f"{row['MB/s']:>10.1f}{diff:>6d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+"""Local stand-in for the source sites — an aiohttp server with fault injection.
+
+Serves synthetic boroumand, Telegram, iranmonitor, iranrevolution and
+iranvictims endpoints in the formats the plugins parse, with optional
+latency and random 429/503 responses:
+
+    async with StandIn(victims=500, latency=0.02, error_rate=0.05) as site:
+        session = site.client(http_session)  # pass to plugin.setup()
+
+``site.client`` wraps a ClientSession so that requests for the real URLs
+go to ``http://127.0.0.1:<port>/<host>/<path>`` instead. Limiters and
+caches still key on the real URLs.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+import json
+import random
+from collections import Counter
+from typing import Any, Iterable, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from multidict import MultiDict
+
+from ..sources import get_plugin
+from ..utils.http import create_session
+from ..utils.metrics import RunMetrics, use_metrics
+from ..utils.progress import ProgressTracker
+
+BOROUMAND_PAGE_SIZE = 10
+TELEGRAM_PAGE_SIZE = 20
+
+_FA_DIGITS = str.maketrans("0123456789", "۰۱۲۳۴۵۶۷۸۹")
+_FA_NAMES = ["علی", "سارا", "محمد", "نیکا", "رضا", "مهسا", "حسین", "زهرا"]
+_EN_NAMES = ["Ali", "Sara", "Mohammad", "Nika", "Reza", "Mahsa", "Hossein", "Zahra"]
+_CITIES = [("Tehran", "تهران"), ("Zahedan", "زاهدان"), ("Sanandaj", "سنندج")]
+
+
+def victim(i: int) -> dict[str, Any]:
+    """Deterministic synthetic victim ``i`` (1-based)."""
+    city_en, city_fa = _CITIES[i % len(_CITIES)]
+    return {
+        "id": i,
+        "name_en": f"{_EN_NAMES[i % len(_EN_NAMES)]} Example{i}",
+        "name_fa": f"{_FA_NAMES[i % len(_FA_NAMES)]} نمونه{str(i).translate(_FA_DIGITS)}",
+        "age": 16 + i % 40,
+        "day": 1 + i % 28,
+        "city_en": city_en,
+        "city_fa": city_fa,
+    }
+
+
+class StandIn:
+    """Stand-in server for all source sites (use as an async context manager).
+
+    Args:
+        victims: Records each source serves.
+        latency: Seconds added to every response.
+        jitter: Up to this many seconds added on top, at random (so
+            concurrent requests finish out of order).
+        error_rate: Share of requests answered with 503.
+        throttle_rate: Share of requests answered with 429.
+        retry_after: Retry-After header (seconds) sent with 429s, if any.
+        renamed: Victim ids whose boroumand card shows a changed name.
+        seed: Seed for the fault schedule.
+    """
+
+    def __init__(
+        self,
+        victims: int = 100,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: Optional[int] = None,
+        renamed: Iterable[int] = (),
+        seed: int = 0,
+    ):
+        self.victims = victims
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.renamed = set(renamed)
+        self._rng = random.Random(seed)
+        # (host, status) → count
+        self.requests: Counter[tuple[str, int]] = Counter()
+        # host → requests being served now / most at any one time
+        self.in_flight: Counter[str] = Counter()
+        self.peak_in_flight: Counter[str] = Counter()
+        self._server: Optional[TestServer] = None
+        self._routes = {
+            "www.iranrights.org": self._boroumand,
+            "t.me": self._telegram,
+            "www.iranmonitor.org": self._iranmonitor,
+            "umkenikezuigjqspgaub.supabase.co": self._iranrevolution,
+            "iranvictims.com": self._iranvictims,
+        }
+
+    async def __aenter__(self) -> "StandIn":
+        app = web.Application()
+        app.router.add_get("/{host}/{path:.*}", self._handle)
+        self._server = TestServer(app, host="127.0.0.1")
+        await self._server.start_server()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if self._server is not None:
+            await self._server.close()
+            self._server = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.port}"
+
+    def client(self, session: aiohttp.ClientSession) -> "StandInSession":
+        return StandInSession(session, self.base_url)
+
+    def count(self, host: Optional[str] = None, status: Optional[int] = None) -> int:
+        """Requests served, optionally only for ``host`` and/or ``status``."""
+        return sum(
+            n for (h, st), n in self.requests.items()
+            if (host is None or h == host) and (status is None or st == status)
+        )
+
+    def render(self, url: str) -> str:
+        """Body the stand-in serves for ``url`` (no server, no faults)."""
+        parts = urlsplit(url)
+        handler = self._routes[parts.hostname]
+        return handler(parts.path or "/", MultiDict(parse_qsl(parts.query))).text
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        host = request.match_info["host"]
+        path = "/" + request.match_info["path"]
+        self.in_flight[host] += 1
+        self.peak_in_flight[host] = max(
+            self.peak_in_flight[host], self.in_flight[host]
+        )
+        try:
+            delay = self.latency
+            if self.jitter:
+                delay += self._rng.random() * self.jitter
+            if delay:
+                await asyncio.sleep(delay)
+        finally:
+            self.in_flight[host] -= 1
+        handler = self._routes.get(host)
+        roll = self._rng.random()
+        if handler is None:
+            response = web.Response(status=404)
+        elif roll < self.throttle_rate:
+            headers = {}
+            if self.retry_after is not None:
+                headers["Retry-After"] = str(self.retry_after)
+            response = web.Response(status=429, headers=headers)
+        elif roll < self.throttle_rate + self.error_rate:
+            response = web.Response(status=503)
+        else:
+            response = handler(path, request.query)
+        self.requests[(host, response.status)] += 1
+        return response
+
+    # ─── Sites ──────────────────────────────────────────────────────────────
+
+    def _ids(self, start: int, stop: int) -> range:
+        return range(max(start, 1), min(stop, self.victims + 1))
+
+    def _boroumand(self, path: str, query) -> web.Response:
+        parts = path.strip("/").split("/")
+        if parts[:3] == ["memorial", "browse", "date"]:
+            page = int(parts[3])
+            first = (page - 1) * BOROUMAND_PAGE_SIZE + 1
+            blocks = []
+            for i in self._ids(first, first + BOROUMAND_PAGE_SIZE):
+                v = victim(i)
+                if i in self.renamed:
+                    v["name_en"] += " (updated)"
+                blocks.append(
+                    "<div class='memorial-list clearfix'>"
+                    f'<img src="/actorphotos/{i}.jpg">'
+                    f"<a href='/memorial/story/{i}/example-{i}'>{v['name_en']}</a>"
+                    "<strong>Mode of Killing</strong>: Shooting;</div>"
+                )
+            return _html("<html><body>" + "\n".join(blocks) + "</body></html>")
+        lang_fa = parts[0] == "fa"
+        if lang_fa:
+            parts = parts[1:]
+        if parts[:2] == ["memorial", "story"]:
+            v = victim(int(parts[2]))
+            if lang_fa:
+                return _html(f"<h1 class='page-top'>{v['name_fa']}</h1>")
+            return _html(
+                f"<h1 class='page-top'>{v['name_en']}</h1>"
+                f'<img class="photo" src="/actorphotos/{v["id"]}.jpg">'
+                f"<p><em>Age:</em> {v['age']}</p>"
+                f"<p><em>Date of Killing:</em> December {v['day']}, 2022</p>"
+                f"<p><em>Location of Killing:</em> {v['city_en']}</p>"
+                "<h2>About this Case</h2>"
+                f"<p>{v['name_en']} was killed during the protests in "
+                f"{v['city_en']}. {'Witnesses described the events. ' * 3}</p>"
+                "<footer></footer>"
+            )
+        return web.Response(status=404)
+
+    def _telegram(self, path: str, query) -> web.Response:
+        if path != "/s/RememberTheirNames":
+            return web.Response(status=404)
+        if "after" in query:
+            after = int(query["after"])
+            numbers = list(self._ids(after + 1, after + 1 + TELEGRAM_PAGE_SIZE))
+        else:
+            before = int(query.get("before", self.victims + 1))
+            numbers = list(self._ids(before - TELEGRAM_PAGE_SIZE, before))
+        posts = []
+        for n in numbers:
+            v = victim(n)
+            text = (
+                f"{str(n).translate(_FA_DIGITS)}. {v['name_fa']} "
+                f"{str(v['age']).translate(_FA_DIGITS)} ساله<br/>"
+                f"{str(v['day']).translate(_FA_DIGITS)} دی ۱۴۰۱ {v['city_fa']}"
+            )
+            posts.append(
+                '<div class="tgme_widget_message_wrap js-widget_message_wrap">'
+                '<div class="tgme_widget_message js-widget_message" '
+                f'data-post="RememberTheirNames/{n}">'
+                '<div class="tgme_widget_message_bubble">'
+                f'<a class="tgme_widget_message_photo_wrap" style="background-image:url(\'https://cdn.example/{n}.jpg\')"></a>'
+                f'<div class="tgme_widget_message_text js-message_text" dir="auto">{text}</div>'
+                "</div></div></div>"
+            )
+        head = ""
+        if numbers and numbers[0] > 1:
+            head = f'<link rel="prev" href="/s/RememberTheirNames?before={numbers[0]}">'
+        if numbers and numbers[-1] < self.victims:
+            head += f'<link rel="next" href="/s/RememberTheirNames?after={numbers[-1]}">'
+        return _html(f"<html><head>{head}</head><body>{''.join(posts)}</body></html>")
+
+    def _iranmonitor(self, path: str, query) -> web.Response:
+        if path != "/api/memorial":
+            return web.Response(status=404)
+        page = int(query.get("page", 1))
+        size = int(query.get("pageSize", 50))
+        first = (page - 1) * size + 1
+        data = []
+        for i in self._ids(first, first + size):
+            v = victim(i)
+            data.append({
+                "id": i,
+                "name_english": v["name_en"],
+                "name_persian": v["name_fa"],
+                "photo_url": f"https://cdn.example/im/{i}.jpg",
+                "date_of_death": f"2022-12-{v['day']:02d}",
+                "age": v["age"],
+                "city_english": v["city_en"],
+                "province_english": v["city_en"],
+            })
+        return _json({"total": self.victims, "data": data})
+
+    def _iranrevolution(self, path: str, query) -> web.Response:
+        """PostgREST subset: id/date filters, id or date order, offset/limit.
+
+        Content-Range always carries the exact total (as with
+        ``Prefer: count=exact``).
+        """
+        if path != "/rest/v1/memorials":
+            return web.Response(status=404)
+        rows = []
+        for i in self._ids(1, self.victims + 1):
+            v = victim(i)
+            rows.append({
+                "id": f"rev-{i}",
+                "name": v["name_en"],
+                "name_fa": v["name_fa"],
+                "date": f"2022-12-{v['day']:02d}",
+                "city": v["city_en"],
+                "bio": f"{v['name_en']} from {v['city_en']}.",
+                "media": {"photo": f"https://cdn.example/rev/{i}.jpg"},
+            })
+        for column in ("id", "date"):
+            for condition in query.getall(column, []):
+                op, _, value = condition.partition(".")
+                test = _POSTGREST_OPS[op]
+                rows = [r for r in rows if test(r[column], value)]
+        if query.get("order") == "id.asc":
+            rows.sort(key=lambda r: r["id"])
+        else:
+            rows.sort(key=lambda r: r["date"], reverse=True)
+        total = len(rows)
+        offset = int(query.get("offset", 0))
+        rows = rows[offset:offset + int(query.get("limit", 1000))]
+        if query.get("select") == "id":
+            rows = [{"id": r["id"]} for r in rows]
+        response = _json(rows)
+        response.headers["Content-Range"] = (
+            f"{offset}-{offset + len(rows) - 1}/{total}" if rows else f"*/{total}"
+        )
+        return response
+
+    def _iranvictims(self, path: str, query) -> web.Response:
+        if path != "/victims.csv":
+            return web.Response(status=404)
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow([
+            "Card ID", "English Name", "Persian Name", "Age",
+            "Location of Death", "Date of Death", "Status", "Source URLs", "Notes",
+        ])
+        for i in self._ids(1, self.victims + 1):
+            v = victim(i)
+            writer.writerow([
+                i, v["name_en"], v["name_fa"], v["age"], v["city_en"],
+                f"2022-12-{v['day']:02d}", "killed",
+                f"https://news.example/{i}", f"Killed in {v['city_en']},\nper reports",
+            ])
+        return web.Response(
+            text=out.getvalue(), content_type="text/csv", charset="utf-8"
+        )
+
+
+class StandInSession:
+    """ClientSession proxy that sends every GET to the stand-in server."""
+
+    def __init__(self, session: aiohttp.ClientSession, base_url: str):
+        self._session = session
+        self._base_url = base_url
+
+    def rewrite(self, url: str) -> str:
+        parts = urlsplit(url)
+        target = f"{self._base_url}/{parts.hostname}{parts.path or '/'}"
+        return f"{target}?{parts.query}" if parts.query else target
+
+    def get(self, url: str, **kwargs):
+        return self._session.get(self.rewrite(url), **kwargs)
+
+    def head(self, url: str, **kwargs):
+        return self._session.head(self.rewrite(url), **kwargs)
+
+
+SOURCES = ["boroumand", "telegram_rtn", "iranmonitor", "iranrevolution", "iranvictims"]
+
+
+async def run_plugin(
+    site: StandIn,
+    name: str,
+    state_dir: str,
+    cache_dir: str = "",
+    config: Optional[dict] = None,
+    max_connections: int = 10,
+    collect: Optional[list] = None,
+) -> tuple[int, RunMetrics]:
+    """Run one plugin's fetch_all against ``site``; (victims yielded, metrics).
+
+    Yielded victims are appended to ``collect`` if given.
+    """
+    plugin = get_plugin(name)()
+    progress = ProgressTracker(name, state_dir)
+    metrics = RunMetrics(name)
+    count = 0
+    async with create_session(max_connections=max_connections) as http_session:
+        await plugin.setup(
+            config=config or {},
+            http_session=site.client(http_session),
+            progress=progress,
+            cache_dir=cache_dir,
+        )
+        with use_metrics(metrics):
+            async for ext in plugin.fetch_all():
+                count += 1
+                if collect is not None:
+                    collect.append(ext)
+        await plugin.teardown()
+    metrics.finish()
+    return count, metrics
+
+
+_POSTGREST_OPS = {
+    "eq": lambda a, b: a == b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+}
+
+
+def _html(body: str) -> web.Response:
+    return web.Response(text=body, content_type="text/html", charset="utf-8")
+
+
+def _json(data: Any) -> web.Response:
+    return web.Response(
+        text=json.dumps(data, ensure_ascii=False),
+        content_type="application/json", charset="utf-8",
+    )
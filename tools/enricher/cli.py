@@ -6,11 +6,13 @@ import argparse
 import asyncio
 import logging
 import sys
+from typing import Optional
 
 from . import __version__
-from .config import load_config
+from .config import Config, load_config
 from .db.models import DedupStats, RunStats
 from .sources import list_plugins
+from .utils.cache import set_backend as set_cache_backend
 
 
 def setup_logging(level: str) -> None:
@@ -42,23 +44,90 @@ def format_stats(stats: RunStats) -> str:
 
 
 async def cmd_enrich(args: argparse.Namespace) -> int:
-    """Run enrichment pipeline."""
-    from .pipeline.orchestrator import run_all_sources, run_enrichment
-
+    """Run enrichment pipeline (optionally under the profiler)."""
     cfg = load_config(args.config)
     setup_logging(cfg.log_level if not args.verbose else "DEBUG")
+    set_cache_backend(cfg.cache_backend)
+    metrics_textfile = args.metrics_textfile or cfg.metrics_textfile or None
+    if args.refresh:
+        if args.offline:
+            print("Error: --refresh and --offline exclude each other", file=sys.stderr)
+            return 1
+        # Revalidate every cached response (conditional GET)
+        for name in list_plugins():
+            cfg.source_config.setdefault(name, {})["cache_ttl"] = 0
+    if args.incremental:
+        for name in list_plugins():
+            cfg.source_config.setdefault(name, {})["incremental"] = True
+    if args.offline:
+        # Replay from the HTTP cache only; parse in worker processes
+        from .utils import http, parsing
+
+        http.set_offline(True, strict=True)
+        parsing.start_pool(args.parse_workers)
+
+    profiler = None
+    if args.profile:
+        from .utils.profiling import Profiler
+
+        profiler = Profiler(
+            args.profile,
+            cfg.state_dir,
+            label="all" if args.all else (args.source or "enrich"),
+            memory=args.profile_memory,
+        )
+        profiler.start()
+    try:
+        code = await _run_enrich(args, cfg, metrics_textfile)
+    except Exception as e:
+        if not (args.offline and isinstance(e, http.OfflineMiss)):
+            raise
+        print(f"Error: {e}", file=sys.stderr)
+        code = 1
+    finally:
+        if profiler:
+            profiler.stop()
+        if args.offline:
+            misses = http.offline_misses()
+            parsing.shutdown_pool()
+            http.set_offline(False)
+    if args.offline and misses:
+        # A plugin may have caught the OfflineMiss itself — still fail
+        logging.getLogger("enricher").error(
+            f"Offline: {misses} requests were not in the cache"
+        )
+        code = 1
+    if cfg.cache_max_mb or cfg.cache_max_age_days or cfg.cache_max_idle_days:
+        prune_caches(
+            cfg, cfg.cache_max_mb, cfg.cache_max_age_days,
+            cfg.cache_max_idle_days,
+        )
+    return code
+
+
+async def _run_enrich(
+    args: argparse.Namespace, cfg: Config, metrics_textfile: Optional[str]
+) -> int:
+    from .pipeline.orchestrator import run_all_sources, run_enrichment
+
     log = logging.getLogger("enricher")
 
     if args.all:
+        if getattr(args, "distributed", False):
+            print("Error: --distributed runs one --source", file=sys.stderr)
+            return 1
         results = await run_all_sources(
             database_url=cfg.database_url,
             state_dir=cfg.state_dir,
+            concurrency=args.concurrency or cfg.source_concurrency,
+            metrics_textfile=metrics_textfile,
             mode=args.mode,
             dry_run=args.dry_run,
             limit=args.limit,
             batch_size=cfg.batch_size,
             resume=args.resume,
             verbose=args.verbose,
+            source_config=cfg.source_config,
         )
         for name, stats in results.items():
             log.info(f"\n--- {name} ---\n{format_stats(stats)}")
@@ -68,6 +137,11 @@ async def cmd_enrich(args: argparse.Namespace) -> int:
         print("Error: --source NAME or --all required", file=sys.stderr)
         return 1
 
+    distributed = getattr(args, "distributed", False)
+    if distributed and args.dry_run:
+        print("Error: --distributed needs DB writes (no --dry-run)", file=sys.stderr)
+        return 1
+
     stats = await run_enrichment(
         source_name=args.source,
         database_url=cfg.database_url,
@@ -78,6 +152,9 @@ async def cmd_enrich(args: argparse.Namespace) -> int:
         batch_size=cfg.batch_size,
         resume=args.resume,
         verbose=args.verbose,
+        metrics_textfile=metrics_textfile,
+        source_config=cfg.source_config,
+        distributed=distributed,
     )
 
     prefix = "[DRY RUN] " if args.dry_run else ""
@@ -94,9 +171,10 @@ async def cmd_check(args: argparse.Namespace) -> int:
 
 async def cmd_status(args: argparse.Namespace) -> int:
     """Show progress status for all sources."""
-    import json
     import os
 
+    from .utils.progress import read_status
+
     cfg = load_config(args.config)
     progress_dir = os.path.join(cfg.state_dir, "progress")
 
@@ -107,13 +185,11 @@ async def cmd_status(args: argparse.Namespace) -> int:
     for filename in sorted(os.listdir(progress_dir)):
         if not filename.endswith(".json"):
             continue
-        filepath = os.path.join(progress_dir, filename)
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = read_status(os.path.join(progress_dir, filename))
 
         source = data.get("source", filename)
         last_run = data.get("last_run", "never")
-        processed = len(data.get("processed_ids", []))
+        processed = data.get("processed_count", 0)
         stats = data.get("stats", {})
 
         print(f"\n{source}:")
@@ -126,6 +202,163 @@ async def cmd_status(args: argparse.Namespace) -> int:
     return 0
 
 
+async def cmd_reset(args: argparse.Namespace) -> int:
+    """Drop durable progress and work units of a source."""
+    from .db.pool import close_pool, get_pool
+    from .db.queries import reset_progress
+    from .utils.progress import ProgressTracker
+
+    cfg = load_config(args.config)
+    setup_logging(cfg.log_level)
+    pool = await get_pool(cfg.database_url)
+    try:
+        await reset_progress(pool, args.source)
+    finally:
+        await close_pool()
+    progress = ProgressTracker(args.source, cfg.state_dir)
+    progress.reset()
+    progress.save()
+    print(f"Reset progress of {args.source}")
+    return 0
+
+
+def _mb(n: float) -> str:
+    return f"{n / 1e6:,.1f} MB"
+
+
+def _last_run_hit_rates(state_dir: str) -> dict[str, tuple[int, int]]:
+    """Cache (hits, lookups) per source from the latest run report."""
+    import json
+    import os
+
+    path = os.path.join(state_dir, "reports", "latest.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    rates = {}
+    for source, data in report.get("sources", {}).items():
+        c = data.get("counters", {})
+        hits = (
+            c.get("cache.hit", 0) + c.get("cache.memory_hit", 0)
+            + c.get("cache.revalidated_unchanged", 0)
+        )
+        misses = c.get("cache.miss", 0) + c.get("cache.revalidated_changed", 0)
+        if hits + misses:
+            rates[source] = (int(hits), int(hits + misses))
+    return rates
+
+
+def prune_caches(
+    cfg: Config, max_mb: float, max_age_days: float, max_idle_days: float = 0
+) -> None:
+    """Expire/evict cache entries and print what was removed."""
+    import os
+
+    from .utils.cache import prune
+
+    results = prune(
+        os.path.join(cfg.state_dir, "cache"),
+        max_bytes=int(max_mb * 1e6),
+        max_age=max_age_days * 86400,
+        max_idle=max_idle_days * 86400,
+    )
+    for source, r in results.items():
+        if r.expired or r.evicted:
+            print(
+                f"  {source:<16s} expired {r.expired}, evicted {r.evicted}, "
+                f"freed {_mb(r.freed_bytes)}; kept {r.kept} "
+                f"({_mb(r.kept_bytes)})"
+            )
+
+
+async def cmd_cache(args: argparse.Namespace) -> int:
+    """Inspect, prune, verify or convert the HTTP response caches."""
+    import os
+
+    from .utils.cache import (
+        SQLITE_FILENAME,
+        cache_dirs,
+        existing_stores,
+        migrate,
+    )
+
+    cfg = load_config(args.config)
+    setup_logging(cfg.log_level)
+    dirs = cache_dirs(os.path.join(cfg.state_dir, "cache"))
+    if args.source:
+        dirs = [(name, d) for name, d in dirs if name == args.source]
+    if not dirs:
+        print("No caches yet.")
+        return 0
+
+    if args.action == "migrate":
+        for source, cache_dir in dirs:
+            n = migrate(cache_dir, delete=args.delete)
+            if n:
+                print(f"{source}: migrated {n} entries to {SQLITE_FILENAME}")
+        return 0
+
+    if args.action == "prune":
+        max_mb = cfg.cache_max_mb if args.max_mb is None else args.max_mb
+        max_age = (
+            cfg.cache_max_age_days
+            if args.max_age_days is None else args.max_age_days
+        )
+        max_idle = (
+            cfg.cache_max_idle_days
+            if args.max_idle_days is None else args.max_idle_days
+        )
+        if not (max_mb or max_age or max_idle):
+            print(
+                "Nothing to do: set --max-mb / --max-age-days / "
+                "--max-idle-days or their cache_* config keys"
+            )
+            return 1
+        prune_caches(cfg, max_mb, max_age, max_idle)
+        return 0
+
+    if args.action == "verify":
+        bad = 0
+        for source, cache_dir in dirs:
+            for store in existing_stores(cache_dir):
+                problems = store.verify()
+                for key, problem in problems:
+                    print(f"  {source} [{store.backend}] {key}: {problem}")
+                if problems and args.delete:
+                    store.delete(key for key, _ in problems)
+                bad += len(problems)
+                store.close()
+        print(f"{bad} broken entries" + (" removed" if bad and args.delete else ""))
+        return 1 if bad and not args.delete else 0
+
+    # stats
+    rates = _last_run_hit_rates(cfg.state_dir)
+    total_entries = total_bytes = 0
+    for source, cache_dir in dirs:
+        for store in existing_stores(cache_dir):
+            st = store.stats()
+            store.close()
+            if not st.entries:
+                continue
+            total_entries += st.entries
+            total_bytes += st.stored_bytes
+            hits, lookups = rates.get(source, (0, 0))
+            hit_rate = f"{hits / lookups:6.1%} hit" if lookups else "     — hit"
+            print(
+                f"  {source:<16s} {st.backend:<7s} {st.entries:>7} entries  "
+                f"{_mb(st.body_bytes):>11} bodies  {_mb(st.stored_bytes):>11} "
+                f"on disk  ({st.ratio:.1f}x)  {hit_rate}"
+            )
+    print(f"\n  Total: {total_entries} entries, {_mb(total_bytes)} on disk")
+    if cfg.cache_max_mb:
+        print(f"  Cap:   {_mb(cfg.cache_max_mb * 1e6)}")
+    if rates:
+        print("  (hit rate: last run, from reports/latest.json)")
+    return 0
+
+
 def format_dedup_stats(stats: DedupStats) -> str:
     """Format dedup statistics for display."""
     return "\n".join([
@@ -224,10 +457,50 @@ def build_parser() -> argparse.ArgumentParser:
         "--resume", "-r", action="store_true",
         help="Resume from last progress",
     )
+    p_enrich.add_argument(
+        "--distributed", action="store_true",
+        help="Share the crawl with other workers: lease work units "
+             "(pages) from the DB; implies --resume",
+    )
     p_enrich.add_argument(
         "--limit", "-l", type=int, default=None,
         help="Max entries to process",
     )
+    p_enrich.add_argument(
+        "--concurrency", "-j", type=int, default=None,
+        help="Sources to run in parallel with --all (default: config)",
+    )
+    p_enrich.add_argument(
+        "--metrics-textfile", default=None,
+        help="Also write run metrics to this Prometheus textfile",
+    )
+    p_enrich.add_argument(
+        "--incremental", action="store_true",
+        help="Only visit entries that are new or changed since the last run "
+             "(sources that support it)",
+    )
+    p_enrich.add_argument(
+        "--refresh", action="store_true",
+        help="Revalidate all cached pages with the origin (conditional GET)",
+    )
+    p_enrich.add_argument(
+        "--offline", action="store_true",
+        help="Replay from the HTTP cache only: no network, no rate limits, "
+             "exit 1 on the first uncached page",
+    )
+    p_enrich.add_argument(
+        "--parse-workers", type=int, default=None,
+        help="With --offline: parser processes for boroumand pages "
+             "(default: CPU count); other sources parse inline",
+    )
+    p_enrich.add_argument(
+        "--profile", choices=["cprofile", "sampling"], default=None,
+        help="Profile the run; writes pstats + collapsed stacks to state_dir/profiles",
+    )
+    p_enrich.add_argument(
+        "--profile-memory", action="store_true",
+        help="With --profile: also take tracemalloc snapshots per phase",
+    )
     p_enrich.add_argument(
         "--verbose", "-v", action="store_true",
         help="Verbose output",
@@ -250,6 +523,40 @@ def build_parser() -> argparse.ArgumentParser:
         "--limit", "-l", type=int, default=None,
         help="Max entries to check",
     )
+    p_check.add_argument(
+        "--concurrency", "-j", type=int, default=None,
+        help="Sources to check in parallel with --all (default: config)",
+    )
+    p_check.add_argument(
+        "--metrics-textfile", default=None,
+        help="Also write run metrics to this Prometheus textfile",
+    )
+    p_check.add_argument(
+        "--incremental", action="store_true",
+        help="Only check entries that are new or changed since the last run",
+    )
+    p_check.add_argument(
+        "--refresh", action="store_true",
+        help="Revalidate all cached pages with the origin (conditional GET)",
+    )
+    p_check.add_argument(
+        "--offline", action="store_true",
+        help="Replay from the HTTP cache only: no network, no rate limits, "
+             "exit 1 on the first uncached page",
+    )
+    p_check.add_argument(
+        "--parse-workers", type=int, default=None,
+        help="With --offline: parser processes for boroumand pages "
+             "(default: CPU count); other sources parse inline",
+    )
+    p_check.add_argument(
+        "--profile", choices=["cprofile", "sampling"], default=None,
+        help="Profile the run; writes pstats + collapsed stacks to state_dir/profiles",
+    )
+    p_check.add_argument(
+        "--profile-memory", action="store_true",
+        help="With --profile: also take tracemalloc snapshots per phase",
+    )
     p_check.add_argument(
         "--verbose", "-v", action="store_true",
         help="Verbose output",
@@ -281,9 +588,46 @@ def build_parser() -> argparse.ArgumentParser:
         help="Verbose output",
     )
 
+    # --- cache ---
+    p_cache = sub.add_parser("cache", help="Inspect or convert HTTP caches")
+    p_cache.add_argument(
+        "action", choices=["stats", "prune", "verify", "migrate"],
+        help="stats: entries, size and hit rate per source; "
+             "prune: expire/evict down to the configured limits; "
+             "verify: check every entry can be read back; "
+             "migrate: copy a files cache into cache.sqlite "
+             "(streamed downloads stay files under downloads/)",
+    )
+    p_cache.add_argument("--source", "-s", help="Only this source")
+    p_cache.add_argument(
+        "--max-mb", type=float, default=None,
+        help="prune: total cache size cap (default: cache_max_mb)",
+    )
+    p_cache.add_argument(
+        "--max-age-days", type=float, default=None,
+        help="prune: drop entries fetched longer ago than this "
+             "(default: cache_max_age_days)",
+    )
+    p_cache.add_argument(
+        "--max-idle-days", type=float, default=None,
+        help="prune: drop entries not read for this long "
+             "(default: cache_max_idle_days)",
+    )
+    p_cache.add_argument(
+        "--delete", action="store_true",
+        help="migrate: remove the JSON files after copying; "
+             "verify: remove broken entries",
+    )
+
     # --- status ---
     sub.add_parser("status", help="Show progress status for all sources")
 
+    # --- reset ---
+    p_reset = sub.add_parser(
+        "reset", help="Drop progress and work units of a source (fresh crawl)"
+    )
+    p_reset.add_argument("--source", "-s", required=True, help="Source plugin name")
+
     # --- list ---
     sub.add_parser("list", help="List available source plugins")
 
@@ -304,6 +648,8 @@ def main() -> None:
         "check": cmd_check,
         "dedup": cmd_dedup,
         "status": cmd_status,
+        "reset": cmd_reset,
+        "cache": cmd_cache,
         "list": cmd_list,
     }
 
@@ -19,6 +19,16 @@ class Config:
     state_dir: str = DEFAULT_STATE_DIR
     batch_size: int = 100
     log_level: str = "INFO"
+    # Max sources running at once for `enrich --all`
+    source_concurrency: int = 3
+    # Prometheus textfile for run metrics (empty = JSON run report only)
+    metrics_textfile: str = ""
+    # HTTP cache store: "sqlite" (packed, compressed) or "files"
+    cache_backend: str = "sqlite"
+    # Cache limits applied after each run and by `cache prune` (0 = off)
+    cache_max_mb: float = 0
+    cache_max_age_days: float = 0  # since fetched
+    cache_max_idle_days: float = 0  # since last read
     # Per-source overrides
     source_config: dict[str, dict] = field(default_factory=dict)
 
@@ -40,6 +50,18 @@ def load_config(config_file: str | None = None) -> Config:
         cfg.state_dir = data.get("state_dir", cfg.state_dir)
         cfg.batch_size = data.get("batch_size", cfg.batch_size)
         cfg.log_level = data.get("log_level", cfg.log_level)
+        cfg.source_concurrency = data.get(
+            "source_concurrency", cfg.source_concurrency
+        )
+        cfg.metrics_textfile = data.get("metrics_textfile", cfg.metrics_textfile)
+        cfg.cache_backend = data.get("cache_backend", cfg.cache_backend)
+        cfg.cache_max_mb = data.get("cache_max_mb", cfg.cache_max_mb)
+        cfg.cache_max_age_days = data.get(
+            "cache_max_age_days", cfg.cache_max_age_days
+        )
+        cfg.cache_max_idle_days = data.get(
+            "cache_max_idle_days", cfg.cache_max_idle_days
+        )
 
         # Source-specific config sections
         for key, val in data.items():
@@ -55,6 +77,14 @@ def load_config(config_file: str | None = None) -> Config:
         cfg.batch_size = int(os.environ["ENRICHER_BATCH_SIZE"])
     if os.environ.get("ENRICHER_LOG_LEVEL"):
         cfg.log_level = os.environ["ENRICHER_LOG_LEVEL"]
+    if os.environ.get("ENRICHER_SOURCE_CONCURRENCY"):
+        cfg.source_concurrency = int(os.environ["ENRICHER_SOURCE_CONCURRENCY"])
+    if os.environ.get("ENRICHER_METRICS_TEXTFILE"):
+        cfg.metrics_textfile = os.environ["ENRICHER_METRICS_TEXTFILE"]
+    if os.environ.get("ENRICHER_CACHE_BACKEND"):
+        cfg.cache_backend = os.environ["ENRICHER_CACHE_BACKEND"]
+    if os.environ.get("ENRICHER_CACHE_MAX_MB"):
+        cfg.cache_max_mb = float(os.environ["ENRICHER_CACHE_MAX_MB"])
 
     # 3. Fallback: local PostgreSQL
     if not cfg.database_url:
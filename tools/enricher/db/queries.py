@@ -2,7 +2,8 @@
 
 from __future__ import annotations
 
-from typing import Any
+import json
+from typing import Any, Optional
 
 import asyncpg
 
@@ -11,8 +12,8 @@ LOAD_CITIES = """
     SELECT id, slug, name_en FROM cities ORDER BY slug
 """
 
-# Load all victims (lightweight fields for matching)
-LOAD_VICTIMS = """
+# Victims with the lightweight fields used for matching
+_SELECT_VICTIMS = """
     SELECT v.id, v.slug, v.name_latin, v.name_farsi, v.aliases,
            v.date_of_death, v.age_at_death, v.place_of_death, v.province,
            v.cause_of_death, v.photo_url, v.circumstances_en, v.circumstances_fa,
@@ -24,9 +25,14 @@ LOAD_VICTIMS = """
     FROM victims v
     LEFT JOIN cities c ON v.city_id = c.id
     LEFT JOIN provinces p ON c.province_id = p.id
-    ORDER BY v.slug
 """
 
+# Load all victims (lightweight fields for matching)
+LOAD_VICTIMS = _SELECT_VICTIMS + "    ORDER BY v.slug\n"
+
+# Victims another process inserted since the index was loaded
+LOAD_VICTIMS_BY_SLUG = _SELECT_VICTIMS + "    WHERE v.slug = ANY($1::text[])\n"
+
 # Load source URLs grouped by victim
 LOAD_SOURCE_URLS = """
     SELECT victim_id::text, url
@@ -131,6 +137,14 @@ async def load_all_victims(pool: asyncpg.Pool) -> list[dict]:
     return [dict(r) for r in rows]
 
 
+async def load_victims_by_slug(
+    conn: asyncpg.Connection, slugs: list[str]
+) -> list[dict]:
+    """Victims with the given slugs, as load_all_victims returns them."""
+    rows = await conn.fetch(LOAD_VICTIMS_BY_SLUG, slugs)
+    return [dict(r) for r in rows]
+
+
 async def load_all_source_urls(pool: asyncpg.Pool) -> dict[str, set[str]]:
     """Load all source URLs grouped by victim UUID."""
     async with pool.acquire() as conn:
@@ -141,48 +155,52 @@ async def load_all_source_urls(pool: asyncpg.Pool) -> dict[str, set[str]]:
     return result
 
 
+# Batch writers take a connection so the orchestrator can run a whole flush
+# (updates, inserts and the progress checkpoint) in one transaction.
+
+
 async def batch_enrich(
-    pool: asyncpg.Pool,
+    conn: asyncpg.Connection,
     updates: list[tuple[Any, ...]],
     batch_size: int = 100,
 ) -> int:
     """Execute enrichment updates in batches."""
     total = 0
-    async with pool.acquire() as conn:
-        for i in range(0, len(updates), batch_size):
-            batch = updates[i : i + batch_size]
-            await conn.executemany(ENRICH_VICTIM, batch)
-            total += len(batch)
+    for i in range(0, len(updates), batch_size):
+        batch = updates[i : i + batch_size]
+        await conn.executemany(ENRICH_VICTIM, batch)
+        total += len(batch)
     return total
 
 
 async def batch_insert_sources(
-    pool: asyncpg.Pool,
+    conn: asyncpg.Connection,
     sources: list[tuple[str, str, str, str]],
     batch_size: int = 100,
 ) -> int:
     """Insert sources in batches, skipping duplicates."""
     total = 0
-    async with pool.acquire() as conn:
-        for i in range(0, len(sources), batch_size):
-            batch = sources[i : i + batch_size]
-            await conn.executemany(INSERT_SOURCE, batch)
-            total += len(batch)
+    for i in range(0, len(sources), batch_size):
+        batch = sources[i : i + batch_size]
+        await conn.executemany(INSERT_SOURCE, batch)
+        total += len(batch)
     return total
 
 
 async def batch_insert_victims(
-    pool: asyncpg.Pool,
+    conn: asyncpg.Connection,
     victims: list[tuple[Any, ...]],
-) -> int:
-    """Insert new victims, skipping conflicts."""
-    count = 0
-    async with pool.acquire() as conn:
-        for v in victims:
-            result = await conn.fetchrow(INSERT_VICTIM, *v)
-            if result:
-                count += 1
-    return count
+) -> list[str | None]:
+    """Insert new victims, skipping conflicts.
+
+    Returns the new victim UUID per input tuple, None where the slug
+    already existed.
+    """
+    ids: list[str | None] = []
+    for v in victims:
+        result = await conn.fetchrow(INSERT_VICTIM, *v)
+        ids.append(str(result["id"]) if result else None)
+    return ids
 
 
 async def load_all_photo_urls(pool: asyncpg.Pool) -> dict[str, set[str]]:
@@ -196,20 +214,238 @@ async def load_all_photo_urls(pool: asyncpg.Pool) -> dict[str, set[str]]:
 
 
 async def batch_insert_photos(
-    pool: asyncpg.Pool,
+    conn: asyncpg.Connection,
     photos: list[tuple[str, str, str | None, str]],
     batch_size: int = 100,
 ) -> int:
     """Insert photos in batches, skipping duplicates."""
     total = 0
-    async with pool.acquire() as conn:
-        for i in range(0, len(photos), batch_size):
-            batch = photos[i : i + batch_size]
-            await conn.executemany(INSERT_PHOTO, batch)
-            total += len(batch)
+    for i in range(0, len(photos), batch_size):
+        batch = photos[i : i + batch_size]
+        await conn.executemany(INSERT_PHOTO, batch)
+        total += len(batch)
     return total
 
 
+# ─── Progress queries ────────────────────────────────────────────────────────
+
+# Processed source ids, one row per (source, source_id)
+LOAD_PROGRESS_IDS = """
+    SELECT source_id FROM enricher_progress WHERE source = $1
+"""
+
+INSERT_PROGRESS_ID = """
+    INSERT INTO enricher_progress (source, source_id)
+    VALUES ($1, $2)
+    ON CONFLICT DO NOTHING
+"""
+
+LOAD_CHECKPOINT = """
+    SELECT checkpoint, stats, last_run
+    FROM enricher_checkpoints
+    WHERE source = $1
+"""
+
+UPSERT_CHECKPOINT = """
+    INSERT INTO enricher_checkpoints (source, checkpoint, stats, last_run)
+    VALUES ($1, $2::jsonb, $3::jsonb, NOW())
+    ON CONFLICT (source) DO UPDATE SET
+        checkpoint = EXCLUDED.checkpoint,
+        stats      = EXCLUDED.stats,
+        last_run   = EXCLUDED.last_run
+"""
+
+# Distributed runs: each worker keeps its own stats under stats.workers
+# (merged in one statement, so concurrent workers never overwrite each
+# other); the crawl checkpoint of fetch_all() is left alone
+UPSERT_WORKER_STATS = """
+    INSERT INTO enricher_checkpoints (source, stats, last_run)
+    VALUES ($1, jsonb_build_object('workers', jsonb_build_object($2::text, $3::jsonb)), NOW())
+    ON CONFLICT (source) DO UPDATE SET
+        stats    = enricher_checkpoints.stats || jsonb_build_object(
+                       'workers',
+                       COALESCE(enricher_checkpoints.stats->'workers', '{}'::jsonb)
+                       || jsonb_build_object($2::text, $3::jsonb)
+                   ),
+        last_run = EXCLUDED.last_run
+"""
+
+DELETE_PROGRESS_IDS = "DELETE FROM enricher_progress WHERE source = $1"
+DELETE_CHECKPOINT = "DELETE FROM enricher_checkpoints WHERE source = $1"
+DELETE_WORK_UNITS = "DELETE FROM enricher_work_units WHERE source = $1"
+
+
+async def load_progress(
+    pool: asyncpg.Pool, source: str
+) -> tuple[list[str], dict] | None:
+    """Load durable progress for a source: (processed ids, checkpoint).
+
+    Returns None if the source has never committed a flush.
+    """
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(LOAD_CHECKPOINT, source)
+        if row is None:
+            return None
+        ids = await conn.fetch(LOAD_PROGRESS_IDS, source)
+    return [r["source_id"] for r in ids], json.loads(row["checkpoint"])
+
+
+async def save_progress(
+    conn: asyncpg.Connection,
+    source: str,
+    processed_ids: list[str],
+    checkpoint: dict,
+    stats: dict,
+    worker: Optional[str] = None,
+) -> None:
+    """Record newly processed ids and the checkpoint (call inside the flush transaction).
+
+    With ``worker`` (a distributed run) only that worker's stats are
+    stored and the checkpoint is not touched.
+    """
+    if processed_ids:
+        await conn.executemany(
+            INSERT_PROGRESS_ID, [(source, sid) for sid in processed_ids]
+        )
+    if worker is not None:
+        await conn.execute(UPSERT_WORKER_STATS, source, worker, json.dumps(stats))
+        return
+    await conn.execute(
+        UPSERT_CHECKPOINT,
+        source,
+        json.dumps(checkpoint, ensure_ascii=False),
+        json.dumps(stats),
+    )
+
+
+async def reset_progress(pool: asyncpg.Pool, source: str) -> None:
+    """Drop durable progress for a source (fresh, non-resume run)."""
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(DELETE_PROGRESS_IDS, source)
+            await conn.execute(DELETE_CHECKPOINT, source)
+            await conn.execute(DELETE_WORK_UNITS, source)
+
+
+# ─── Work leasing queries ────────────────────────────────────────────────────
+
+# Units of a distributed crawl (browse pages, API pages, post ranges).
+# Every worker enqueues the same list; existing rows keep their state,
+# except failed units, which get a new set of attempts.
+ENQUEUE_UNIT = """
+    INSERT INTO enricher_work_units (source, unit, seq)
+    VALUES ($1, $2, $3)
+    ON CONFLICT (source, unit) DO UPDATE
+    SET status = 'pending', attempts = 0
+    WHERE enricher_work_units.status = 'failed'
+"""
+
+# Next pending (or expired) units in crawl order. SKIP LOCKED lets
+# concurrent workers pass over rows another worker is leasing right now.
+LEASE_UNITS = """
+    UPDATE enricher_work_units u
+    SET status       = 'leased',
+        worker       = $2,
+        leased_until = NOW() + make_interval(secs => $4),
+        attempts     = u.attempts + 1
+    FROM (
+        SELECT unit FROM enricher_work_units
+        WHERE source = $1
+          AND (status = 'pending'
+               OR (status = 'leased' AND leased_until < NOW()))
+        ORDER BY seq
+        LIMIT $3
+        FOR UPDATE SKIP LOCKED
+    ) next
+    WHERE u.source = $1 AND u.unit = next.unit
+    RETURNING u.unit, u.seq
+"""
+
+# Heartbeat: returns the units this worker still holds
+RENEW_LEASES = """
+    UPDATE enricher_work_units
+    SET leased_until = NOW() + make_interval(secs => $4)
+    WHERE source = $1 AND worker = $2 AND status = 'leased'
+      AND unit = ANY($3::text[])
+    RETURNING unit
+"""
+
+# A unit whose fetch failed: back to pending for another worker (or this
+# one), or failed once it used up its attempts
+RELEASE_UNIT = """
+    UPDATE enricher_work_units
+    SET status = CASE WHEN attempts >= $4 THEN 'failed' ELSE 'pending' END,
+        worker = NULL, leased_until = NULL
+    WHERE source = $1 AND unit = $2 AND worker = $3 AND status = 'leased'
+    RETURNING status
+"""
+
+# Only units this worker still holds: a unit whose lease expired and was
+# taken over is completed by the worker that holds it now
+COMPLETE_UNITS = """
+    UPDATE enricher_work_units
+    SET status = 'done', leased_until = NULL, done_at = NOW()
+    WHERE source = $1 AND unit = ANY($2::text[])
+      AND worker = $3 AND status = 'leased'
+"""
+
+COUNT_UNITS = """
+    SELECT status, count(*)::int AS n
+    FROM enricher_work_units
+    WHERE source = $1
+    GROUP BY status
+"""
+
+
+async def enqueue_units(pool: asyncpg.Pool, source: str, units: list[str]) -> None:
+    """Register a source's work units in crawl order (idempotent)."""
+    async with pool.acquire() as conn:
+        await conn.executemany(
+            ENQUEUE_UNIT, [(source, unit, seq) for seq, unit in enumerate(units)]
+        )
+
+
+async def lease_units(
+    pool: asyncpg.Pool, source: str, worker: str, n: int, ttl: float
+) -> list[str]:
+    """Lease up to ``n`` units for ``ttl`` seconds, lowest seq first."""
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(LEASE_UNITS, source, worker, n, float(ttl))
+    return [r["unit"] for r in sorted(rows, key=lambda r: r["seq"])]
+
+
+async def renew_leases(
+    pool: asyncpg.Pool, source: str, worker: str, units: list[str], ttl: float
+) -> set[str]:
+    """Extend this worker's leases; returns the units still held."""
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(RENEW_LEASES, source, worker, units, float(ttl))
+    return {r["unit"] for r in rows}
+
+
+async def release_unit(
+    pool: asyncpg.Pool, source: str, worker: str, unit: str, max_attempts: int
+) -> Optional[str]:
+    """Give a leased unit back; its new status, None if no longer held."""
+    async with pool.acquire() as conn:
+        return await conn.fetchval(RELEASE_UNIT, source, unit, worker, max_attempts)
+
+
+async def complete_units(
+    conn: asyncpg.Connection, source: str, worker: str, units: list[str]
+) -> None:
+    """Mark units done (call inside the flush transaction)."""
+    if units:
+        await conn.execute(COMPLETE_UNITS, source, units, worker)
+
+
+async def count_units(pool: asyncpg.Pool, source: str) -> dict[str, int]:
+    """Work units per status for a source."""
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(COUNT_UNITS, source)
+    return {r["status"]: r["n"] for r in rows}
+
+
 # ─── Dedup queries ───────────────────────────────────────────────────────────
 
 # Load all victims with source/photo counts for dedup scoring
@@ -0,0 +1,146 @@
+"""Work leasing for distributed runs — several workers share one crawl.
+
+A plugin that supports ``enrich --distributed`` splits its crawl into
+ordered work units (``work_units()``: browse pages, API pages) and can
+fetch each one on its own (``fetch_unit()``). Every worker enqueues the
+same units and then leases them from ``enricher_work_units``:
+
+    lease = WorkLease(pool, "boroumand")
+    await lease.enqueue(units)
+    await lease.start()
+    while (unit := await lease.next()) is not None:
+        ...                     # process the unit's records, then
+        lease.finish(unit)      # done with the next flush
+        # or, if the unit could not be fetched:
+        await lease.release(unit)  # pending again (failed after MAX_ATTEMPTS)
+    await lease.stop()
+
+A heartbeat extends the leases of held units every ``ttl / 3`` seconds;
+the units of a worker that died become leasable again once their lease
+expires. ``BatchWriter.flush`` marks finished units done in the same
+transaction as their records, so a unit is never done before its data.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+from typing import Optional
+
+import asyncpg
+
+from ..db.queries import enqueue_units, lease_units, release_unit, renew_leases
+
+log = logging.getLogger("enricher.leasing")
+
+LEASE_TTL = 300.0  # seconds a unit stays leased without a heartbeat
+MAX_ATTEMPTS = 3  # leases of a unit whose fetch fails before it is failed
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkLease:
+    """This worker's leased units of one source, kept alive by a heartbeat.
+
+    Args:
+        pool: asyncpg pool.
+        source: Plugin name.
+        worker: Worker id stored with each lease (default: host:pid).
+        ttl: Lease duration in seconds.
+        batch: Units leased per round trip. 1 keeps the crawl order across
+            workers closest to a single-worker run.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        source: str,
+        worker: Optional[str] = None,
+        ttl: float = LEASE_TTL,
+        batch: int = 1,
+    ):
+        self.pool = pool
+        self.source = source
+        self.worker = worker or default_worker_id()
+        self.ttl = ttl
+        self.batch = batch
+        # Leased and not yet committed (handed out or still queued)
+        self.held: set[str] = set()
+        self._queue: list[str] = []
+        self._finished: list[str] = []
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+    async def enqueue(self, units: list[str]) -> None:
+        await enqueue_units(self.pool, self.source, units)
+
+    async def next(self) -> Optional[str]:
+        """Next unit to process; None once no unit is left to lease."""
+        if not self._queue:
+            self._queue = await lease_units(
+                self.pool, self.source, self.worker, self.batch, self.ttl
+            )
+            self.held.update(self._queue)
+        return self._queue.pop(0) if self._queue else None
+
+    async def release(self, unit: str) -> None:
+        """``unit`` could not be fetched: give it back for another attempt."""
+        self.held.discard(unit)
+        status = await release_unit(
+            self.pool, self.source, self.worker, unit, MAX_ATTEMPTS
+        )
+        if status == "failed":
+            log.error(
+                f"[{self.source}] {unit} failed {MAX_ATTEMPTS} times; "
+                f"the next distributed run retries it"
+            )
+
+    def finish(self, unit: str) -> None:
+        """All records of ``unit`` are queued; done once they are flushed."""
+        self._finished.append(unit)
+
+    @property
+    def finished(self) -> list[str]:
+        """Units finished since the last commit, oldest first."""
+        return list(self._finished)
+
+    def commit(self, units: list[str]) -> None:
+        """Drop ``units`` from finished once they are marked done in the DB."""
+        done = set(units)
+        self._finished = [u for u in self._finished if u not in done]
+        self.held.difference_update(units)
+
+    async def start(self) -> None:
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def stop(self) -> None:
+        if self._heartbeat_task is None:
+            return
+        self._heartbeat_task.cancel()
+        try:
+            await self._heartbeat_task
+        except asyncio.CancelledError:
+            pass
+        self._heartbeat_task = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            if not self.held:
+                continue
+            units = sorted(self.held)
+            try:
+                kept = await renew_leases(
+                    self.pool, self.source, self.worker, units, self.ttl
+                )
+            except (OSError, asyncpg.PostgresError) as e:
+                log.warning(f"[{self.source}] Lease heartbeat failed: {e}")
+                continue
+            for unit in set(units) - kept:
+                if unit in self.held:
+                    # Expired and taken over; both workers write the same
+                    # records, which the idempotent writes absorb
+                    log.warning(f"[{self.source}] Lost lease on {unit}")
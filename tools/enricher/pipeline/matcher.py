@@ -41,30 +41,69 @@ def build_index(
             idx.url_to_victim[url] = vid
 
     for v in victims:
-        vid = str(v["id"])
-        idx.by_id[vid] = v
-        idx.by_slug[v["slug"]] = v
-
-        # Farsi normalized index
-        farsi_norm = normalize_farsi(v.get("name_farsi"))
-        if farsi_norm:
-            idx.by_farsi_norm.setdefault(farsi_norm, []).append(v)
-
-        # Latin word-set index
-        words = name_word_set(v.get("name_latin"))
-        if words:
-            idx.by_latin_words.setdefault(words, []).append(v)
-
-        # Date + province index (prefer canonical province from city relation)
-        dod = v.get("date_of_death")
-        prov_raw = v.get("effective_province") or v.get("province") or ""
-        prov = prov_raw.lower().strip()
-        if dod and prov:
-            idx.by_date_province.setdefault((dod, prov), []).append(v)
+        add_victim(idx, v)
 
     return idx
 
 
+def add_victim(index: VictimIndex, v: dict) -> None:
+    """Add a victim to every index.
+
+    Victims imported during a run are indexed before their INSERT is
+    flushed; they have ``id`` None and are keyed into ``by_id`` later.
+    """
+    if v.get("id") is not None:
+        index.by_id[str(v["id"])] = v
+    index.by_slug[v["slug"]] = v
+
+    # Farsi normalized index
+    farsi_norm = normalize_farsi(v.get("name_farsi"))
+    if farsi_norm:
+        index.by_farsi_norm.setdefault(farsi_norm, []).append(v)
+
+    # Latin word-set index
+    words = name_word_set(v.get("name_latin"))
+    if words:
+        index.by_latin_words.setdefault(words, []).append(v)
+
+    # Date + province index (prefer canonical province from city relation)
+    dod = v.get("date_of_death")
+    prov_raw = v.get("effective_province") or v.get("province") or ""
+    prov = prov_raw.lower().strip()
+    if dod and prov:
+        index.by_date_province.setdefault((dod, prov), []).append(v)
+
+
+def remove_victim(index: VictimIndex, v: dict) -> None:
+    """Remove a victim added with add_victim (e.g. an INSERT that conflicted)."""
+    if v.get("id") is not None:
+        index.by_id.pop(str(v["id"]), None)
+    if index.by_slug.get(v["slug"]) is v:
+        del index.by_slug[v["slug"]]
+
+    keys = [
+        (index.by_farsi_norm, normalize_farsi(v.get("name_farsi"))),
+        (index.by_latin_words, name_word_set(v.get("name_latin"))),
+    ]
+    prov = (v.get("effective_province") or v.get("province") or "").lower().strip()
+    if v.get("date_of_death") and prov:
+        keys.append((index.by_date_province, (v["date_of_death"], prov)))
+
+    for table, key in keys:
+        bucket = table.get(key) if key else None
+        if not bucket:
+            continue
+        bucket[:] = [c for c in bucket if c is not v]
+        if not bucket:
+            del table[key]
+
+
+def add_source_url(index: VictimIndex, victim_id: str, url: str) -> None:
+    """Record a newly linked source URL so later matches see it."""
+    index.source_urls.setdefault(victim_id, set()).add(url)
+    index.url_to_victim.setdefault(url, victim_id)
+
+
 def match(ext: ExternalVictim, index: VictimIndex) -> MatchResult:
     """Match an ExternalVictim against the index using multi-stage strategy."""
 
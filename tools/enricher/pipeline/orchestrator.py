@@ -6,26 +6,54 @@ import asyncio
 import logging
 import re
 import time
-from typing import Optional
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional
 
-from ..db.models import ExternalVictim, RunStats
+import asyncpg
+
+from ..db.models import ExternalVictim, MatchResult, RunStats
 from ..db.pool import close_pool, get_pool
 from ..db.queries import (
     batch_enrich,
     batch_insert_photos,
     batch_insert_sources,
     batch_insert_victims,
+    complete_units,
+    count_units,
     load_all_cities,
     load_all_photo_urls,
     load_all_source_urls,
     load_all_victims,
+    load_progress,
+    load_victims_by_slug,
+    reset_progress,
+    save_progress,
 )
 from ..sources import get_plugin, list_plugins
-from ..utils.http import create_session
+from ..sources.base import SourcePlugin, UnitFailed
+from ..utils import profiling
+from ..utils.cache import close_stores
+from ..utils.http import OfflineMiss, create_session
+from ..utils.metrics import (
+    RunMetrics,
+    stage,
+    use_metrics,
+    write_prometheus_textfile,
+    write_run_report,
+)
 from ..utils.provinces import build_city_resolver, resolve_city_id
-from ..utils.progress import ProgressTracker
+from ..utils.progress import ProgressTracker, stats_snapshot
 from .enricher import compute_enrichment, count_new_fields
-from .matcher import build_index, match
+from .leasing import WorkLease
+from .matcher import (
+    VictimIndex,
+    add_source_url,
+    add_victim,
+    build_index,
+    match,
+    remove_victim,
+)
 
 log = logging.getLogger("enricher")
 
@@ -45,6 +73,54 @@ def make_slug(name: str, birth_year: Optional[int] = None) -> str:
     return s
 
 
+@dataclass
+class EnrichmentContext:
+    """Shared state for one or more source runs.
+
+    Loaded once per process: ``--all`` shares a single pool and index
+    across every source instead of rebuilding it per plugin.
+    """
+
+    pool: asyncpg.Pool
+    index: VictimIndex
+    photo_urls: dict[str, set[str]]
+    city_resolver: dict[str, int]
+    # Serializes flushes of shared tables (sources, photos, victims) between
+    # concurrently running sources — INSERT_PHOTO derives sort_order and
+    # is_primary from existing rows, which races across connections.
+    write_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # Slug → writer holding a not-yet-inserted new victim with that slug
+    pending_victims: dict[str, "BatchWriter"] = field(default_factory=dict)
+
+
+async def load_context(pool: asyncpg.Pool) -> EnrichmentContext:
+    """Load victims, source/photo URLs and cities, and build the index."""
+    log.info("Loading victims from database...")
+    t0 = time.time()
+    with stage("index_load.db"):
+        victims = await load_all_victims(pool)
+        source_urls = await load_all_source_urls(pool)
+        photo_urls = await load_all_photo_urls(pool)
+        cities = await load_all_cities(pool)
+    with stage("index_load.build"):
+        city_resolver = build_city_resolver(cities)
+        index = build_index(victims, source_urls)
+    log.info(
+        f"Index built: {len(victims)} victims, "
+        f"{sum(len(v) for v in source_urls.values())} source URLs, "
+        f"{sum(len(v) for v in photo_urls.values())} photo URLs, "
+        f"{len(cities)} cities "
+        f"({time.time()-t0:.1f}s)"
+    )
+    profiling.snapshot("index_load")
+    return EnrichmentContext(
+        pool=pool,
+        index=index,
+        photo_urls=photo_urls,
+        city_resolver=city_resolver,
+    )
+
+
 async def run_enrichment(
     source_name: str,
     database_url: str,
@@ -55,6 +131,9 @@ async def run_enrichment(
     batch_size: int = 100,
     resume: bool = False,
     verbose: bool = False,
+    metrics_textfile: Optional[str] = None,
+    source_config: Optional[dict[str, dict]] = None,
+    distributed: bool = False,
 ) -> RunStats:
     """Run the enrichment pipeline for a source.
 
@@ -68,212 +147,653 @@ async def run_enrichment(
         batch_size: DB batch commit size
         resume: Resume from last progress
         verbose: Verbose output
+        metrics_textfile: Also write metrics to this Prometheus textfile
+        source_config: Per-source sections from enricher.toml
+        distributed: Lease work units from the DB, so that several workers
+            share the crawl (implies resume)
     """
-    stats = RunStats()
+    shared = RunMetrics("shared")
+    metrics = RunMetrics(source_name)
     pool = await get_pool(database_url)
+    try:
+        with use_metrics(shared):
+            ctx = await load_context(pool)
+        stats = await enrich_source(
+            ctx,
+            source_name,
+            state_dir,
+            mode=mode,
+            dry_run=dry_run,
+            limit=limit,
+            batch_size=batch_size,
+            resume=resume,
+            verbose=verbose,
+            metrics=metrics,
+            source_config=source_config,
+            distributed=distributed,
+        )
+    finally:
+        await close_pool()
+        close_stores()
 
-    # 1. Build victim index from DB
-    log.info("Loading victims from database...")
-    t0 = time.time()
-    victims = await load_all_victims(pool)
-    source_urls = await load_all_source_urls(pool)
-    photo_urls = await load_all_photo_urls(pool)
-    cities = await load_all_cities(pool)
-    city_resolver = build_city_resolver(cities)
-    index = build_index(victims, source_urls)
-    log.info(
-        f"Index built: {len(victims)} victims, "
-        f"{sum(len(v) for v in source_urls.values())} source URLs, "
-        f"{sum(len(v) for v in photo_urls.values())} photo URLs, "
-        f"{len(cities)} cities "
-        f"({time.time()-t0:.1f}s)"
+    _write_reports(state_dir, shared, {source_name: (metrics, stats)}, metrics_textfile)
+    return stats
+
+
+def _write_reports(
+    state_dir: str,
+    shared: RunMetrics,
+    sources: dict[str, tuple[RunMetrics, RunStats]],
+    metrics_textfile: Optional[str],
+) -> None:
+    """Write the JSON run report and, if configured, the Prometheus textfile."""
+    try:
+        path = write_run_report(state_dir, shared, sources)
+        log.info(f"Run report: {path}")
+        if metrics_textfile:
+            write_prometheus_textfile(metrics_textfile, shared, sources)
+    except OSError as e:
+        log.warning(f"Could not write run report: {e}")
+
+
+def new_victim_row(
+    ext: ExternalVictim, slug: str, city_id: Optional[int], source_name: str
+) -> tuple:
+    """Build the INSERT_VICTIM parameter tuple for an unmatched victim."""
+    return (
+        slug,
+        ext.name_latin or "Unknown",
+        ext.name_farsi,
+        ext.date_of_birth,
+        ext.place_of_birth,
+        ext.gender,
+        ext.religion,
+        ext.photo_url,
+        ext.occupation,
+        ext.education,
+        ext.date_of_death,
+        ext.age_at_death,
+        ext.place_of_death,
+        ext.province,
+        ext.cause_of_death,
+        ext.circumstances_en,
+        ext.event_context,
+        ext.responsible_forces,
+        source_name,
+        city_id,
     )
 
-    # 2. Initialize plugin
-    plugin_cls = get_plugin(source_name)
-    plugin = plugin_cls()
-    progress = ProgressTracker(source_name, state_dir)
 
-    if not resume:
-        progress.reset()
+def pending_victim(
+    ext: ExternalVictim, slug: str, city_id: Optional[int], source_name: str
+) -> dict:
+    """Index entry for a new victim, shaped like a LOAD_VICTIMS row.
 
-    session = create_session()
+    ``id`` stays None until the INSERT is flushed.
+    """
+    return {
+        "id": None,
+        "slug": slug,
+        "name_latin": ext.name_latin or "Unknown",
+        "name_farsi": ext.name_farsi,
+        "aliases": None,
+        "date_of_death": ext.date_of_death,
+        "age_at_death": ext.age_at_death,
+        "place_of_death": ext.place_of_death,
+        "province": ext.province,
+        "cause_of_death": ext.cause_of_death,
+        "photo_url": ext.photo_url,
+        "circumstances_en": ext.circumstances_en,
+        # INSERT_VICTIM does not write circumstances_fa
+        "circumstances_fa": None,
+        "gender": ext.gender,
+        "religion": ext.religion,
+        "place_of_birth": ext.place_of_birth,
+        "date_of_birth": ext.date_of_birth,
+        "occupation_en": ext.occupation,
+        "education": ext.education,
+        "responsible_forces": ext.responsible_forces,
+        "event_context": ext.event_context,
+        "verification_status": "unverified",
+        "data_source": source_name,
+        "city_id": city_id,
+        "effective_province": ext.province,
+    }
+
+
+class BatchWriter:
+    """Buffers one source's DB writes and flushes them together.
+
+    New victims are added to the shared index as soon as they are queued,
+    so later records — from this or a concurrent source — match them
+    instead of being imported twice.
+
+    Each flush also commits the processed ids and plugin checkpoint in the
+    same transaction as the writes, so ``--resume`` continues exactly after
+    the last durable record. In a distributed run the finished work units
+    are marked done in that transaction as well.
+
+    A new victim whose slug another process inserted first (e.g. another
+    worker of a distributed run) is not dropped: the existing row is loaded
+    into the index and the record goes to ``rematch``, to be matched
+    against it by the source loop. Its id stays pending until then.
+    """
 
-    try:
-        await plugin.setup(
-            config={},
-            http_session=session,
-            progress=progress,
-            cache_dir=f"{state_dir}/cache/{source_name}",
+    def __init__(
+        self,
+        ctx: EnrichmentContext,
+        source_name: str,
+        stats: RunStats,
+        progress: ProgressTracker,
+        batch_size: int = 100,
+        dry_run: bool = False,
+        metrics: Optional[RunMetrics] = None,
+        lease: Optional[WorkLease] = None,
+    ):
+        self.ctx = ctx
+        self.source_name = source_name
+        self.stats = stats
+        self.progress = progress
+        self.metrics = metrics or RunMetrics(source_name)
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.lease = lease
+        self.enrich: list[tuple] = []
+        self.sources: list[tuple[str, str, str, str]] = []
+        self.photos: list[tuple[str, str, str | None, str]] = []
+        # (index entry, INSERT_VICTIM tuple, record)
+        self.victims: list[tuple[dict, tuple, ExternalVictim]] = []
+        # Records whose INSERT conflicted, to be matched again
+        self.rematch: list[ExternalVictim] = []
+        # One flush at a time: _match_flushed (from another source's task)
+        # may flush this writer while its own flush is in flight
+        self._flush_lock = asyncio.Lock()
+
+    @property
+    def full(self) -> bool:
+        return max(
+            len(self.enrich),
+            len(self.sources),
+            len(self.photos),
+            len(self.victims),
+            len(self.progress.pending_ids),
+            len(self.lease.finished) if self.lease else 0,
+        ) >= self.batch_size
+
+    def add_new_victim(self, ext: ExternalVictim) -> bool:
+        """Queue an unmatched victim for import. False if its slug is taken."""
+        slug = make_slug(
+            ext.name_latin or "unknown",
+            ext.date_of_birth.year if ext.date_of_birth else None,
+        )
+        if slug in self.ctx.index.by_slug:
+            # INSERT ... ON CONFLICT (slug) DO NOTHING would drop it anyway
+            return False
+        city_id = resolve_city_id(ext.place_of_death, self.ctx.city_resolver)
+        victim = pending_victim(ext, slug, city_id, self.source_name)
+        add_victim(self.ctx.index, victim)
+        self.ctx.pending_victims[slug] = self
+        self.victims.append(
+            (victim, new_victim_row(ext, slug, city_id, self.source_name), ext)
         )
+        return True
+
+    async def flush(self) -> None:
+        """Write all buffered batches and the progress checkpoint atomically.
+
+        Flushes of one writer run one after another. The buffers and
+        pending ids are snapshotted before the first write ``await``, so
+        records queued while the write is in flight land in the next batch.
+        """
+        async with self._flush_lock:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        enrich, self.enrich = self.enrich, []
+        sources, self.sources = self.sources, []
+        photos, self.photos = self.photos, []
+        victims, self.victims = self.victims, []
+        # Records waiting to be matched again are not done yet
+        waiting = {ext.source_id for ext in self.rematch}
+        processed = [
+            sid for sid in self.progress.pending_ids if sid not in waiting
+        ]
+        checkpoint = self.progress.checkpoint
+        units = self.lease.finished if self.lease and not waiting else []
+
+        ctx = self.ctx
+        timed = self.metrics.stage
+        existing: list[dict] = []
+        if self.dry_run:
+            ids: list[str | None] = [f"dry-run:{v['slug']}" for v, _, _ in victims]
+        else:
+            with timed("db.lock_wait"):
+                await ctx.write_lock.acquire()
+            try:
+                async with ctx.pool.acquire() as conn:
+                    async with conn.transaction():
+                        ids = await self._write(
+                            conn, enrich, sources, photos, victims
+                        )
+                        conflicts = {
+                            ext.source_id
+                            for (_, _, ext), new_id in zip(victims, ids)
+                            if new_id is None
+                        }
+                        if conflicts:
+                            # Not done until matched again: keep their ids
+                            # (and this batch's units) for the next flush
+                            existing = await load_victims_by_slug(conn, [
+                                v["slug"]
+                                for (v, _, _), new_id in zip(victims, ids)
+                                if new_id is None
+                            ])
+                            processed = [
+                                sid for sid in processed if sid not in conflicts
+                            ]
+                            units = []
+                        with timed("db.progress"):
+                            await save_progress(
+                                conn,
+                                self.source_name,
+                                processed,
+                                checkpoint,
+                                stats_snapshot(self.stats),
+                                self.lease.worker if self.lease else None,
+                            )
+                            if units:
+                                await complete_units(
+                                    conn, self.source_name, self.lease.worker, units
+                                )
+            except BaseException:
+                # Nothing was written: forget the queued victims, so that
+                # no other record matches (and waits for) a victim that
+                # will never get an id
+                for victim, _, _ in victims:
+                    if ctx.pending_victims.get(victim["slug"]) is self:
+                        del ctx.pending_victims[victim["slug"]]
+                    remove_victim(ctx.index, victim)
+                raise
+            finally:
+                ctx.write_lock.release()
+
+        self.progress.commit(processed)
+        if units:
+            self.lease.commit(units)
+
+        for (victim, _, ext), new_id in zip(victims, ids):
+            ctx.pending_victims.pop(victim["slug"], None)
+            if new_id is None:
+                # Slug inserted by another process since the index was loaded
+                remove_victim(ctx.index, victim)
+                self.rematch.append(ext)
+                continue
+            victim["id"] = new_id
+            ctx.index.by_id[new_id] = victim
+        for victim in existing:
+            if victim["slug"] not in ctx.index.by_slug:
+                add_victim(ctx.index, victim)
+
+        if not self.dry_run:
+            with timed("progress_save"):
+                self.progress.save(self.stats)
+
+    async def _write(
+        self,
+        conn: asyncpg.Connection,
+        enrich: list[tuple],
+        sources: list[tuple[str, str, str, str]],
+        photos: list[tuple[str, str, str | None, str]],
+        victims: list[tuple[dict, tuple, ExternalVictim]],
+    ) -> list[str | None]:
+        """Run the batch statements on ``conn``; returns new victim ids."""
+        timed = self.metrics.stage
+        ids: list[str | None] = []
+        if enrich:
+            with timed("db.enrich"):
+                await batch_enrich(conn, enrich, self.batch_size)
+        if sources:
+            with timed("db.sources"):
+                await batch_insert_sources(conn, sources, self.batch_size)
+        if photos:
+            with timed("db.photos"):
+                await batch_insert_photos(conn, photos, self.batch_size)
+        if victims:
+            with timed("db.victims"):
+                ids = await batch_insert_victims(conn, [row for _, row, _ in victims])
+            self.stats.new_imported += sum(1 for i in ids if i is not None)
+        return ids
+
+
+async def _match_flushed(ext: ExternalVictim, ctx: EnrichmentContext) -> MatchResult:
+    """Match, flushing first if the best match is a queued new victim.
+
+    A queued victim that its writer's flush did not write (the flush
+    failed, e.g. in another source's task) is dropped from the index, so
+    every pass makes progress.
+    """
+    result = match(ext, ctx.index)
+    while result.matched and result.victim["id"] is None:
+        victim = result.victim
+        writer = ctx.pending_victims.get(victim["slug"])
+        if writer is None:
+            break
+        try:
+            await writer.flush()
+        except Exception as e:
+            log.warning(f"Flush of {writer.source_name} failed: {e}")
+        if victim["id"] is None and ctx.pending_victims.get(victim["slug"]) is writer:
+            del ctx.pending_victims[victim["slug"]]
+            remove_victim(ctx.index, victim)
+        result = match(ext, ctx.index)
+    return result
+
+
+async def enrich_source(
+    ctx: EnrichmentContext,
+    source_name: str,
+    state_dir: str,
+    mode: str = "enrich",
+    dry_run: bool = False,
+    limit: Optional[int] = None,
+    batch_size: int = 100,
+    resume: bool = False,
+    verbose: bool = False,
+    metrics: Optional[RunMetrics] = None,
+    source_config: Optional[dict[str, dict]] = None,
+    distributed: bool = False,
+) -> RunStats:
+    """Stream one source through match/enrich against a loaded context.
 
-        enrich_batch: list[tuple] = []
-        source_batch: list[tuple[str, str, str, str]] = []
-        photo_batch: list[tuple[str, str, str | None, str]] = []
-        new_victims: list[ExternalVictim] = []
-        field_counts: dict[str, int] = {}
+    The index and URL lookups in ``ctx`` are updated in place, so sources
+    running concurrently on the same context see each other's additions.
+    Check-and-add on them never spans an ``await``, which keeps the updates
+    atomic on the event loop.
 
-        # 3. Stream external victims
-        log.info(f"Fetching from {plugin.full_name}...")
-        async for ext in plugin.fetch_all():
-            if limit and stats.processed >= limit:
-                break
+    With ``distributed`` the plugin's work units are leased from the DB
+    (see ``pipeline.leasing``) instead of crawling with ``fetch_all()``.
+    """
+    metrics = metrics or RunMetrics(source_name)
+    with use_metrics(metrics):
+        try:
+            return await _enrich_source(
+                ctx, source_name, state_dir, mode, dry_run, limit,
+                batch_size, resume, verbose, metrics,
+                (source_config or {}).get(source_name, {}), distributed,
+            )
+        finally:
+            metrics.finish()
+            profiling.snapshot(source_name)
 
-            stats.processed += 1
 
-            # 4. Match against index
-            result = match(ext, index)
+async def _enrich_source(
+    ctx: EnrichmentContext,
+    source_name: str,
+    state_dir: str,
+    mode: str,
+    dry_run: bool,
+    limit: Optional[int],
+    batch_size: int,
+    resume: bool,
+    verbose: bool,
+    metrics: RunMetrics,
+    config: dict,
+    distributed: bool = False,
+) -> RunStats:
+    stats = RunStats()
+    index = ctx.index
+    photo_urls = ctx.photo_urls
+    city_resolver = ctx.city_resolver
+    import_new = mode in ("import-new", "full")
 
-            if result.matched:
-                stats.matched += 1
-                victim = result.victim
+    # 1. Initialize plugin and restore durable progress
+    plugin_cls = get_plugin(source_name)
+    plugin = plugin_cls()
+    progress = ProgressTracker(source_name, state_dir)
+
+    if distributed and (dry_run or ctx.pool is None):
+        raise ValueError("A distributed run needs the database (no dry run)")
+    # Workers of a distributed run join the shared crawl, never reset it
+    if not resume and not distributed:
+        progress.reset()
+        if not dry_run:
+            await reset_progress(ctx.pool, source_name)
+    elif ctx.pool is not None:
+        durable = await load_progress(ctx.pool, source_name)
+        if durable is not None:
+            progress.restore(*durable)
+        log.info(
+            f"[{source_name}] Resuming after {progress.processed_count} "
+            f"processed records"
+        )
+
+    session = create_session()
+    lease = WorkLease(ctx.pool, source_name) if distributed else None
+    writer = BatchWriter(
+        ctx, source_name, stats, progress, batch_size, dry_run, metrics, lease
+    )
 
-                # 5a. Compute enrichment
+    async def handle(ext: ExternalVictim) -> None:
+        """Match one record and queue its writes."""
+        # 3. Match against index
+        with metrics.stage("match"):
+            result = await _match_flushed(ext, ctx)
+
+        if result.matched:
+            stats.matched += 1
+            victim = result.victim
+            vid = str(victim["id"])
+
+            # 4a. Compute enrichment
+            with metrics.stage("enrich"):
                 update = compute_enrichment(victim, ext)
-                if update:
-                    # Append resolved city_id ($18) to the tuple
-                    city_id = resolve_city_id(
-                        ext.place_of_death, city_resolver
+                n_fields = count_new_fields(victim, ext) if update else 0
+            if update:
+                # Append resolved city_id ($18) to the tuple
+                city_id = resolve_city_id(
+                    ext.place_of_death, city_resolver
+                )
+                writer.enrich.append(update + (city_id,))
+                writer.sources.append((
+                    vid,
+                    ext.source_url,
+                    ext.source_name,
+                    ext.source_type,
+                ))
+                add_source_url(index, vid, ext.source_url)
+                stats.enriched += 1
+                stats.fields_updated += n_fields
+
+                if verbose:
+                    log.info(
+                        f"  ENRICH {victim['slug']} "
+                        f"(+{n_fields} fields, score={result.score})"
                     )
-                    enrich_batch.append(update + (city_id,))
-                    source_batch.append((
-                        str(victim["id"]),
+            # Add photo if available and not already present
+            if ext.photo_url:
+                existing_photos = photo_urls.setdefault(vid, set())
+                if ext.photo_url not in existing_photos:
+                    credit = ext.source_name if ext.source_name else None
+                    writer.photos.append((vid, ext.photo_url, credit, "portrait"))
+                    existing_photos.add(ext.photo_url)
+                    stats.photos_added += 1
+
+            if not update:
+                # Source URL still might be new
+                existing = index.source_urls.get(vid, set())
+                if ext.source_url not in existing:
+                    writer.sources.append((
+                        vid,
                         ext.source_url,
                         ext.source_name,
                         ext.source_type,
                     ))
-                    stats.enriched += 1
-                    stats.fields_updated += count_new_fields(victim, ext)
-
-                    if verbose:
-                        n = count_new_fields(victim, ext)
-                        log.info(
-                            f"  ENRICH {victim['slug']} "
-                            f"(+{n} fields, score={result.score})"
-                        )
-                # Add photo if available and not already present
-                if ext.photo_url:
-                    vid = str(victim["id"])
-                    existing_photos = photo_urls.get(vid, set())
-                    if ext.photo_url not in existing_photos:
-                        credit = ext.source_name if ext.source_name else None
-                        photo_batch.append((vid, ext.photo_url, credit, "portrait"))
-                        existing_photos.add(ext.photo_url)
-                        photo_urls.setdefault(vid, set()).add(ext.photo_url)
-                        stats.photos_added += 1
-
-                if not update:
-                    # Source URL still might be new
-                    vid = str(victim["id"])
-                    existing = source_urls.get(vid, set())
-                    if ext.source_url not in existing:
-                        source_batch.append((
-                            vid,
-                            ext.source_url,
-                            ext.source_name,
-                            ext.source_type,
-                        ))
-                        stats.sources_added += 1
-                    else:
-                        stats.no_new_data += 1
-
-            elif result.ambiguous:
-                stats.ambiguous += 1
-                if verbose:
-                    log.warning(
-                        f"  AMBIGUOUS {ext.name_latin} "
-                        f"(score={result.score}): "
-                        f"{[c['slug'] for c in result.candidates]}"
-                    )
-
-            else:
-                stats.unmatched += 1
-                if mode in ("import-new", "full"):
-                    new_victims.append(ext)
-                    if verbose:
-                        log.info(f"  NEW {ext.name_latin}")
-
-            # 6. Batch commit
-            if len(enrich_batch) >= batch_size:
-                if not dry_run:
-                    await batch_enrich(pool, enrich_batch, batch_size)
-                    await batch_insert_sources(pool, source_batch, batch_size)
-                    if photo_batch:
-                        await batch_insert_photos(pool, photo_batch, batch_size)
-                enrich_batch.clear()
-                source_batch.clear()
-                photo_batch.clear()
-                progress.save(stats)
-                log.info(
-                    f"  Progress: {stats.processed} processed, "
-                    f"{stats.enriched} enriched"
+                    add_source_url(index, vid, ext.source_url)
+                    stats.sources_added += 1
+                else:
+                    stats.no_new_data += 1
+
+        elif result.ambiguous:
+            stats.ambiguous += 1
+            if verbose:
+                log.warning(
+                    f"  AMBIGUOUS {ext.name_latin} "
+                    f"(score={result.score}): "
+                    f"{[c['slug'] for c in result.candidates]}"
                 )
 
-        # 7. Final flush
-        if enrich_batch and not dry_run:
-            await batch_enrich(pool, enrich_batch, batch_size)
-        if source_batch and not dry_run:
-            await batch_insert_sources(pool, source_batch, batch_size)
-        if photo_batch and not dry_run:
-            await batch_insert_photos(pool, photo_batch, batch_size)
-
-        if new_victims and not dry_run and mode in ("import-new", "full"):
-            tuples = []
-            for ext in new_victims:
-                slug = make_slug(
-                    ext.name_latin or "unknown",
-                    ext.date_of_birth.year if ext.date_of_birth else None,
-                )
-                city_id = resolve_city_id(
-                    ext.place_of_death, city_resolver
-                )
-                tuples.append((
-                    slug,
-                    ext.name_latin or "Unknown",
-                    ext.name_farsi,
-                    ext.date_of_birth,
-                    ext.place_of_birth,
-                    ext.gender,
-                    ext.religion,
-                    ext.photo_url,
-                    ext.occupation,
-                    ext.education,
-                    ext.date_of_death,
-                    ext.age_at_death,
-                    ext.place_of_death,
-                    ext.province,
-                    ext.cause_of_death,
-                    ext.circumstances_en,
-                    ext.event_context,
-                    ext.responsible_forces,
-                    source_name,
-                    city_id,
-                ))
-            stats.new_imported = await batch_insert_victims(pool, tuples)
+        else:
+            stats.unmatched += 1
+            if import_new and writer.add_new_victim(ext) and verbose:
+                log.info(f"  NEW {ext.name_latin}")
+
+    async def rematch() -> None:
+        """Match again the records whose new victim lost its slug to
+        another process (see BatchWriter)."""
+        while writer.rematch:
+            ext = writer.rematch.pop(0)
+            stats.unmatched -= 1
+            await handle(ext)
+
+    try:
+        await plugin.setup(
+            config=config,
+            http_session=session,
+            progress=progress,
+            cache_dir=f"{state_dir}/cache/{source_name}",
+            dry_run=dry_run,
+        )
+
+        # 2. Stream external victims
+        log.info(f"[{source_name}] Fetching from {plugin.full_name}...")
+        if lease is not None:
+            stream = _leased_records(plugin, lease)
+        else:
+            stream = plugin.fetch_all()
+        # Closed right away on an early break (--limit), so a download the
+        # plugin streams gives back its connection and host slot
+        async with aclosing(stream):
+            async for ext in stream:
+                if limit and stats.processed >= limit:
+                    break
+
+                stats.processed += 1
+
+                await handle(ext)
+
+                # Durable once the flush containing its writes commits
+                progress.mark_processed(ext.source_id)
+                metrics.gauge("queue.enrich_batch", len(writer.enrich))
+                metrics.gauge("queue.new_victims", len(writer.victims))
+
+                # 5. Batch commit
+                if writer.full:
+                    await writer.flush()
+                    await rematch()
+                    log.info(
+                        f"  [{source_name}] Progress: {stats.processed} processed, "
+                        f"{stats.enriched} enriched, {stats.new_imported} imported"
+                    )
 
-        progress.save(stats)
+        # 6. Final flush
+        await writer.flush()
+        while writer.rematch:
+            await rematch()
+            await writer.flush()
         await plugin.teardown()
+        if lease is not None:
+            units = await count_units(ctx.pool, source_name)
+            log.info(f"[{source_name}] Work units: {units}")
 
     finally:
+        if lease is not None:
+            await lease.stop()
         await session.close()
-        await close_pool()
 
     return stats
 
 
+async def _leased_records(
+    plugin: SourcePlugin, lease: WorkLease
+) -> AsyncIterator[ExternalVictim]:
+    """fetch_all() of a distributed run: the plugin's units, leased one by one.
+
+    A unit is finished only after the consumer has processed its last
+    record — the generator resumes after the loop body — so the flush that
+    marks it done also carries all of its writes. A unit whose fetch
+    failed is released instead, to be leased again.
+    """
+    units = await plugin.work_units()
+    if units is None:
+        raise ValueError(f"{plugin.name} does not support distributed runs")
+    await lease.enqueue(units)
+    await lease.start()
+    while (unit := await lease.next()) is not None:
+        try:
+            async with aclosing(plugin.fetch_unit(unit)) as records:
+                async for ext in records:
+                    yield ext
+        except UnitFailed as e:
+            log.warning(f"[{plugin.name}] {unit}: {e}, releasing it")
+            await lease.release(unit)
+            continue
+        lease.finish(unit)
+
+
 async def run_all_sources(
-    database_url: str, state_dir: str, **kwargs
+    database_url: str,
+    state_dir: str,
+    concurrency: int = 1,
+    metrics_textfile: Optional[str] = None,
+    **kwargs,
 ) -> dict[str, RunStats]:
-    """Run enrichment for all registered plugins."""
-    results = {}
-    for name in list_plugins():
-        log.info(f"\n{'='*60}\nSource: {name}\n{'='*60}")
+    """Run enrichment for all registered plugins on one shared context.
+
+    The pool and index are loaded once; up to ``concurrency`` sources run
+    at the same time (each plugin talks to a different host).
+    """
+    names = list_plugins()
+    results: dict[str, RunStats] = {}
+    source_metrics: dict[str, RunMetrics] = {}
+    sem = asyncio.Semaphore(max(1, concurrency))
+    shared = RunMetrics("shared")
+
+    pool = await get_pool(database_url)
+    try:
+        with use_metrics(shared):
+            ctx = await load_context(pool)
+
+        async def run_one(name: str) -> None:
+            async with sem:
+                log.info(f"\n{'='*60}\nSource: {name}\n{'='*60}")
+                metrics = source_metrics[name] = RunMetrics(name)
+                try:
+                    results[name] = await enrich_source(
+                        ctx, name, state_dir, metrics=metrics, **kwargs
+                    )
+                except OfflineMiss:
+                    raise
+                except Exception as e:
+                    log.error(f"Source {name} failed: {e}")
+                    results[name] = RunStats(errors=1)
+
+        tasks = [asyncio.create_task(run_one(name)) for name in names]
         try:
-            stats = await run_enrichment(
-                name, database_url, state_dir, **kwargs
-            )
-            results[name] = stats
-        except Exception as e:
-            log.error(f"Source {name} failed: {e}")
-            results[name] = RunStats(errors=1)
-    return results
+            await asyncio.gather(*tasks)
+        finally:
+            # An OfflineMiss ends the run: stop the other sources before
+            # the pool and stores are closed under them
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        await close_pool()
+        close_stores()
+
+    _write_reports(
+        state_dir,
+        shared,
+        {name: (source_metrics[name], results[name]) for name in names},
+        metrics_textfile,
+    )
+    return {name: results[name] for name in names}
@@ -2,13 +2,25 @@
 
 from __future__ import annotations
 
+import json
+import os
 from abc import ABC, abstractmethod
-from typing import AsyncIterator, Optional
+from typing import Any, AsyncIterator, Optional
 
 import aiohttp
 
 from ..db.models import ExternalVictim
+from ..utils.files import atomic_write
+from ..utils.http import CachePolicy, set_cache_policy
 from ..utils.progress import ProgressTracker
+from ..utils.ratelimit import DEFAULT_LIMIT, HostLimit, configure_host, host_of
+
+
+class UnitFailed(Exception):
+    """fetch_unit() could not load its unit; it is retried, not marked done.
+
+    Also raised by work_units() when the unit list cannot be built.
+    """
 
 
 class SourcePlugin(ABC):
@@ -17,6 +29,11 @@ class SourcePlugin(ABC):
     session: aiohttp.ClientSession
     progress: ProgressTracker
     cache_dir: str
+    # Default politeness per host; overridable per source in enricher.toml
+    rate_limit: HostLimit = DEFAULT_LIMIT
+    # When cached responses are revalidated; `cache_ttl` in enricher.toml
+    # replaces it with a single TTL for every URL of the source
+    cache_policy: CachePolicy = CachePolicy()
 
     @property
     @abstractmethod
@@ -42,23 +59,89 @@ class SourcePlugin(ABC):
         ...
         yield  # type: ignore  # make it a generator
 
+    @property
+    def hosts(self) -> list[str]:
+        """Hosts this plugin fetches from (rate-limited per host)."""
+        return [host_of(self.base_url)]
+
     async def fetch_detail(self, source_id: str) -> Optional[ExternalVictim]:
         """Fetch a single victim (optional, for targeted enrichment)."""
         return None
 
+    async def work_units(self) -> Optional[list[str]]:
+        """Units of the crawl in fetch_all() order, for distributed runs.
+
+        None (the default) means the plugin only supports fetch_all().
+        Processing every unit with fetch_unit() must yield the same victims
+        as fetch_all(). Raises UnitFailed if the list cannot be built (an
+        empty list would end the distributed run as if it were complete).
+        """
+        return None
+
+    async def fetch_unit(self, unit: str) -> AsyncIterator[ExternalVictim]:
+        """Yield the victims of one unit from work_units().
+
+        Raises UnitFailed if the unit could not be loaded.
+        """
+        raise NotImplementedError(f"{self.name} has no work units")
+        yield  # type: ignore  # make it a generator
+
     async def setup(
         self,
         config: dict,
         http_session: aiohttp.ClientSession,
         progress: ProgressTracker,
         cache_dir: str = "",
+        dry_run: bool = False,
     ) -> None:
-        """Called once before fetch_all(). Inject dependencies."""
+        """Called once before fetch_all(). Inject dependencies.
+
+        Plugins that keep state of their own must not persist it when
+        ``dry_run`` is set.
+        """
         self.config = config
         self.session = http_session
         self.progress = progress
         self.cache_dir = cache_dir
+        self.dry_run = dry_run
+        try:
+            limit = HostLimit.from_config(config, self.rate_limit)
+        except ValueError as e:
+            raise ValueError(f"[{self.name}] {e}") from None
+        for host in self.hosts:
+            configure_host(host, limit)
+        if cache_dir:
+            policy = self.cache_policy
+            if "cache_ttl" in config:
+                policy = CachePolicy(ttl=config["cache_ttl"])
+            set_cache_policy(cache_dir, policy)
 
     async def teardown(self) -> None:
         """Cleanup after processing."""
         pass
+
+    # ─── Plugin state ───────────────────────────────────────────────────────
+    # Small JSON files next to the progress files, kept across runs (a
+    # fresh run resets progress, not these). Save them in teardown(): the
+    # orchestrator calls it after the final flush.
+
+    def _state_path(self, kind: str) -> str:
+        return os.path.join(
+            os.path.dirname(self.progress.file_path), f"{self.name}.{kind}"
+        )
+
+    def load_state(self, kind: str, default: Any = None) -> Any:
+        """Load the plugin's ``kind`` state, or ``default`` if there is none."""
+        path = self._state_path(kind)
+        if not os.path.exists(path):
+            return default
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_state(self, kind: str, data: Any) -> None:
+        """Atomically replace the plugin's ``kind`` state (not in dry runs)."""
+        if self.dry_run:
+            return
+        atomic_write(
+            self._state_path(kind), json.dumps(data, separators=(",", ":"))
+        )
@@ -2,22 +2,33 @@
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
 import re
 from datetime import datetime
 from typing import AsyncIterator, Optional
 
+import aiohttp
+
 from ..db.models import ExternalVictim
-from ..utils.http import fetch_with_retry
+from ..utils.http import DAY, CachePolicy, fetch_with_retry
+from ..utils.parsing import parse
+from ..utils.progress import ProgressTracker, Watermark
 from ..utils.provinces import extract_province
+from ..utils.ratelimit import HostLimit
 from . import register
-from .base import SourcePlugin
+from .base import SourcePlugin, UnitFailed
 
 log = logging.getLogger("enricher.boroumand")
 
 BASE_URL = "https://www.iranrights.org"
 BROWSE_URL = BASE_URL + "/memorial/browse/date/{page}"
 TOTAL_PAGES = 545
+PAGES_AHEAD = 4  # browse pages loaded concurrently (`pages_ahead` in config)
+# Incremental runs stop after this many browse pages without a new or
+# changed card (`unchanged_pages` in config)
+UNCHANGED_PAGES = 2
 
 
 def parse_browse_page(html: str) -> list[dict]:
@@ -59,59 +70,71 @@ def parse_browse_page(html: str) -> list[dict]:
     return entries
 
 
+# One scan over a story page for the fields of parse_detail_en
+_DETAIL_TOKEN_RE = re.compile(
+    r"<h1 class='page-top'>(?P<h1>[^<]+)</h1>"
+    r'|<img[^>]+src="(?P<photo>/actorphotos/[^"]+)"'
+    r"|<em>(?P<label>[^<]+)</em>\s*(?P<value>[^<]+)"
+    r"|<h2[^>]*>About this Case</h2>\s*"
+)
+_NARRATIVE_END_RE = re.compile(r"<h2|<footer|<div\s+id=")
+
+DETAIL_FIELDS = {
+    "Age": "age",
+    "Religion": "religion",
+    "Date of Killing": "date_of_killing",
+    "Location of Killing": "location",
+    "Mode of Killing": "mode_of_killing",
+    "Date of Birth": "date_of_birth",
+    "Place of Birth": "place_of_birth",
+    "Occupation": "occupation",
+}
+
+
 def parse_detail_en(html: str) -> dict:
     """Parse English detail page fields."""
     data = {}
-
-    h1 = re.search(r"<h1 class='page-top'>([^<]+)</h1>", html)
-    if h1:
-        data["name"] = h1.group(1).strip()
-
-    photo = re.search(r'<img[^>]+src="(/actorphotos/[^"]+)"', html)
-    if photo:
-        data["photo_url"] = photo.group(1)
-
-    field_map = {
-        "Age": "age",
-        "Religion": "religion",
-        "Date of Killing": "date_of_killing",
-        "Location of Killing": "location",
-        "Mode of Killing": "mode_of_killing",
-        "Date of Birth": "date_of_birth",
-        "Place of Birth": "place_of_birth",
-        "Occupation": "occupation",
-    }
-
-    for m in re.finditer(r"<em>([^<]+)</em>\s*([^<]+)", html):
-        label = m.group(1).strip().rstrip(":")
-        value = m.group(2).strip()
-        if value and value != "---" and label in field_map:
-            data[field_map[label]] = value
-
-    narr = re.search(
-        r"<h2[^>]*>About this Case</h2>\s*(.*?)(?=<h2|<footer|<div\s+id=)",
-        html,
-        re.DOTALL,
-    )
-    if narr:
-        text = re.sub(r"<[^>]+>", " ", narr.group(1))
-        text = re.sub(r"&\w+;", " ", text)
-        text = re.sub(r"\s+", " ", text).strip()
-        text = re.sub(
-            r"Correct/?\s*Complete This Entry\s*[❯>]?\s*", "", text
-        ).strip()
-        text = re.sub(
-            r"The story of .+?is not complete\..+?We appreciate your support\.?\s*",
-            "",
-            text,
-            flags=re.DOTALL,
-        ).strip()
-        if len(text) > 50:
-            data["narrative"] = text[:5000]
+    narrative_at = None
+
+    for m in _DETAIL_TOKEN_RE.finditer(html):
+        kind = m.lastgroup
+        if kind == "h1":
+            data.setdefault("name", m.group("h1").strip())
+        elif kind == "photo":
+            data.setdefault("photo_url", m.group("photo"))
+        elif kind == "value":
+            label = m.group("label").strip().rstrip(":")
+            value = m.group("value").strip()
+            if value and value != "---" and label in DETAIL_FIELDS:
+                data[DETAIL_FIELDS[label]] = value
+        elif narrative_at is None:
+            narrative_at = m.end()
+
+    if narrative_at is not None:
+        end = _NARRATIVE_END_RE.search(html, narrative_at)
+        if end:
+            narrative = _clean_narrative(html[narrative_at:end.start()])
+            if len(narrative) > 50:
+                data["narrative"] = narrative[:5000]
 
     return data
 
 
+def _clean_narrative(text: str) -> str:
+    text = re.sub(r"<[^>]+>", " ", text)
+    text = re.sub(r"&\w+;", " ", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    text = re.sub(
+        r"Correct/?\s*Complete This Entry\s*[❯>]?\s*", "", text
+    ).strip()
+    return re.sub(
+        r"The story of .+?is not complete\..+?We appreciate your support\.?\s*",
+        "",
+        text,
+        flags=re.DOTALL,
+    ).strip()
+
+
 def parse_detail_fa(html: str) -> dict:
     """Parse Farsi detail page — extract Farsi name."""
     data = {}
@@ -123,6 +146,12 @@ def parse_detail_fa(html: str) -> dict:
     return data
 
 
+def card_fingerprint(entry: dict) -> str:
+    """Fingerprint of a browse card: name, mode of killing and photo."""
+    key = "\0".join(entry.get(k) or "" for k in ("name", "mode", "photo_url"))
+    return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+
 def parse_boroumand_date(date_str: str | None) -> datetime | None:
     """Parse date like 'December 12, 2022' or '2022-12-12'."""
     if not date_str:
@@ -135,11 +164,16 @@ def parse_boroumand_date(date_str: str | None) -> datetime | None:
     return None
 
 
-
 @register
 class BoroumandPlugin(SourcePlugin):
     """Abdorrahman Boroumand Center — Omid Memorial."""
 
+    rate_limit = HostLimit(rate=1.0)  # was a 0.8–1.2s sleep per request
+    # Story pages rarely change; browse pages gain new entries
+    cache_policy = CachePolicy(
+        ttl=30 * DAY, rules=((r"/memorial/browse", 1 * DAY),)
+    )
+
     @property
     def name(self) -> str:
         return "boroumand"
@@ -152,98 +186,254 @@ class BoroumandPlugin(SourcePlugin):
     def base_url(self) -> str:
         return BASE_URL
 
+    async def setup(
+        self,
+        config: dict,
+        http_session: aiohttp.ClientSession,
+        progress: ProgressTracker,
+        cache_dir: str = "",
+        dry_run: bool = False,
+    ) -> None:
+        await super().setup(config, http_session, progress, cache_dir, dry_run)
+        self.incremental = bool(config.get("incremental"))
+        # Card fingerprints of stories whose details were fetched: story id → fp
+        self.cards: dict[str, str] = self.load_state("cards", {})
+        self._cards_dirty = False
+
+    async def teardown(self) -> None:
+        # After the final flush: a crash before here only re-fetches stories
+        if self._cards_dirty:
+            self.save_state("cards", self.cards)
+            self._cards_dirty = False
+
     async def fetch_all(self) -> AsyncIterator[ExternalVictim]:
-        """Browse all pages, fetch EN+FA details, yield normalized victims."""
-        start_page = self.progress.get_checkpoint("browse_page", 1)
-
-        for page in range(start_page, TOTAL_PAGES + 1):
-            url = BROWSE_URL.format(page=page)
-            html = await fetch_with_retry(
-                self.session,
-                url,
-                rate_limit=(0.8, 1.2),
-                cache_dir=self.cache_dir,
-            )
-            if not html:
-                log.warning(f"Failed to fetch page {page}")
-                continue
-
-            entries = parse_browse_page(html)
-            if not entries:
-                log.info(f"Page {page}: no entries (end reached?)")
-                break
-
-            for entry in entries:
-                source_id = f"boroumand_{entry['id']}"
-                if self.progress.is_processed(source_id):
-                    continue
-
-                # Fetch EN detail
-                detail_url = f"{BASE_URL}/memorial/story/{entry['id']}/{entry['slug']}"
-                detail_html = await fetch_with_retry(
-                    self.session,
-                    detail_url,
-                    rate_limit=(0.8, 1.2),
-                    cache_dir=self.cache_dir,
-                )
-                en_data = parse_detail_en(detail_html) if detail_html else {}
-
-                # Fetch FA detail
-                fa_url = f"{BASE_URL}/fa/memorial/story/{entry['id']}/{entry['slug']}"
-                fa_html = await fetch_with_retry(
-                    self.session,
-                    fa_url,
-                    rate_limit=(0.8, 1.2),
-                    cache_dir=self.cache_dir,
+        """Browse all pages, fetch EN+FA details, yield normalized victims.
+
+        Up to ``pages_ahead`` browse pages (config, default PAGES_AHEAD)
+        are loaded at once, and finished pages wait in a buffer until every
+        earlier page is done, so victims are yielded strictly in browse
+        order. A page that fails to load is loaded once more; if it fails
+        again it is skipped and the ``browse_page`` checkpoint (the last
+        page before which every page is done) never passes it.
+
+        With ``incremental`` (config or ``enrich --incremental``) only
+        stories whose browse card is new or changed since their details
+        were last fetched are visited, and the walk stops after
+        ``unchanged_pages`` consecutive pages without any such card.
+        """
+        # Checkpoint is the last page before which every page is done
+        done = Watermark(self.progress.get_checkpoint("browse_page", 0))
+        ahead = max(1, int(self.config.get("pages_ahead", PAGES_AHEAD)))
+        stop_after = max(1, int(self.config.get("unchanged_pages", UNCHANGED_PAGES)))
+        pages = iter(range(done.value + 1, TOTAL_PAGES + 1))
+        running: dict[asyncio.Future, int] = {}
+        # Finished pages waiting for an earlier one; entries None = failed
+        loaded: dict[int, tuple[Optional[list[dict]], list]] = {}
+        retried: set[int] = set()
+        unchanged: set[int] = set()
+        next_page = done.value + 1  # next page to yield
+        end = TOTAL_PAGES + 1  # first page not to visit
+
+        def load(page: int) -> None:
+            running[asyncio.ensure_future(self._load_page(page))] = page
+
+        def schedule() -> None:
+            # Finished pages count too: `ahead` bounds the buffer as well
+            while len(running) + len(loaded) < ahead:
+                page = next(pages, None)
+                if page is None or page >= end:
+                    return
+                load(page)
+
+        def complete(page: int) -> None:
+            """Advance the checkpoint; in incremental mode stop after an
+            unchanged window."""
+            nonlocal end
+            self.progress.set_checkpoint("browse_page", done.complete(page))
+            if self.incremental and unchanged.issuperset(
+                range(page - stop_after + 1, page + 1)
+            ):
+                log.info(
+                    f"Page {page}: {stop_after} pages without new "
+                    f"or changed stories, stopping"
                 )
-                fa_data = parse_detail_fa(fa_html) if fa_html else {}
-
-                photo = en_data.get("photo_url") or entry.get("photo_url")
-                photo_full = f"{BASE_URL}{photo}" if photo and photo.startswith("/") else photo
-
-                dod = parse_boroumand_date(en_data.get("date_of_killing"))
-                dob = parse_boroumand_date(en_data.get("date_of_birth"))
-
-                age = None
-                if en_data.get("age"):
-                    try:
-                        age = int(re.search(r"\d+", en_data["age"]).group())
-                    except (ValueError, AttributeError):
-                        pass
-
-                yield ExternalVictim(
-                    source_id=source_id,
-                    source_name=self.full_name,
-                    source_url=detail_url,
-                    source_type="memorial_database",
-                    name_latin=en_data.get("name", entry["name"]),
-                    name_farsi=fa_data.get("name_farsi"),
-                    date_of_birth=dob,
-                    place_of_birth=en_data.get("place_of_birth"),
-                    gender=None,
-                    religion=en_data.get("religion"),
-                    photo_url=photo_full,
-                    occupation=en_data.get("occupation"),
-                    date_of_death=dod,
-                    age_at_death=age,
-                    place_of_death=en_data.get("location"),
-                    province=extract_province(en_data.get("location")),
-                    cause_of_death=en_data.get("mode_of_killing") or entry.get("mode"),
-                    circumstances_en=en_data.get("narrative"),
+                end = min(end, page + 1)
+
+        try:
+            schedule()
+            while running:
+                finished, _ = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED
                 )
+                for task in finished:
+                    page = running.pop(task)
+                    if page >= end:
+                        continue
+                    entries, stories = task.result()
+                    if entries is None and page not in retried:
+                        retried.add(page)
+                        load(page)
+                        continue
+                    if entries == []:
+                        log.info(f"Page {page}: no entries (end reached?)")
+                        end = min(end, page)
+                    loaded[page] = (entries, stories)
+
+                # Yield finished pages strictly in browse order
+                while next_page < end and next_page in loaded:
+                    page = next_page
+                    next_page += 1
+                    entries, stories = loaded.pop(page)
+                    if entries is None:
+                        # Never complete a page that was not loaded: the
+                        # checkpoint stays before it and a resume retries it
+                        log.warning(
+                            f"Page {page} failed again, checkpoint stays "
+                            f"at {done.value}"
+                        )
+                        continue
+                    if self.incremental and all(self._known(e) for e in entries):
+                        unchanged.add(page)
+                    for entry, en_data, fa_data in stories:
+                        yield self._to_victim(entry, en_data, fa_data)
+                        self._processed(entry, en_data)
+                    log.info(
+                        f"Page {page}/{TOTAL_PAGES}: {len(entries)} entries, "
+                        f"{len(stories)} visited"
+                    )
+                    complete(page)
+                for page in [p for p in loaded if p >= end]:
+                    del loaded[page]
+                schedule()
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def work_units(self) -> list[str]:
+        """One unit per browse page."""
+        return [f"page:{page}" for page in range(1, TOTAL_PAGES + 1)]
+
+    async def fetch_unit(self, unit: str) -> AsyncIterator[ExternalVictim]:
+        page = int(unit.removeprefix("page:"))
+        entries, stories = await self._load_page(page)
+        if entries is None:
+            raise UnitFailed(f"browse page {page} not loaded")
+        for entry, en_data, fa_data in stories:
+            yield self._to_victim(entry, en_data, fa_data)
+            self._processed(entry, en_data)
+        if entries:
+            log.info(f"Page {page}/{TOTAL_PAGES}: {len(entries)} entries")
+
+    async def _load_page(
+        self, page: int
+    ) -> tuple[Optional[list[dict]], list[tuple[dict, dict, dict]]]:
+        """Browse entries of a page (None if the fetch failed) and the parsed
+        (entry, EN data, FA data) of its stories to visit: not yet processed
+        and, in incremental mode, with a new or changed card.
+
+        All stories of the page are fetched concurrently (EN and FA in
+        parallel too); the host limiter bounds how many requests are
+        actually in flight, so this only hides latency, not politeness.
+        """
+        html = await fetch_with_retry(
+            self.session,
+            BROWSE_URL.format(page=page),
+            cache_dir=self.cache_dir,
+        )
+        if not html:
+            log.warning(f"Failed to fetch page {page}")
+            return None, []
+        entries = await parse(parse_browse_page, html)
+        todo = [
+            e for e in entries
+            if not self.progress.is_processed(f"boroumand_{e['id']}")
+            and not (self.incremental and self._known(e))
+        ]
+        tasks = [asyncio.ensure_future(self._story(entry)) for entry in todo]
+        try:
+            parsed = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return entries, [
+            (entry, en_data, fa_data)
+            for entry, (en_data, fa_data) in zip(todo, parsed)
+        ]
+
+    def _known(self, entry: dict) -> bool:
+        """Details were fetched for this exact card before."""
+        return self.cards.get(str(entry["id"])) == card_fingerprint(entry)
+
+    def _processed(self, entry: dict, en_data: dict) -> None:
+        """Mark a yielded story processed and remember its card."""
+        self.progress.mark_processed(f"boroumand_{entry['id']}")
+        if en_data:  # the EN page was fetched; retry the story otherwise
+            self.cards[str(entry["id"])] = card_fingerprint(entry)
+            self._cards_dirty = True
+
+    def _story_url(self, entry: dict, lang: str = "") -> str:
+        prefix = f"/{lang}" if lang else ""
+        return f"{BASE_URL}{prefix}/memorial/story/{entry['id']}/{entry['slug']}"
+
+    async def _story(self, entry: dict) -> tuple[dict, dict]:
+        """Parsed EN and FA detail data of one story ({} where a fetch failed)."""
+        en_html, fa_html = await self._fetch_story(entry)
+        return await asyncio.gather(
+            parse(parse_detail_en, en_html or ""),
+            parse(parse_detail_fa, fa_html or ""),
+        )
 
-                self.progress.mark_processed(source_id)
+    async def _fetch_story(self, entry: dict) -> tuple[Optional[str], Optional[str]]:
+        """EN and FA detail pages of one story (None where the fetch failed)."""
+        return await asyncio.gather(
+            fetch_with_retry(
+                self.session, self._story_url(entry), cache_dir=self.cache_dir,
+            ),
+            fetch_with_retry(
+                self.session, self._story_url(entry, "fa"), cache_dir=self.cache_dir,
+            ),
+        )
 
-            self.progress.set_checkpoint("browse_page", page)
-            log.info(f"Page {page}/{TOTAL_PAGES}: {len(entries)} entries")
+    def _to_victim(self, entry: dict, en_data: dict, fa_data: dict) -> ExternalVictim:
+        photo = en_data.get("photo_url") or entry.get("photo_url")
+        photo_full = f"{BASE_URL}{photo}" if photo and photo.startswith("/") else photo
+
+        dod = parse_boroumand_date(en_data.get("date_of_killing"))
+        dob = parse_boroumand_date(en_data.get("date_of_birth"))
+
+        age = None
+        if en_data.get("age"):
+            try:
+                age = int(re.search(r"\d+", en_data["age"]).group())
+            except (ValueError, AttributeError):
+                pass
+
+        return ExternalVictim(
+            source_id=f"boroumand_{entry['id']}",
+            source_name=self.full_name,
+            source_url=self._story_url(entry),
+            source_type="memorial_database",
+            name_latin=en_data.get("name", entry["name"]),
+            name_farsi=fa_data.get("name_farsi"),
+            date_of_birth=dob,
+            place_of_birth=en_data.get("place_of_birth"),
+            gender=None,
+            religion=en_data.get("religion"),
+            photo_url=photo_full,
+            occupation=en_data.get("occupation"),
+            date_of_death=dod,
+            age_at_death=age,
+            place_of_death=en_data.get("location"),
+            province=extract_province(en_data.get("location")),
+            cause_of_death=en_data.get("mode_of_killing") or entry.get("mode"),
+            circumstances_en=en_data.get("narrative"),
+        )
 
     async def fetch_detail(self, source_id: str) -> Optional[ExternalVictim]:
         """Fetch a single victim by Boroumand ID."""
         bid = source_id.replace("boroumand_", "")
         url = f"{BASE_URL}/memorial/story/{bid}/"
-        html = await fetch_with_retry(
-            self.session, url, rate_limit=(1.0, 2.0)
-        )
+        html = await fetch_with_retry(self.session, url)
         if not html:
             return None
         en_data = parse_detail_en(html)
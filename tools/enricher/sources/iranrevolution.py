@@ -2,14 +2,22 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+from collections import deque
 from datetime import date
 from typing import AsyncIterator, Optional
+from urllib.parse import quote
+
+import aiohttp
 
 from ..db.models import ExternalVictim
-from ..utils.http import fetch_with_retry
+from ..utils.http import CachePolicy, fetch_head, fetch_with_retry
+from ..utils.metrics import stage
 from ..utils.provinces import extract_province
+from ..utils.ratelimit import HostLimit, host_of
+from ..utils.progress import ProgressTracker
 from . import register
 from .base import SourcePlugin
 
@@ -24,13 +32,29 @@ SUPABASE_ANON_KEY = (
     "gfz_WC_0NtozHAP-CEERLKAYX-vDpH_yqOdd2s9HDgE"
 )
 API_URL = f"{SUPABASE_URL}/rest/v1/memorials"
+API_HEADERS = {
+    "apikey": SUPABASE_ANON_KEY,
+    "Authorization": f"Bearer {SUPABASE_ANON_KEY}",
+}
 PAGE_SIZE = 1000
+# Rows per range as a share of a page: the headroom absorbs rows inserted
+# during the run, so a range normally needs a single request
+RANGE_FILL = 0.9
+RANGES_AHEAD = 4  # id ranges fetched concurrently (`ranges_ahead` in config)
+
+# First id (inclusive) and end id (exclusive) of a range; None = open
+KeyRange = tuple[Optional[str], Optional[str]]
 
 
 @register
 class IranrevolutionPlugin(SourcePlugin):
     """iranrevolution.online — community memorial via Supabase API."""
 
+    rate_limit = HostLimit(rate=1.33)  # was a 0.5–1s sleep per page
+    # Rows change between runs: live runs always refetch, the cached
+    # copies (and the recorded row count) are there for --offline replay
+    cache_policy = CachePolicy(ttl=0)
+
     @property
     def name(self) -> str:
         return "iranrevolution"
@@ -43,25 +67,67 @@ class IranrevolutionPlugin(SourcePlugin):
     def base_url(self) -> str:
         return SITE_URL
 
+    @property
+    def hosts(self) -> list[str]:
+        return [host_of(API_URL)]
+
+    async def setup(
+        self,
+        config: dict,
+        http_session: aiohttp.ClientSession,
+        progress: ProgressTracker,
+        cache_dir: str = "",
+        dry_run: bool = False,
+    ) -> None:
+        await super().setup(config, http_session, progress, cache_dir, dry_run)
+        self.incremental = bool(config.get("incremental"))
+        # Newest date of death (YYYY-MM-DD) of the last complete run
+        self.latest_date: str = self.load_state("latest", {}).get("date", "")
+        self._latest_saved = self.latest_date
+
+    async def teardown(self) -> None:
+        if self.latest_date > self._latest_saved:
+            self.save_state("latest", {"date": self.latest_date})
+            self._latest_saved = self.latest_date
+
     async def fetch_all(self) -> AsyncIterator[ExternalVictim]:
-        """Paginate through Supabase REST API and yield victims."""
-        offset = 0
+        """Fetch the memorials in disjoint id ranges and yield victims.
 
-        while True:
-            data = await self._fetch_page(offset)
-            if data is None:
-                log.error(f"Failed to fetch page at offset {offset}")
-                break
-            if not data:
-                break
-
-            log.info(
-                f"iranrevolution.online: page at offset {offset}, "
-                f"{len(data)} records"
-            )
+        Rows are paged by keyset on ``id`` (``id=gt.<last id>``), so rows
+        inserted during a run never shift a page. The exact row count
+        (``Prefer: count=exact``) gives the number of ranges (RANGE_FILL
+        of a page each) and one probe per range finds its first id. Up to
+        ``ranges_ahead`` ranges (config, default RANGES_AHEAD) are fetched
+        at once and processed in id order. Without a count the table is
+        walked as one range.
+
+        With ``incremental`` (and a previous complete run) only rows dated
+        on or after the newest date of that run are requested.
+        """
+        since = self.latest_date if self.incremental else ""
+        filters = f"&date=gte.{since}" if since else ""
+        total = await self._count(filters)
+        starts = await self._range_starts(filters, total or 0)
+        ranges: list[KeyRange] = list(zip([None, *starts], [*starts, None]))
+        log.info(
+            f"iranrevolution.online: {'?' if total is None else total} records"
+            + (f" dated {since} or later" if since else "")
+            + f", {len(ranges)} ranges"
+        )
+
+        ahead = max(1, int(self.config.get("ranges_ahead", RANGES_AHEAD)))
+        complete = True
+        newest = ""
+        async for (first, _), rows in self._load_ranges(ranges, filters, ahead):
+            if rows is None:
+                log.error(f"Failed to fetch range from id {first or '(start)'}")
+                complete = False
+                continue
 
-            for record in data:
-                victim = self._parse_record(record)
+            for record in rows:
+                newest = max(newest, (record.get("date") or "")[:10])
+                with stage("parse"):
+                    victim = self._parse_record(record)
                 if victim is None:
                     continue
 
@@ -71,34 +137,105 @@ class IranrevolutionPlugin(SourcePlugin):
                 yield victim
                 self.progress.mark_processed(victim.source_id)
 
-            if len(data) < PAGE_SIZE:
-                break
-            offset += PAGE_SIZE
-
-    async def _fetch_page(self, offset: int) -> list[dict] | None:
-        """Fetch a page of memorials from the Supabase REST API."""
-        url = (
-            f"{API_URL}?select=*"
-            f"&order=date.desc"
-            f"&offset={offset}"
-            f"&limit={PAGE_SIZE}"
+        if complete:
+            # Every row is in: later runs can go incremental
+            self.latest_date = max(self.latest_date, newest)
+
+    async def _count(self, filters: str) -> Optional[int]:
+        """Exact number of rows matching ``filters`` (Content-Range total)."""
+        headers = await fetch_head(
+            self.session,
+            f"{API_URL}?select=id{filters}",
+            extra_headers={**API_HEADERS, "Prefer": "count=exact"},
+            cache_dir=self.cache_dir,
         )
-        headers = {
-            "apikey": SUPABASE_ANON_KEY,
-            "Authorization": f"Bearer {SUPABASE_ANON_KEY}",
-        }
+        total = (headers or {}).get("Content-Range", "").rpartition("/")[2]
+        if not total.isdigit():
+            log.warning("No exact row count, fetching as one range")
+            return None
+        return int(total)
+
+    async def _range_starts(self, filters: str, total: int) -> list[str]:
+        """First id of every range after the first, in id order.
+
+        A failed probe only merges two ranges: each range is walked by
+        keyset until it ends, however many rows it holds.
+        """
+        step = max(1, int(PAGE_SIZE * RANGE_FILL))
+        probes = [
+            self._fetch_page(
+                f"{API_URL}?select=id{filters}&order=id.asc"
+                f"&offset={offset}&limit=1"
+            )
+            for offset in range(step, total, step)
+        ]
+        rows = await asyncio.gather(*probes)
+        return [r[0]["id"] for r in rows if r]
+
+    async def _load_ranges(
+        self, ranges: list[KeyRange], filters: str, ahead: int
+    ) -> AsyncIterator[tuple[KeyRange, Optional[list[dict]]]]:
+        """(range, rows) in id order, with up to ``ahead`` ranges requested.
+
+        The host limiter bounds the requests actually in flight.
+        """
+        pending = iter(ranges)
+        running: deque[tuple[KeyRange, asyncio.Future]] = deque()
+        try:
+            while True:
+                while len(running) < ahead:
+                    key_range = next(pending, None)
+                    if key_range is None:
+                        break
+                    running.append((key_range, asyncio.ensure_future(
+                        self._load_range(*key_range, filters)
+                    )))
+                if not running:
+                    return
+                key_range, task = running.popleft()
+                yield key_range, await task
+        finally:
+            for _, task in running:
+                task.cancel()
+
+    async def _load_range(
+        self, first: Optional[str], end: Optional[str], filters: str
+    ) -> Optional[list[dict]]:
+        """All rows with ``first <= id < end`` (None bounds are open).
+
+        Pages by keyset: each page continues after the last id of the
+        previous one. None if a page could not be fetched.
+        """
+        rows: list[dict] = []
+        lower = f"&id=gte.{quote(str(first))}" if first is not None else ""
+        upper = f"&id=lt.{quote(str(end))}" if end is not None else ""
+        while True:
+            page = await self._fetch_page(
+                f"{API_URL}?select=*{filters}{lower}{upper}"
+                f"&order=id.asc&limit={PAGE_SIZE}"
+            )
+            if page is None:
+                return None
+            rows += page
+            if len(page) < PAGE_SIZE:
+                return rows
+            lower = f"&id=gt.{quote(str(page[-1]['id']))}"
+
+    async def _fetch_page(self, url: str) -> list[dict] | None:
+        """Fetch one page of rows from the Supabase REST API."""
         text = await fetch_with_retry(
             self.session,
             url,
-            rate_limit=(0.5, 1.0),
-            extra_headers=headers,
+            cache_dir=self.cache_dir,
+            extra_headers=API_HEADERS,
         )
         if not text:
             return None
         try:
-            return json.loads(text)
+            with stage("parse"):
+                return json.loads(text)
         except json.JSONDecodeError:
-            log.error(f"Invalid JSON at offset {offset}")
+            log.error(f"Invalid JSON from {url}")
             return None
 
     def _parse_record(self, record: dict) -> ExternalVictim | None:
@@ -6,12 +6,15 @@ import csv
 import io
 import logging
 import re
+from contextlib import aclosing
 from datetime import date
 from typing import AsyncIterator, Optional
 
 from ..db.models import ExternalVictim
-from ..utils.http import fetch_with_retry
+from ..utils.http import DAY, CachePolicy, StreamInterrupted, fetch_stream
 from ..utils.provinces import extract_province
+from ..utils.ratelimit import HostLimit
+from ..utils.streaming import iter_csv_dicts
 from . import register
 from .base import SourcePlugin
 
@@ -21,26 +24,28 @@ SITE_URL = "https://iranvictims.com"
 CSV_URL = f"{SITE_URL}/victims.csv"
 
 
+def parse_csv_row(row: dict) -> dict | None:
+    """Normalize one raw CSV row; None if it has no card ID."""
+    card_id = (row.get("Card ID") or "").strip()
+    if not card_id:
+        return None
+    return {
+        "card_id": card_id,
+        "name_en": (row.get("English Name") or "").strip(),
+        "name_fa": (row.get("Persian Name") or "").strip() or None,
+        "age": (row.get("Age") or "").strip() or None,
+        "location": (row.get("Location of Death") or "").strip() or None,
+        "date": (row.get("Date of Death") or "").strip() or None,
+        "status": (row.get("Status") or "").strip().lower(),
+        "source_urls": (row.get("Source URLs") or "").strip() or None,
+        "notes": (row.get("Notes") or "").strip() or None,
+    }
+
+
 def parse_csv_rows(text: str) -> list[dict]:
     """Parse the iranvictims CSV into a list of dicts."""
     reader = csv.DictReader(io.StringIO(text))
-    rows = []
-    for row in reader:
-        card_id = (row.get("Card ID") or "").strip()
-        if not card_id:
-            continue
-        rows.append({
-            "card_id": card_id,
-            "name_en": (row.get("English Name") or "").strip(),
-            "name_fa": (row.get("Persian Name") or "").strip() or None,
-            "age": (row.get("Age") or "").strip() or None,
-            "location": (row.get("Location of Death") or "").strip() or None,
-            "date": (row.get("Date of Death") or "").strip() or None,
-            "status": (row.get("Status") or "").strip().lower(),
-            "source_urls": (row.get("Source URLs") or "").strip() or None,
-            "notes": (row.get("Notes") or "").strip() or None,
-        })
-    return rows
+    return [r for r in map(parse_csv_row, reader) if r is not None]
 
 
 def parse_age(age_str: str | None) -> int | None:
@@ -81,6 +86,9 @@ def parse_source_urls(urls_str: str | None) -> list[str]:
 class IranvictimsPlugin(SourcePlugin):
     """iranvictims.com community database — CSV-based enrichment."""
 
+    rate_limit = HostLimit(rate=0.33)  # was a 2–4s sleep per request
+    cache_policy = CachePolicy(ttl=1 * DAY)
+
     @property
     def name(self) -> str:
         return "iranvictims"
@@ -94,52 +102,62 @@ class IranvictimsPlugin(SourcePlugin):
         return SITE_URL
 
     async def fetch_all(self) -> AsyncIterator[ExternalVictim]:
-        """Download CSV and yield all victim entries."""
+        """Stream the CSV and yield victim entries as rows arrive.
+
+        If the download breaks off, the complete rows before the break are
+        kept and the partial last row is dropped; the next run fetches the
+        rest.
+        """
         log.info("Downloading iranvictims.com CSV...")
-        csv_text = await fetch_with_retry(
-            self.session,
-            CSV_URL,
-            rate_limit=(2.0, 4.0),
-            cache_dir=self.cache_dir,
-        )
-        if not csv_text:
-            log.error("Failed to download iranvictims CSV")
+        chunks = fetch_stream(self.session, CSV_URL, cache_dir=self.cache_dir)
+        count = 0
+        try:
+            # Closing this generator early (--limit) closes the download
+            # too, instead of leaving it to hold its host slot until GC
+            async with aclosing(chunks):
+                async for raw in iter_csv_dicts(chunks):
+                    row = parse_csv_row(raw)
+                    if row is None:
+                        continue
+                    count += 1
+                    source_id = f"iranvictims_{row['card_id']}"
+                    if self.progress.is_processed(source_id):
+                        continue
+
+                    # Only process killed victims for the memorial
+                    if row["status"] not in ("killed", ""):
+                        self.progress.mark_processed(source_id)
+                        continue
+
+                    name_en = row["name_en"]
+                    if not name_en:
+                        continue
+
+                    yield ExternalVictim(
+                        source_id=source_id,
+                        source_name=f"iranvictims.com — Victim #{row['card_id']}",
+                        source_url=SITE_URL,
+                        source_type="community_database",
+                        name_latin=name_en,
+                        name_farsi=row.get("name_fa"),
+                        date_of_death=parse_date(row["date"]),
+                        age_at_death=parse_age(row["age"]),
+                        place_of_death=row["location"],
+                        province=extract_province(row["location"]),
+                        circumstances_en=row["notes"],
+                        # Store source URLs in event_context temporarily for the pipeline
+                        # The pipeline handler will add them as proper sources
+                    )
+
+                    self.progress.mark_processed(source_id)
+        except StreamInterrupted as e:
+            log.error(f"{e} — stopped after {count} entries")
             return
 
-        rows = parse_csv_rows(csv_text)
-        log.info(f"Parsed {len(rows)} entries from CSV")
-
-        for row in rows:
-            source_id = f"iranvictims_{row['card_id']}"
-            if self.progress.is_processed(source_id):
-                continue
-
-            # Only process killed victims for the memorial
-            if row["status"] not in ("killed", ""):
-                self.progress.mark_processed(source_id)
-                continue
-
-            name_en = row["name_en"]
-            if not name_en:
-                continue
-
-            yield ExternalVictim(
-                source_id=source_id,
-                source_name=f"iranvictims.com — Victim #{row['card_id']}",
-                source_url=SITE_URL,
-                source_type="community_database",
-                name_latin=name_en,
-                name_farsi=row.get("name_fa"),
-                date_of_death=parse_date(row["date"]),
-                age_at_death=parse_age(row["age"]),
-                place_of_death=row["location"],
-                province=extract_province(row["location"]),
-                circumstances_en=row["notes"],
-                # Store source URLs in event_context temporarily for the pipeline
-                # The pipeline handler will add them as proper sources
-            )
-
-            self.progress.mark_processed(source_id)
+        if count:
+            log.info(f"Parsed {count} entries from CSV")
+        else:
+            log.error("Failed to download iranvictims CSV")
 
     async def fetch_detail(self, source_id: str) -> Optional[ExternalVictim]:
         return None  # iranvictims has no detail pages
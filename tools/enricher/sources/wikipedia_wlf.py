@@ -9,7 +9,9 @@ from datetime import datetime
 from typing import AsyncIterator, Optional
 
 from ..db.models import ExternalVictim
-from ..utils.http import fetch_with_retry
+from ..utils.http import DAY, CachePolicy, fetch_with_retry
+from ..utils.metrics import stage
+from ..utils.ratelimit import HostLimit
 from . import register
 from .base import SourcePlugin
 
@@ -188,6 +190,9 @@ def parse_wikitext_table(wikitext: str) -> list[dict]:
 class WikipediaWLFPlugin(SourcePlugin):
     """Wikipedia — Deaths during the Mahsa Amini protests."""
 
+    rate_limit = HostLimit(rate=0.67)  # was a 1–2s sleep per page
+    cache_policy = CachePolicy(ttl=7 * DAY)
+
     @property
     def name(self) -> str:
         return "wikipedia_wlf"
@@ -206,17 +211,16 @@ class WikipediaWLFPlugin(SourcePlugin):
         html = await fetch_with_retry(
             self.session,
             WIKI_API,
-            rate_limit=(1.0, 2.0),
             cache_dir=self.cache_dir,
         )
         if not html:
             log.error("Failed to fetch Wikipedia API")
             return
 
-        data = json.loads(html)
-        wikitext = data["parse"]["wikitext"]["*"]
-
-        victims = parse_wikitext_table(wikitext)
+        with stage("parse"):
+            data = json.loads(html)
+            wikitext = data["parse"]["wikitext"]["*"]
+            victims = parse_wikitext_table(wikitext)
         log.info(f"Parsed {len(victims)} victims from Wikipedia table")
 
         for i, v in enumerate(victims):
@@ -0,0 +1,334 @@
+"""Tests for the HTTP cache stores and files → SQLite migration."""
+
+import json
+import os
+import zlib
+
+import pytest
+
+from tools.enricher.utils import cache
+from tools.enricher.utils.cache import (
+    DownloadCache,
+    FileCache,
+    SQLiteCache,
+    migrate,
+    open_store,
+)
+
+HTML = "<html><body>" + "علی حیدری — story text " * 200 + "</body></html>"
+
+
+@pytest.fixture(params=["files", "sqlite", "downloads"])
+def store(request, tmp_path):
+    if request.param == "downloads":
+        s = DownloadCache(str(tmp_path))
+    else:
+        s = open_store(str(tmp_path), request.param)
+    yield s
+    s.close()
+
+
+class TestStores:
+    def test_roundtrip(self, store):
+        store.put("https://x/1", HTML, etag='"a"', fetched_at=1000.0)
+        entry = store.get("https://x/1")
+        assert entry == {
+            "url": "https://x/1", "body": HTML, "etag": '"a"',
+            "fetched_at": 1000.0,
+        }
+        assert store.get("https://x/2") is None
+
+    def test_put_replaces(self, store):
+        store.put("https://x/1", "old")
+        store.put("https://x/1", "new", last_modified="Mon")
+        entry = store.get("https://x/1")
+        assert entry["body"] == "new"
+        assert entry["last_modified"] == "Mon"
+        assert store.stats().entries == 1
+
+    def test_touch_keeps_body(self, store):
+        store.put("https://x/1", HTML, etag='"a"', last_modified="Mon",
+                  fetched_at=1000.0)
+        assert store.touch("https://x/1", etag='"b"', fetched_at=2000.0)
+        assert store.get("https://x/1") == {
+            "url": "https://x/1", "body": HTML, "etag": '"b"',
+            "last_modified": "Mon", "fetched_at": 2000.0,
+        }
+        assert not store.touch("https://x/2")
+        assert store.get("https://x/2") is None
+
+    def test_entries_and_stats(self, store):
+        store.put_many(
+            {"url": f"https://x/{i}", "body": HTML} for i in range(5)
+        )
+        assert sorted(e["url"] for e in store.entries()) == [
+            f"https://x/{i}" for i in range(5)
+        ]
+        st = store.stats()
+        assert st.entries == 5
+        assert st.stored_bytes > 0
+
+
+class TestSQLiteCache:
+    def test_bodies_are_compressed(self, tmp_path):
+        s = SQLiteCache(str(tmp_path))
+        s.put_many({"url": f"https://x/{i}", "body": HTML} for i in range(20))
+        st = s.stats()
+        s.close()
+        assert st.body_bytes == 20 * len(HTML.encode())
+        assert st.ratio > 5
+
+    def test_reads_zlib_rows_regardless_of_zstd(self, tmp_path, monkeypatch):
+        s = SQLiteCache(str(tmp_path))
+        s.db.execute(
+            "INSERT INTO entries (url, body, codec, size, fetched_at) "
+            "VALUES (?, ?, 'zlib', ?, 1.0)",
+            ("https://x/z", zlib.compress(HTML.encode()), len(HTML)),
+        )
+        assert s.get("https://x/z")["body"] == HTML
+        s.close()
+
+    def test_touch_leaves_compressed_body_alone(self, tmp_path, monkeypatch):
+        s = SQLiteCache(str(tmp_path))
+        s.put("https://x/1", HTML, fetched_at=1.0)
+        blob = s.db.execute("SELECT body FROM entries").fetchone()[0]
+        monkeypatch.setattr(s, "_encode", None)
+        monkeypatch.setattr(s, "_decode", None)
+        assert s.touch("https://x/1", etag='"v2"')
+        row = s.db.execute("SELECT body, etag, fetched_at FROM entries").fetchone()
+        s.close()
+        assert row[0] == blob
+        assert row[1] == '"v2"'
+        assert row[2] > 1.0
+
+    def test_zstd_when_available(self, tmp_path):
+        pytest.importorskip("zstandard")
+        s = SQLiteCache(str(tmp_path))
+        s.put("https://x/1", HTML)
+        codec = s.db.execute("SELECT codec FROM entries").fetchone()[0]
+        s.close()
+        assert codec == "zstd"
+
+
+class TestMigrate:
+    def test_copies_files_into_sqlite(self, tmp_path):
+        files = FileCache(str(tmp_path))
+        for i in range(3):
+            files.put(f"https://x/{i}", f"body {i}", etag=f'"{i}"')
+        # Entry written before revalidation: no fetched_at
+        with open(files.path("https://x/old"), "w", encoding="utf-8") as f:
+            json.dump({"url": "https://x/old", "body": "legacy"}, f)
+
+        assert migrate(str(tmp_path), delete=True) == 4
+        assert not any(n.endswith(".json") for n in os.listdir(tmp_path))
+
+        s = SQLiteCache(str(tmp_path))
+        assert s.get("https://x/1")["etag"] == '"1"'
+        assert s.get("https://x/old")["body"] == "legacy"
+        s.close()
+
+    def test_nothing_to_migrate(self, tmp_path):
+        assert migrate(str(tmp_path)) == 0
+
+    def test_sqlite_store_adopts_files_cache_on_open(self, tmp_path):
+        files = FileCache(str(tmp_path))
+        files.put("https://x/1", "body 1", etag='"1"')
+
+        s = open_store(str(tmp_path), "sqlite")
+        assert s.get("https://x/1")["body"] == "body 1"
+        assert not any(n.endswith(".json") for n in os.listdir(tmp_path))
+        s.close()
+
+
+def test_set_backend_rejects_unknown():
+    with pytest.raises(ValueError):
+        cache.set_backend("lmdb")
+
+
+class TestAccessTracking:
+    def test_get_refreshes_stale_access_time(self, store):
+        store.put("https://x/1", HTML)
+        if isinstance(store, SQLiteCache):
+            store.db.execute("UPDATE entries SET accessed_at = 1.0")
+        else:
+            if isinstance(store, DownloadCache):
+                path = store.paths("https://x/1")[0]
+            else:
+                path = store.path("https://x/1")
+            os.utime(path, (1.0, os.path.getmtime(path)))
+        store.get("https://x/1")
+        [(_, _, accessed, _)] = list(store.usage())
+        assert accessed > 1e9
+
+    def test_migrated_sqlite_schema_gains_column(self, tmp_path):
+        import sqlite3
+
+        db = sqlite3.connect(os.path.join(tmp_path, cache.SQLITE_FILENAME))
+        db.execute(
+            "CREATE TABLE entries (url TEXT PRIMARY KEY, body BLOB NOT NULL, "
+            "codec TEXT NOT NULL, size INTEGER NOT NULL, etag TEXT, "
+            "last_modified TEXT, fetched_at REAL NOT NULL) WITHOUT ROWID"
+        )
+        db.close()
+        s = SQLiteCache(str(tmp_path))
+        s.put("https://x/1", "b")
+        assert s.get("https://x/1")["body"] == "b"
+        s.close()
+
+
+def fill(cache_dir, backend, n, accessed, fetched=None):
+    s = open_store(cache_dir, backend)
+    s.put_many(
+        {"url": f"https://x/{i}", "body": HTML, "fetched_at": fetched}
+        for i in range(n)
+    )
+    if isinstance(s, SQLiteCache):
+        for i in range(n):
+            s.db.execute(
+                "UPDATE entries SET accessed_at = ? WHERE url = ?",
+                (accessed + i, f"https://x/{i}"),
+            )
+        s.db.commit()
+    else:
+        for i in range(n):
+            path = s.path(f"https://x/{i}")
+            os.utime(path, (accessed + i, os.path.getmtime(path)))
+    s.close()
+
+
+class TestPrune:
+    def test_expires_idle_entries(self, tmp_path):
+        now = 10_000_000.0
+        fill(str(tmp_path / "a"), "sqlite", 3, now - 10 * 86400, now - 20 * 86400)
+        fill(str(tmp_path / "b"), "files", 2, now - 60, now - 20 * 86400)
+
+        results = cache.prune(str(tmp_path), max_idle=7 * 86400, now=now)
+
+        assert results["a"].expired == 3
+        assert results["b"].expired == 0
+        assert results["b"].kept == 2
+
+    @pytest.mark.parametrize("backend", ["sqlite", "files"])
+    def test_expires_entries_fetched_long_ago(self, tmp_path, backend):
+        # Read a minute ago, but fetched before max_age: expired all the same
+        now = 10_000_000.0
+        fill(str(tmp_path / "old"), backend, 3, now - 60, now - 10 * 86400)
+        fill(str(tmp_path / "new"), backend, 2, now - 60, now - 86400)
+
+        results = cache.prune(str(tmp_path), max_age=7 * 86400, now=now)
+
+        assert results["old"].expired == 3
+        assert results["new"].expired == 0
+        assert results["new"].kept == 2
+        for store in cache.existing_stores(str(tmp_path / "old")):
+            assert list(store.usage()) == []
+            store.close()
+
+    def test_revalidation_renews_fetch_age(self, tmp_path, store):
+        now = 10_000_000.0
+        store.put("https://x/1", HTML, fetched_at=now - 10 * 86400)
+        store.touch("https://x/1", fetched_at=now - 60)
+        store.close()
+
+        results = cache.prune(str(tmp_path.parent), max_age=7 * 86400, now=now)
+
+        assert results[tmp_path.name].kept == 1
+
+    def test_evicts_least_recently_used_across_sources(self, tmp_path):
+        now = 10_000_000.0
+        fill(str(tmp_path / "old"), "files", 3, now - 1000)
+        fill(str(tmp_path / "new"), "sqlite", 3, now - 10)
+        sizes = {
+            name: sum(s for _, s, _, _ in st.usage())
+            for name in ("old", "new")
+            for st in cache.existing_stores(str(tmp_path / name))
+        }
+
+        results = cache.prune(str(tmp_path), max_bytes=sizes["new"], now=now)
+
+        assert results["old"].evicted == 3
+        assert results["new"].evicted == 0
+        assert results["new"].kept_bytes <= sizes["new"]
+        assert not any(n.endswith(".json") for n in os.listdir(tmp_path / "old"))
+
+    def test_downloads_expired_and_evicted_with_entries(self, tmp_path):
+        now = 10_000_000.0
+        fill(str(tmp_path / "a"), "sqlite", 2, now - 10)
+        downloads = DownloadCache(str(tmp_path / "a"))
+        for i, accessed in enumerate((now - 10 * 86400, now - 1000)):
+            downloads.put(f"https://x/dump{i}.csv", HTML * 10)
+            path = downloads.paths(f"https://x/dump{i}.csv")[0]
+            os.utime(path, (accessed, os.path.getmtime(path)))
+        entries = SQLiteCache(str(tmp_path / "a"))
+        entry_bytes = sum(s for _, s, _, _ in entries.usage())
+        entries.close()
+
+        results = cache.prune(
+            str(tmp_path), max_bytes=entry_bytes, max_idle=7 * 86400, now=now
+        )
+
+        assert (results["a"].expired, results["a"].evicted) == (1, 1)
+        assert results["a"].kept == 2
+        assert os.listdir(downloads.dir) == []
+
+    def test_no_limits_is_noop(self, tmp_path):
+        fill(str(tmp_path / "a"), "sqlite", 2, 1.0)
+        assert cache.prune(str(tmp_path))["a"].kept == 2
+
+
+class TestVerify:
+    def test_clean_store(self, store):
+        store.put("https://x/1", HTML)
+        assert store.verify() == []
+
+    def test_sqlite_detects_corrupt_body(self, tmp_path):
+        s = SQLiteCache(str(tmp_path))
+        s.put("https://x/1", HTML)
+        s.db.execute("UPDATE entries SET body = X'00010203'")
+        s.db.commit()
+        [(key, problem)] = s.verify()
+        assert key == "https://x/1"
+        assert "cannot decode" in problem
+        s.close()
+
+    def test_files_detects_bad_json_and_misnamed(self, tmp_path):
+        f = FileCache(str(tmp_path))
+        f.put("https://x/1", "ok")
+        with open(os.path.join(tmp_path, "deadbeef.json"), "w") as fh:
+            fh.write("{not json")
+        os.rename(f.path("https://x/1"), os.path.join(tmp_path, "0000.json"))
+        problems = dict(f.verify())
+        assert "unreadable" in problems[os.path.join(tmp_path, "deadbeef.json")]
+        assert "does not match" in problems[os.path.join(tmp_path, "0000.json")]
+
+    def test_downloads_detects_bad_and_orphaned_metadata(self, tmp_path):
+        d = DownloadCache(str(tmp_path))
+        for i in range(3):
+            d.put(f"https://x/{i}.csv", "a,b\n")
+        body0, meta0 = d.paths("https://x/0.csv")
+        body1, _ = d.paths("https://x/1.csv")
+        body2, meta2 = d.paths("https://x/2.csv")
+        with open(meta0, "w") as fh:
+            fh.write("{not json")
+        os.remove(body1)
+        os.rename(body2, body2 + "x")
+        os.rename(meta2, body2 + "x" + DownloadCache.META_SUFFIX)
+        open(body0 + ".part", "w").close()  # a download in progress
+
+        problems = dict(d.verify())
+        assert "unreadable" in problems[body0]
+        assert "without body" in problems[body1]
+        assert "does not match" in problems[body2 + "x"]
+        assert len(problems) == 3
+
+        assert d.delete(problems) == 3
+        assert os.listdir(d.dir) == [os.path.basename(body0) + ".part"]
+
+    def test_existing_stores_include_downloads(self, tmp_path):
+        assert cache.existing_stores(str(tmp_path)) == []
+        DownloadCache(str(tmp_path)).put("https://x/dump.csv", HTML)
+        [store] = cache.existing_stores(str(tmp_path))
+        st = store.stats()
+        assert (store.backend, st.entries) == ("downloads", 1)
+        assert st.body_bytes == len(HTML.encode())
+        assert st.stored_bytes > st.body_bytes  # + metadata
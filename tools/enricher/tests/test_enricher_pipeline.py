@@ -1,7 +1,15 @@
 """Tests for the enricher pipeline — especially circumstances_fa support."""
 
+from datetime import date
+
 from tools.enricher.db.models import ExternalVictim
 from tools.enricher.pipeline.enricher import compute_enrichment, count_new_fields
+from tools.enricher.pipeline.matcher import (
+    add_victim,
+    build_index,
+    match,
+    remove_victim,
+)
 
 
 def make_victim(**overrides):
@@ -120,3 +128,24 @@ class TestCountNewFields:
         ext = make_ext(province="Tehran", circumstances_fa="new")
         count = count_new_fields(victim, ext)
         assert count == 0
+
+
+class TestIndexMaintenance:
+    def test_add_then_remove_victim(self):
+        index = build_index([], {})
+        victim = make_victim(
+            id=None,
+            slug="karimi-reza",
+            name_latin="Reza Karimi",
+            name_farsi="رضا کریمی",
+            date_of_death=date(2026, 1, 8),
+        )
+        add_victim(index, victim)
+        ext = make_ext(name_farsi="رضا کریمی", date_of_death=date(2026, 1, 8))
+        assert match(ext, index).victim is victim
+        assert index.by_id == {}
+
+        remove_victim(index, victim)
+        assert not match(ext, index).matched
+        assert index.by_farsi_norm == {}
+        assert index.by_slug == {}
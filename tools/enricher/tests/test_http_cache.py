@@ -0,0 +1,265 @@
+"""Tests for the HTTP disk cache — TTL policies and conditional GET."""
+
+import asyncio
+import time
+
+import aiohttp
+import pytest
+
+from tools.enricher.utils import http, ratelimit
+from tools.enricher.utils.cache import close_stores, get_store
+from tools.enricher.utils.http import (
+    CachePolicy,
+    _read_cache_entry,
+    _write_cache,
+    fetch_with_retry,
+    set_cache_policy,
+)
+from tools.enricher.utils.metrics import RunMetrics, use_metrics
+
+URL = "https://origin.example/page"
+
+
+class FakeResponse:
+    def __init__(self, status, body="", headers=None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return None
+
+    async def read(self):
+        return self.body.encode()
+
+    async def text(self):
+        return self.body
+
+
+class FakeSession:
+    """Replays queued responses and records request headers."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None):
+        self.requests.append((url, headers or {}))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class SlowResponse(FakeResponse):
+    async def text(self):
+        await asyncio.sleep(0.05)
+        return self.body
+
+
+@pytest.fixture(autouse=True)
+def fast_limiter():
+    ratelimit.reset_limiters()
+    ratelimit.configure_host("origin.example", ratelimit.HostLimit(rate=1000, burst=10))
+    yield
+    ratelimit.reset_limiters()
+    http._cache_policies.clear()
+    http.clear_memory_cache()
+    close_stores()
+
+
+def age_entry(cache_dir, seconds):
+    store = get_store(cache_dir)
+    entry = store.get(URL)
+    entry["fetched_at"] -= seconds
+    store.put_many([entry])
+
+
+def fetch(session, cache_dir, **kw):
+    return asyncio.run(fetch_with_retry(
+        session, URL, cache_dir=cache_dir, backoff_base=0, **kw
+    ))
+
+
+class TestCachePolicy:
+    def test_rules_first_match_wins(self):
+        policy = CachePolicy(ttl=100, rules=((r"/browse", 10), (r"/b", 1)))
+        assert policy.ttl_for("https://x/browse?page=2") == 10
+        assert policy.ttl_for("https://x/bar") == 1
+        assert policy.ttl_for("https://x/story/1") == 100
+
+    def test_default_never_expires(self, tmp_path):
+        _write_cache(str(tmp_path), URL, "old")
+        age_entry(str(tmp_path), 10 * 365 * 86400)
+        session = FakeSession()
+        assert fetch(session, str(tmp_path)) == "old"
+        assert session.requests == []
+
+
+class TestRevalidation:
+    def test_fresh_entry_is_not_revalidated(self, tmp_path):
+        set_cache_policy(str(tmp_path), CachePolicy(ttl=3600))
+        _write_cache(str(tmp_path), URL, "body", etag='"v1"')
+        session = FakeSession()
+        assert fetch(session, str(tmp_path)) == "body"
+        assert session.requests == []
+
+    def test_304_returns_cached_body_and_refreshes(self, tmp_path):
+        cache = str(tmp_path)
+        set_cache_policy(cache, CachePolicy(ttl=3600))
+        _write_cache(
+            cache, URL, "body", etag='"v1"',
+            last_modified="Mon, 12 Jan 2026 10:00:00 GMT",
+        )
+        age_entry(cache, 7200)
+        session = FakeSession(FakeResponse(304))
+
+        assert fetch(session, cache) == "body"
+        sent = session.requests[0][1]
+        assert sent["If-None-Match"] == '"v1"'
+        assert sent["If-Modified-Since"] == "Mon, 12 Jan 2026 10:00:00 GMT"
+
+        entry = _read_cache_entry(cache, URL)
+        assert time.time() - entry["fetched_at"] < 60
+        assert entry["etag"] == '"v1"'
+
+    def test_200_replaces_entry(self, tmp_path):
+        cache = str(tmp_path)
+        set_cache_policy(cache, CachePolicy(ttl=0))
+        _write_cache(cache, URL, "old", etag='"v1"')
+        session = FakeSession(FakeResponse(200, "new", {"ETag": '"v2"'}))
+
+        assert fetch(session, cache) == "new"
+        entry = _read_cache_entry(cache, URL)
+        assert entry["body"] == "new"
+        assert entry["etag"] == '"v2"'
+
+    def test_stale_body_served_when_origin_fails(self, tmp_path):
+        cache = str(tmp_path)
+        set_cache_policy(cache, CachePolicy(ttl=0))
+        _write_cache(cache, URL, "old")
+        session = FakeSession(aiohttp.ClientConnectionError("down"))
+
+        assert fetch(session, cache, retries=1) == "old"
+
+
+class TestCoalescing:
+    def test_concurrent_requests_share_one_fetch(self, tmp_path):
+        session = FakeSession(SlowResponse(200, "body"))
+
+        async def run():
+            return await asyncio.gather(*(
+                fetch_with_retry(session, URL, cache_dir=str(tmp_path))
+                for _ in range(5)
+            ))
+
+        assert asyncio.run(run()) == ["body"] * 5
+        assert len(session.requests) == 1
+        assert http._inflight == {}
+
+    def test_different_headers_are_not_coalesced(self):
+        session = FakeSession(SlowResponse(200, "a"), SlowResponse(200, "b"))
+
+        async def run():
+            return await asyncio.gather(
+                fetch_with_retry(session, URL, extra_headers={"Range": "0-1"}),
+                fetch_with_retry(session, URL),
+            )
+
+        assert sorted(asyncio.run(run())) == ["a", "b"]
+        assert len(session.requests) == 2
+
+    def test_follower_takes_over_when_leader_cancelled(self):
+        session = FakeSession(SlowResponse(200, "first"), SlowResponse(200, "second"))
+
+        async def run():
+            leader = asyncio.create_task(fetch_with_retry(session, URL))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(fetch_with_retry(session, URL))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return await follower
+
+        assert asyncio.run(run()) == "second"
+        assert len(session.requests) == 2
+
+
+class TestMemoryCache:
+    def test_repeat_reads_skip_the_store(self, tmp_path, monkeypatch):
+        cache = str(tmp_path)
+        _write_cache(cache, URL, "body")
+        assert fetch(FakeSession(), cache) == "body"
+
+        def fail(*args):
+            raise AssertionError("disk cache read")
+
+        monkeypatch.setattr(http, "_read_cache_entry", fail)
+        assert fetch(FakeSession(), cache) == "body"
+
+    def test_expires_with_policy_ttl(self, tmp_path):
+        cache = str(tmp_path)
+        set_cache_policy(cache, CachePolicy(ttl=0))
+        session = FakeSession(FakeResponse(200, "v1"), FakeResponse(200, "v2"))
+        assert fetch(session, cache) == "v1"
+        assert fetch(session, cache) == "v2"
+
+    def test_lru_evicts_oldest(self, monkeypatch):
+        monkeypatch.setattr(http, "MEMORY_ENTRIES", 2)
+        for i in range(3):
+            http._memory_put("c", f"u{i}", "b", time.time() + 60)
+        assert http._memory_get("c", "u0") is None
+        assert http._memory_get("c", "u2") == "b"
+
+
+class TestHostMetrics:
+    def test_requests_retries_and_cache_recorded(self, tmp_path):
+        session = FakeSession(
+            FakeResponse(503), FakeResponse(200, "héllo", {"ETag": '"v1"'})
+        )
+        m = RunMetrics("test")
+        with use_metrics(m):
+            fetch(session, str(tmp_path))
+            http.clear_memory_cache()
+            fetch(session, str(tmp_path))
+        hs = m.hosts["origin.example"]
+        assert hs.statuses == {"503": 1, "200": 1}
+        assert hs.retries == 1
+        assert hs.bytes == len("héllo".encode())
+        assert hs.cache == {"miss": 1, "hit": 1}
+        assert hs.latency.count == 2
+
+
+class TestOffline:
+    @pytest.fixture(autouse=True)
+    def offline(self):
+        http.set_offline(True)
+        yield
+        http.set_offline(False)
+
+    def test_stale_entry_served_without_request(self, tmp_path):
+        _write_cache(str(tmp_path), URL, "cached")
+        age_entry(str(tmp_path), 10 * 86400)
+        set_cache_policy(str(tmp_path), CachePolicy(ttl=60))
+        session = FakeSession()
+        assert fetch(session, str(tmp_path)) == "cached"
+        assert session.requests == []
+
+    def test_miss_returns_none_without_request(self, tmp_path):
+        session = FakeSession()
+        assert fetch(session, str(tmp_path)) is None
+        assert fetch(session, None) is None
+        assert session.requests == []
+        assert http.offline_misses() == 2
+
+    def test_strict_miss_raises(self, tmp_path):
+        http.set_offline(True, strict=True)
+        _write_cache(str(tmp_path), URL, "cached")
+        session = FakeSession()
+        assert fetch(session, str(tmp_path)) == "cached"
+        with pytest.raises(http.OfflineMiss):
+            fetch(session, None)
+        assert session.requests == []
+        assert http.offline_misses() == 1
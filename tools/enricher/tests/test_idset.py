@@ -0,0 +1,118 @@
+"""Tests for IdSet / IntBitmap — compact processed-id storage."""
+
+import json
+import random
+import tracemalloc
+import uuid
+import zlib
+
+from tools.enricher.utils.idset import ARRAY_MAX, IdSet, IntBitmap, split_id
+
+
+class TestSplitId:
+    def test_prefix_and_int(self):
+        assert split_id("boroumand_1234") == ("boroumand_", 1234)
+        assert split_id("telegram_rtn_5") == ("telegram_rtn_", 5)
+        assert split_id("wikipedia_wlf_3") == ("wikipedia_wlf_", 3)
+
+    def test_non_canonical_ids_fall_back(self):
+        assert split_id("iranvictims_007") is None
+        assert split_id("boroumand_-12") is None
+        assert split_id("x_-0") is None
+        assert split_id("x_+3") is None
+        assert split_id("x_۱۲") is None
+        assert split_id("12") is None
+        assert split_id("wikipedia_wlf_3_Some Name") is None
+        assert split_id("iranrevolution_3f2a-b") is None
+
+    def test_ids_ending_in_digits_stay_strings(self):
+        assert split_id("iranmonitor_ali-reza-12") is None
+        assert split_id("wikipedia_wlf_3_Some Name 2") is None
+        assert split_id(
+            "iranrevolution_0b6f3c1e-2d4a-4b8e-9c1f-5e7a9d2b3041"
+        ) is None
+
+
+class TestIntBitmap:
+    def test_membership_and_len(self):
+        b = IntBitmap([5, 70000, -3])
+        assert 5 in b and 70000 in b and -3 in b
+        assert 6 not in b and 3 not in b
+        assert not b.add(5)
+        assert len(b) == 3
+        assert list(b) == [-3, 5, 70000]
+
+    def test_dense_chunk_becomes_bitmap(self):
+        values = range(0, 2 * (ARRAY_MAX + 10), 2)
+        b = IntBitmap(values)
+        assert isinstance(b._chunks[0], bytearray)
+        assert all(v in b for v in values)
+        assert 1 not in b
+        assert list(b) == list(values)
+        assert b.nbytes() == 8192
+
+    def test_runs_round_trip(self):
+        values = sorted(random.Random(1).sample(range(-100, 50000), 3000))
+        b = IntBitmap(values)
+        assert list(IntBitmap.from_runs(b.runs())) == values
+        assert IntBitmap([3, 4, 5, 9]).runs() == [3, 3, 3, 1]
+
+
+class TestIdSet:
+    def test_mixed_ids(self):
+        ids = IdSet(["boroumand_1", "boroumand_-2", "iranrevolution_ab-c", "x_01"])
+        assert list(ids._ints) == ["boroumand_"]
+        assert "boroumand_1" in ids
+        assert "boroumand_-2" in ids
+        assert "iranrevolution_ab-c" in ids
+        assert "x_01" in ids
+        assert "x_1" not in ids
+        assert "boroumand_2" not in ids
+        assert len(ids) == 4
+        assert sorted(ids) == sorted(
+            ["boroumand_1", "boroumand_-2", "iranrevolution_ab-c", "x_01"]
+        )
+
+    def test_snapshot_round_trip_and_size(self):
+        rng = random.Random(0)
+        source_ids = [f"boroumand_{n}" for n in rng.sample(range(40000), 26000)]
+        source_ids += [f"iranrevolution_{rng.getrandbits(64):x}" for _ in range(10)]
+        ids = IdSet(source_ids)
+        data = ids.dumps()
+        assert sorted(IdSet.loads(data)) == sorted(source_ids)
+        plain = sum(len(s) + 1 for s in source_ids)
+        assert len(data) * 10 < plain
+
+    def test_snapshot_with_old_split_is_re_split(self):
+        # Earlier snapshots split at the trailing digit run
+        doc = {
+            "ints": {"boroumand_": [1, 2], "iranmonitor_ali-reza": [-12, 1]},
+            "strings": ["x_01"],
+        }
+        data = zlib.compress(json.dumps(doc).encode())
+        ids = IdSet.loads(data)
+        assert sorted(ids) == ["boroumand_1", "boroumand_2",
+                               "iranmonitor_ali-reza-12", "x_01"]
+        assert "iranmonitor_ali-reza-12" in ids
+        assert list(ids._ints) == ["boroumand_"]
+
+    def test_uuid_ids_cost_no_more_than_a_set(self):
+        rng = random.Random(2)
+        source_ids = [f"iranrevolution_{uuid.UUID(int=rng.getrandbits(128))}"
+                      for _ in range(20000)]
+        source_ids += [f"iranmonitor_name-{n}" for n in range(2000)]
+
+        def traced(build):
+            tracemalloc.start()
+            try:
+                before = tracemalloc.get_traced_memory()[0]
+                obj = build()
+                return obj, tracemalloc.get_traced_memory()[0] - before
+            finally:
+                tracemalloc.stop()
+
+        ids, ids_bytes = traced(lambda: IdSet(source_ids))
+        _, set_bytes = traced(lambda: set(source_ids))
+        assert ids._ints == {}
+        assert len(ids) == len(source_ids)
+        assert ids_bytes < set_bytes * 1.2
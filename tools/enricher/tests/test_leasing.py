@@ -0,0 +1,444 @@
+"""Tests for work leasing — distributed runs against an in-memory units table."""
+
+import asyncio
+import itertools
+import json
+import time
+from datetime import date
+
+import pytest
+
+from tools.enricher import sources
+from tools.enricher.db import queries
+from tools.enricher.db.models import ExternalVictim
+from tools.enricher.pipeline import leasing
+from tools.enricher.pipeline.leasing import MAX_ATTEMPTS, WorkLease
+from tools.enricher.pipeline.matcher import build_index
+from tools.enricher.pipeline.orchestrator import EnrichmentContext, enrich_source
+from tools.enricher.sources.base import SourcePlugin, UnitFailed
+
+
+class UnitsDB:
+    """enricher_work_units in memory; other statements are recorded only.
+
+    Every call runs without awaiting in between, like one statement under
+    the row locks of the real query.
+    """
+
+    def __init__(self):
+        # (source, unit) → row
+        self.units: dict[tuple[str, str], dict] = {}
+        self.sources: list[tuple] = []
+        # slug → row (victims.slug is unique)
+        self.victims: dict[str, dict] = {}
+        # source → worker → stats (enricher_checkpoints.stats->'workers')
+        self.worker_stats: dict[str, dict[str, dict]] = {}
+
+    def acquire(self):
+        conn = UnitsConn(self)
+
+        class Acquire:
+            async def __aenter__(self):
+                return conn
+
+            async def __aexit__(self, *exc):
+                return None
+
+        return Acquire()
+
+
+class UnitsConn:
+    def __init__(self, db):
+        self.db = db
+
+    def transaction(self):
+        class Tx:
+            async def __aenter__(self):
+                return None
+
+            async def __aexit__(self, *exc):
+                return None
+
+        return Tx()
+
+    async def executemany(self, query, rows):
+        if query == queries.ENQUEUE_UNIT:
+            for source, unit, seq in rows:
+                row = self.db.units.setdefault((source, unit), {
+                    "unit": unit, "seq": seq, "status": "pending",
+                    "worker": None, "leased_until": None, "attempts": 0,
+                })
+                if row["status"] == "failed":
+                    row.update(status="pending", attempts=0)
+        elif query == queries.INSERT_SOURCE:
+            self.db.sources.extend(rows)
+
+    async def execute(self, query, *args):
+        if query == queries.COMPLETE_UNITS:
+            source, units, worker = args
+            for unit in units:
+                row = self.db.units[(source, unit)]
+                if row["worker"] == worker and row["status"] == "leased":
+                    row.update(status="done", leased_until=None)
+        elif query == queries.UPSERT_WORKER_STATS:
+            source, worker, stats = args
+            self.db.worker_stats.setdefault(source, {})[worker] = json.loads(stats)
+
+    async def fetch(self, query, *args):
+        now = time.monotonic()
+        if query == queries.LEASE_UNITS:
+            source, worker, n, ttl = args
+            free = sorted(
+                (r for (s, _), r in self.db.units.items() if s == source and (
+                    r["status"] == "pending"
+                    or (r["status"] == "leased" and r["leased_until"] < now)
+                )),
+                key=lambda r: r["seq"],
+            )[:n]
+            for row in free:
+                row.update(status="leased", worker=worker, leased_until=now + ttl)
+                row["attempts"] += 1
+            return [{"unit": r["unit"], "seq": r["seq"]} for r in free]
+        if query == queries.RENEW_LEASES:
+            source, worker, units, ttl = args
+            kept = []
+            for unit in units:
+                row = self.db.units[(source, unit)]
+                if row["worker"] == worker and row["status"] == "leased":
+                    row["leased_until"] = now + ttl
+                    kept.append({"unit": unit})
+            return kept
+        if query == queries.COUNT_UNITS:
+            counts = {}
+            for (s, _), r in self.db.units.items():
+                if s == args[0]:
+                    counts[r["status"]] = counts.get(r["status"], 0) + 1
+            return [{"status": k, "n": v} for k, v in counts.items()]
+        if query == queries.LOAD_VICTIMS_BY_SLUG:
+            return [self.db.victims[s] for s in args[0] if s in self.db.victims]
+        return []
+
+    async def fetchrow(self, query, *args):
+        if query == queries.INSERT_VICTIM:
+            slug = args[0]
+            if slug in self.db.victims:
+                return None  # ON CONFLICT (slug) DO NOTHING
+            self.db.victims[slug] = {
+                "id": f"new{len(self.db.victims)}", "slug": slug,
+                "name_latin": args[1], "name_farsi": args[2],
+                "date_of_death": args[10], "province": args[13],
+                "effective_province": args[13],
+            }
+            return self.db.victims[slug]
+        return None
+
+    async def fetchval(self, query, *args):
+        if query == queries.RELEASE_UNIT:
+            source, unit, worker, max_attempts = args
+            row = self.db.units[(source, unit)]
+            if row["worker"] != worker or row["status"] != "leased":
+                return None
+            failed = row["attempts"] >= max_attempts
+            row.update(
+                status="failed" if failed else "pending",
+                worker=None, leased_until=None,
+            )
+            return row["status"]
+        return None
+
+
+PAGES = 6
+PER_PAGE = 3
+
+
+def make_ext(page, i):
+    return ExternalVictim(
+        source_id=f"paged_{page * 10 + i}",
+        source_name="paged",
+        source_url=f"https://paged.example/{page}/{i}",
+        source_type="test",
+        name_latin="Ali Heydari",
+        date_of_death=date(2026, 1, 8),
+        province="Tehran",
+    )
+
+
+class PagedPlugin(SourcePlugin):
+    name = "paged"
+    full_name = "Paged stub"
+    base_url = "https://paged.example"
+
+    async def fetch_all(self):
+        for page in range(1, PAGES + 1):
+            async for ext in self.fetch_unit(f"page:{page}"):
+                yield ext
+
+    async def work_units(self):
+        return [f"page:{page}" for page in range(1, PAGES + 1)]
+
+    # page → fetches that fail (class-level, shared by all workers)
+    failures: dict[int, int] = {}
+
+    async def fetch_unit(self, unit):
+        page = int(unit.removeprefix("page:"))
+        await asyncio.sleep(0)
+        if self.failures.get(page):
+            self.failures[page] -= 1
+            raise UnitFailed(f"page {page} not loaded")
+        for i in range(PER_PAGE):
+            await asyncio.sleep(0)
+            yield make_ext(page, i)
+            self.progress.mark_processed(f"paged_{page * 10 + i}")
+
+
+def make_ctx(db):
+    victims = [{
+        "id": "v1", "slug": "heydari-ali", "name_latin": "Ali Heydari",
+        "name_farsi": None, "date_of_death": date(2026, 1, 8),
+        "province": "Tehran", "effective_province": "Tehran",
+    }]
+    return EnrichmentContext(
+        pool=db, index=build_index(victims, {}), photo_urls={}, city_resolver={},
+    )
+
+
+class TestWorkLease:
+    def test_units_leased_in_order_once(self):
+        db = UnitsDB()
+
+        async def run():
+            a, b = WorkLease(db, "src", "a"), WorkLease(db, "src", "b")
+            await a.enqueue(["u1", "u2", "u3"])
+            await b.enqueue(["u1", "u2", "u3"])  # second worker: no-op
+            return [await a.next(), await b.next(), await a.next(), await b.next()]
+
+        assert asyncio.run(run()) == ["u1", "u2", "u3", None]
+
+    def test_expired_lease_is_taken_over(self):
+        db = UnitsDB()
+
+        async def run():
+            dead = WorkLease(db, "src", "dead", ttl=0.01)
+            await dead.enqueue(["u1"])
+            assert await dead.next() == "u1"
+            live = WorkLease(db, "src", "live")
+            assert await live.next() is None
+            await asyncio.sleep(0.02)
+            return await live.next()
+
+        assert asyncio.run(run()) == "u1"
+        assert db.units[("src", "u1")]["attempts"] == 2
+
+    def test_heartbeat_keeps_lease(self):
+        db = UnitsDB()
+
+        async def run():
+            a = WorkLease(db, "src", "a", ttl=0.1)
+            await a.enqueue(["u1"])
+            await a.next()
+            await a.start()
+            await asyncio.sleep(0.2)
+            await a.stop()
+            return await WorkLease(db, "src", "b").next()
+
+        assert asyncio.run(run()) is None
+
+    def test_commit_releases_finished_units(self):
+        db = UnitsDB()
+        lease = WorkLease(db, "src", "a", batch=2)
+
+        async def run():
+            await lease.enqueue(["u1", "u2"])
+            await lease.next()
+            lease.finish("u1")
+
+        asyncio.run(run())
+        assert lease.finished == ["u1"]
+        lease.commit(["u1"])
+        assert lease.finished == []
+        assert lease.held == {"u2"}
+
+
+class TestDistributedRun:
+    def test_workers_share_crawl_like_single_run(self, tmp_path, monkeypatch):
+        monkeypatch.setitem(sources._REGISTRY, "paged", PagedPlugin)
+        db = UnitsDB()
+        ctx = make_ctx(db)
+
+        async def run():
+            return await asyncio.gather(*(
+                enrich_source(
+                    ctx, "paged", str(tmp_path / f"w{n}"),
+                    batch_size=2, distributed=True,
+                )
+                for n in range(3)
+            ))
+
+        results = asyncio.run(run())
+
+        assert sum(s.processed for s in results) == PAGES * PER_PAGE
+        assert all(r["status"] == "done" for r in db.units.values())
+        urls = sorted(row[1] for row in db.sources)
+        assert urls == sorted(
+            f"https://paged.example/{p}/{i}"
+            for p in range(1, PAGES + 1) for i in range(PER_PAGE)
+        )
+
+    def test_rerun_after_completion_does_nothing(self, tmp_path, monkeypatch):
+        monkeypatch.setitem(sources._REGISTRY, "paged", PagedPlugin)
+        db = UnitsDB()
+        ctx = make_ctx(db)
+        asyncio.run(enrich_source(ctx, "paged", str(tmp_path), distributed=True))
+
+        again = asyncio.run(
+            enrich_source(make_ctx(db), "paged", str(tmp_path / "b"), distributed=True)
+        )
+        assert again.processed == 0
+
+    def test_failed_unit_is_retried_not_done(self, tmp_path, monkeypatch):
+        monkeypatch.setitem(sources._REGISTRY, "paged", PagedPlugin)
+        monkeypatch.setattr(PagedPlugin, "failures", {3: 1})
+        db = UnitsDB()
+
+        async def run():
+            return await asyncio.gather(*(
+                enrich_source(
+                    make_ctx(db), "paged", str(tmp_path / f"w{n}"),
+                    batch_size=2, distributed=True,
+                )
+                for n in range(2)
+            ))
+
+        results = asyncio.run(run())
+
+        # Same records as a run without the failure
+        assert sum(s.processed for s in results) == PAGES * PER_PAGE
+        assert len({row[1] for row in db.sources}) == PAGES * PER_PAGE
+        assert all(r["status"] == "done" for r in db.units.values())
+        assert db.units[("paged", "page:3")]["attempts"] == 2
+
+    def test_unit_failing_every_attempt_is_failed(self, tmp_path, monkeypatch):
+        monkeypatch.setitem(sources._REGISTRY, "paged", PagedPlugin)
+        monkeypatch.setattr(PagedPlugin, "failures", {3: MAX_ATTEMPTS})
+        db = UnitsDB()
+
+        stats = asyncio.run(
+            enrich_source(make_ctx(db), "paged", str(tmp_path), distributed=True)
+        )
+        assert stats.processed == (PAGES - 1) * PER_PAGE
+        assert db.units[("paged", "page:3")]["status"] == "failed"
+
+        # The next run gives it a new set of attempts
+        again = asyncio.run(
+            enrich_source(make_ctx(db), "paged", str(tmp_path / "b"), distributed=True)
+        )
+        assert again.processed == PER_PAGE
+        assert db.units[("paged", "page:3")]["status"] == "done"
+
+
+class NewcomerPlugin(PagedPlugin):
+    """Two pages reporting the same person, who is not in the DB yet."""
+
+    name = "newcomer"
+
+    async def work_units(self):
+        return ["page:1", "page:2"]
+
+    async def fetch_unit(self, unit):
+        page = int(unit.removeprefix("page:"))
+        await asyncio.sleep(0)
+        yield ExternalVictim(
+            source_id=f"newcomer_{page}",
+            source_name="newcomer",
+            source_url=f"https://newcomer.example/{page}",
+            source_type="test",
+            name_latin="Sara Rahimi",
+            date_of_death=date(2026, 1, 9),
+            province="Tehran",
+        )
+        self.progress.mark_processed(f"newcomer_{page}")
+
+
+class TestWorkers:
+    def test_same_new_victim_imported_once(self, tmp_path, monkeypatch):
+        # Each worker has its own index (its own process): both queue the
+        # person as new, the second INSERT hits the slug of the first
+        monkeypatch.setitem(sources._REGISTRY, "newcomer", NewcomerPlugin)
+        db = UnitsDB()
+
+        async def run():
+            return await asyncio.gather(*(
+                enrich_source(
+                    make_ctx(db), "newcomer", str(tmp_path / f"w{n}"),
+                    mode="import-new", distributed=True,
+                )
+                for n in range(2)
+            ))
+
+        results = asyncio.run(run())
+
+        assert list(db.victims) == ["rahimi-sara"]
+        assert sum(s.new_imported for s in results) == 1
+        assert sum(s.matched for s in results) == 1
+        assert sum(s.unmatched for s in results) == 1
+        # The record of the second worker is linked to the first one's row
+        vid = db.victims["rahimi-sara"]["id"]
+        assert [row[:2] for row in db.sources] == [
+            (vid, f"https://newcomer.example/{2 if results[0].new_imported else 1}")
+        ]
+        assert all(r["status"] == "done" for r in db.units.values())
+
+    def test_stats_kept_per_worker(self, tmp_path, monkeypatch):
+        monkeypatch.setitem(sources._REGISTRY, "paged", PagedPlugin)
+        ids = itertools.count()
+        monkeypatch.setattr(leasing, "default_worker_id", lambda: f"w{next(ids)}")
+        db = UnitsDB()
+
+        async def run():
+            return await asyncio.gather(*(
+                enrich_source(
+                    make_ctx(db), "paged", str(tmp_path / f"w{n}"),
+                    batch_size=2, distributed=True,
+                )
+                for n in range(3)
+            ))
+
+        results = asyncio.run(run())
+
+        stats = db.worker_stats["paged"]
+        assert sorted(stats) == ["w0", "w1", "w2"]
+        assert sorted(s["processed"] for s in stats.values()) == sorted(
+            s.processed for s in results
+        )
+        assert sum(s["processed"] for s in stats.values()) == PAGES * PER_PAGE
+
+    def test_lost_lease_not_completed(self):
+        db = UnitsDB()
+
+        async def run():
+            dead = WorkLease(db, "src", "dead", ttl=0.01)
+            await dead.enqueue(["u1"])
+            await dead.next()
+            await asyncio.sleep(0.02)
+            live = WorkLease(db, "src", "live")
+            assert await live.next() == "u1"
+            # The first worker comes back and flushes its copy
+            await queries.complete_units(UnitsConn(db), "src", "dead", ["u1"])
+
+        asyncio.run(run())
+        assert db.units[("src", "u1")]["status"] == "leased"
+        assert db.units[("src", "u1")]["worker"] == "live"
+
+    def test_unit_list_not_loaded_raises(self, tmp_path, monkeypatch):
+        from tools.enricher.sources.iranmonitor import IranmonitorPlugin
+
+        async def no_page(self, page):
+            return None
+
+        monkeypatch.setattr(IranmonitorPlugin, "_fetch_page", no_page)
+        db = UnitsDB()
+        with pytest.raises(UnitFailed):
+            asyncio.run(enrich_source(
+                make_ctx(db), "iranmonitor", str(tmp_path), distributed=True,
+            ))
+        assert db.units == {}
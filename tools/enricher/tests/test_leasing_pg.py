@@ -0,0 +1,159 @@
+"""Work leasing queries against a real Postgres.
+
+Skipped unless ENRICHER_TEST_DATABASE_URL points at a database the tests
+may create (and drop) a scratch schema in.
+"""
+
+import asyncio
+import json
+import os
+import uuid
+from pathlib import Path
+
+import pytest
+
+asyncpg = pytest.importorskip("asyncpg")
+
+from tools.enricher.db import queries
+from tools.enricher.pipeline.leasing import WorkLease
+
+DSN = os.environ.get("ENRICHER_TEST_DATABASE_URL")
+MIGRATIONS = Path(__file__).parents[3] / "prisma" / "migrations"
+
+pytestmark = pytest.mark.skipif(
+    not DSN, reason="ENRICHER_TEST_DATABASE_URL not set"
+)
+
+
+def with_db(test):
+    """Run ``test(pool)`` in a fresh schema holding the enricher tables."""
+
+    async def run():
+        schema = f"enricher_test_{uuid.uuid4().hex[:12]}"
+        admin = await asyncpg.connect(DSN)
+        await admin.execute(f'CREATE SCHEMA "{schema}"')
+        try:
+            pool = await asyncpg.create_pool(
+                DSN, min_size=1, max_size=4,
+                server_settings={"search_path": schema},
+            )
+            try:
+                async with pool.acquire() as conn:
+                    for name in (
+                        "20261019120000_add_enricher_progress",
+                        "20261019130000_add_enricher_work_units",
+                    ):
+                        await conn.execute(
+                            (MIGRATIONS / name / "migration.sql").read_text()
+                        )
+                return await test(pool)
+            finally:
+                await pool.close()
+        finally:
+            await admin.execute(f'DROP SCHEMA "{schema}" CASCADE')
+            await admin.close()
+
+    return asyncio.run(run())
+
+
+async def unit_rows(pool, source):
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            "SELECT unit, status, worker, attempts FROM enricher_work_units "
+            "WHERE source = $1 ORDER BY seq",
+            source,
+        )
+    return {r["unit"]: dict(r) for r in rows}
+
+
+async def complete(pool, source, worker, units):
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await queries.complete_units(conn, source, worker, units)
+
+
+class TestLeasingQueries:
+    def test_concurrent_workers_lease_each_unit_once(self):
+        async def test(pool):
+            units = [f"page:{n}" for n in range(1, 21)]
+            leases = [WorkLease(pool, "src", f"w{n}") for n in range(4)]
+            await asyncio.gather(*(lease.enqueue(units) for lease in leases))
+
+            async def drain(lease):
+                got = []
+                while (unit := await lease.next()) is not None:
+                    got.append(unit)
+                return got
+
+            got = await asyncio.gather(*(drain(lease) for lease in leases))
+            return units, got, await unit_rows(pool, "src")
+
+        units, got, rows = with_db(test)
+        assert sorted(u for g in got for u in g) == sorted(units)
+        assert all(r["status"] == "leased" and r["attempts"] == 1
+                   for r in rows.values())
+
+    def test_expired_lease_taken_over_and_old_worker_cannot_complete(self):
+        async def test(pool):
+            dead = WorkLease(pool, "src", "dead", ttl=0.05)
+            await dead.enqueue(["u1"])
+            assert await dead.next() == "u1"
+            live = WorkLease(pool, "src", "live")
+            assert await live.next() is None
+            await asyncio.sleep(0.1)
+            assert await live.next() == "u1"
+
+            await complete(pool, "src", "dead", ["u1"])
+            after_dead = (await unit_rows(pool, "src"))["u1"]
+            assert await queries.renew_leases(
+                pool, "src", "dead", ["u1"], 60
+            ) == set()
+            await complete(pool, "src", "live", ["u1"])
+            return after_dead, (await unit_rows(pool, "src"))["u1"]
+
+        after_dead, after_live = with_db(test)
+        assert (after_dead["status"], after_dead["worker"]) == ("leased", "live")
+        assert after_dead["attempts"] == 2
+        assert (after_live["status"], after_live["worker"]) == ("done", "live")
+
+    def test_release_until_failed_then_reenqueue(self):
+        async def test(pool):
+            lease = WorkLease(pool, "src", "w")
+            await lease.enqueue(["u1"])
+            seen = []
+            for _ in range(2):
+                await lease.next()
+                seen.append(await queries.release_unit(pool, "src", "w", "u1", 2))
+            seen.append(await lease.next())
+            await lease.enqueue(["u1"])
+            seen.append(await lease.next())
+            return seen, await queries.count_units(pool, "src")
+
+        seen, counts = with_db(test)
+        assert seen == ["pending", "failed", None, "u1"]
+        assert counts == {"leased": 1}
+
+    def test_worker_stats_merged_not_overwritten(self):
+        async def test(pool):
+            async def save(worker, processed):
+                async with pool.acquire() as conn:
+                    await queries.save_progress(
+                        conn, "src", [f"{worker}_{processed}"], {},
+                        {"processed": processed}, worker,
+                    )
+
+            await asyncio.gather(save("a", 1), save("b", 2))
+            await save("a", 3)
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    await queries.save_progress(
+                        conn, "other", [], {"page": 4}, {"processed": 5}
+                    )
+                stats = await conn.fetchval(
+                    "SELECT stats FROM enricher_checkpoints WHERE source = 'src'"
+                )
+            return json.loads(stats), await queries.load_progress(pool, "other")
+
+        stats, other = with_db(test)
+        assert stats == {"workers": {"a": {"processed": 3}, "b": {"processed": 2}}}
+        assert other == ([], {"page": 4})
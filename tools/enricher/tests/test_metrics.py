@@ -0,0 +1,154 @@
+"""Tests for run instrumentation — stage timing, reports, Prometheus output."""
+
+import json
+import os
+
+import pytest
+
+from tools.enricher.db.models import RunStats
+from tools.enricher.utils.metrics import (
+    Histogram,
+    RunMetrics,
+    current_metrics,
+    incr,
+    stage,
+    use_metrics,
+    write_prometheus_textfile,
+    write_run_report,
+)
+
+
+class TestRunMetrics:
+    def test_stage_accumulates_calls(self):
+        m = RunMetrics("test")
+        for _ in range(3):
+            with m.stage("parse"):
+                sum(range(1000))
+        assert m.stages["parse"].calls == 3
+        assert m.stages["parse"].wall_seconds > 0
+
+    def test_gauge_tracks_max_and_mean(self):
+        m = RunMetrics("test")
+        for v in (1, 5, 3):
+            m.gauge("queue", v)
+        g = m.gauges["queue"]
+        assert g.last == 3
+        assert g.max == 5
+        assert g.mean == 3
+
+    def test_module_stage_is_noop_when_unbound(self):
+        assert current_metrics() is None
+        with stage("parse"):
+            pass
+        incr("anything")
+
+    def test_use_metrics_binds_and_restores(self):
+        m = RunMetrics("test")
+        with use_metrics(m):
+            with stage("fetch"):
+                pass
+            incr("hits", 2)
+        assert current_metrics() is None
+        assert m.stages["fetch"].calls == 1
+        assert m.counters["hits"] == 2
+
+    def test_report_includes_throughput(self):
+        m = RunMetrics("test")
+        m.finish()
+        report = m.report(RunStats(processed=10))
+        assert report["stats"]["processed"] == 10
+        assert "records_per_second" in report
+
+
+class TestHistogram:
+    def test_buckets_are_upper_bounds(self):
+        h = Histogram(bounds=(0.1, 1.0))
+        for v in (0.05, 0.1, 0.5, 2.0):
+            h.observe(v)
+        assert h.counts == [2, 1, 1]
+        assert h.cumulative() == [("0.1", 2), ("1", 3), ("+Inf", 4)]
+
+    def test_quantile(self):
+        h = Histogram(bounds=(0.1, 1.0))
+        for v in [0.05] * 9 + [5.0]:
+            h.observe(v)
+        assert h.quantile(0.5) == 0.1
+        assert h.quantile(0.99) == float("inf")
+        assert Histogram().quantile(0.5) == 0.0
+
+    def test_host_stats_in_report(self):
+        m = RunMetrics("test")
+        hs = m.host("example.org")
+        hs.response(200, 0.2)
+        hs.response(None, 30.0)
+        hs.cache_event("hit")
+        report = m.report()["hosts"]["example.org"]
+        assert report["requests"] == 2
+        assert report["statuses"] == {"200": 1, "error": 1}
+        assert report["cache"] == {"hit": 1}
+        assert report["latency"]["p50"] == 0.25
+
+
+class TestOutputs:
+    def test_run_report_written(self, tmp_path):
+        shared = RunMetrics("shared")
+        src = RunMetrics("boroumand")
+        src.observe("parse", 0.5, 0.4)
+        path = write_run_report(
+            str(tmp_path), shared, {"boroumand": (src, RunStats(processed=2))}
+        )
+        data = json.loads(open(path, encoding="utf-8").read())
+        assert data["sources"]["boroumand"]["stages"]["parse"]["calls"] == 1
+        assert (tmp_path / "reports" / "latest.json").exists()
+
+    def test_failed_write_keeps_previous_files(self, tmp_path, monkeypatch):
+        # A scraper reading the textfile mid-write must never see half of it
+        out = tmp_path / "enricher.prom"
+        src = RunMetrics("boroumand")
+        write_prometheus_textfile(str(out), RunMetrics("shared"), {
+            "boroumand": (src, RunStats(matched=1)),
+        })
+        before = out.read_text()
+
+        def fail(src, dst):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(os, "replace", fail)
+        with pytest.raises(OSError):
+            write_prometheus_textfile(str(out), RunMetrics("shared"), {
+                "boroumand": (src, RunStats(matched=2)),
+            })
+        assert out.read_text() == before
+
+    def test_prometheus_textfile(self, tmp_path):
+        shared = RunMetrics("shared")
+        shared.observe("index_load.db", 1.5)
+        src = RunMetrics("telegram_rtn")
+        src.gauge("queue.enrich_batch", 7)
+        out = tmp_path / "enricher.prom"
+        write_prometheus_textfile(
+            str(out), shared, {"telegram_rtn": (src, RunStats(matched=4))}
+        )
+        text = out.read_text()
+        assert "# TYPE enricher_stage_wall_seconds_total counter" in text
+        assert (
+            'enricher_stage_wall_seconds_total{source="shared",stage="index_load.db"} 1.5'
+            in text
+        )
+        assert 'enricher_queue_depth_max{source="telegram_rtn",queue="queue.enrich_batch"} 7' in text
+        assert 'enricher_records_total{source="telegram_rtn",outcome="matched"} 4' in text
+        # Each metric family declared once
+        assert text.count("# TYPE enricher_records_total") == 1
+
+    def test_prometheus_http_histogram(self, tmp_path):
+        src = RunMetrics("boroumand")
+        src.host("example.org").response(200, 0.07)
+        out = tmp_path / "enricher.prom"
+        write_prometheus_textfile(str(out), RunMetrics("shared"), {"boroumand": (src, None)})
+        text = out.read_text()
+        labels = 'source="boroumand",host="example.org"'
+        assert "# TYPE enricher_http_request_duration_seconds histogram" in text
+        assert f'enricher_http_request_duration_seconds_bucket{{{labels},le="0.05"}} 0' in text
+        assert f'enricher_http_request_duration_seconds_bucket{{{labels},le="0.1"}} 1' in text
+        assert f'enricher_http_request_duration_seconds_count{{{labels}}} 1' in text
+        assert f'enricher_http_requests_total{{{labels},status="200"}} 1' in text
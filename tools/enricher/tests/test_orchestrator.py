@@ -0,0 +1,434 @@
+"""Tests for the orchestrator — shared-context source runs (dry run, no DB)."""
+
+import asyncio
+from datetime import date
+
+import pytest
+
+from tools.enricher import sources
+from tools.enricher.db import queries
+from tools.enricher.db.models import ExternalVictim, RunStats
+from tools.enricher.pipeline.matcher import build_index, match
+from tools.enricher.pipeline import orchestrator
+from tools.enricher.pipeline.orchestrator import (
+    BatchWriter,
+    EnrichmentContext,
+    _match_flushed,
+    enrich_source,
+    run_all_sources,
+)
+from tools.enricher.sources.base import SourcePlugin
+from tools.enricher.utils.http import OfflineMiss
+from tools.enricher.utils.progress import ProgressTracker
+
+
+def make_db_victim(vid, slug, name_latin, name_farsi=None, **extra):
+    base = {
+        "id": vid,
+        "slug": slug,
+        "name_latin": name_latin,
+        "name_farsi": name_farsi,
+        "date_of_death": date(2026, 1, 8),
+        "province": "Tehran",
+        "effective_province": "Tehran",
+    }
+    base.update(extra)
+    return base
+
+
+def make_plugin(plugin_name, records):
+    class StubPlugin(SourcePlugin):
+        @property
+        def name(self):
+            return plugin_name
+
+        @property
+        def full_name(self):
+            return f"Stub {plugin_name}"
+
+        @property
+        def base_url(self):
+            return f"https://{plugin_name}.example"
+
+        async def fetch_all(self):
+            for ext in records:
+                await asyncio.sleep(0)
+                yield ext
+
+    return StubPlugin
+
+
+def make_ext(source_name, n, **fields):
+    return ExternalVictim(
+        source_id=f"{source_name}_{n}",
+        source_name=source_name,
+        source_url=f"https://{source_name}.example/{n}",
+        source_type="test",
+        date_of_death=date(2026, 1, 8),
+        province="Tehran",
+        **fields,
+    )
+
+
+@pytest.fixture
+def ctx():
+    victims = [
+        make_db_victim("v1", "heydari-ali", "Ali Heydari", "علی حیدری"),
+        make_db_victim("v2", "rezaei-sara", "Sara Rezaei", "سارا رضایی"),
+    ]
+    return EnrichmentContext(
+        pool=None,
+        index=build_index(victims, {}),
+        photo_urls={},
+        city_resolver={},
+    )
+
+
+class TestConcurrentSources:
+    def test_shared_index_keeps_per_source_stats(self, ctx, tmp_path, monkeypatch):
+        a = [
+            make_ext("src_a", 1, name_latin="Ali Heydari", photo_url="https://p/1.jpg"),
+            make_ext("src_a", 2, name_latin="Nobody Known"),
+        ]
+        b = [
+            make_ext("src_b", 1, name_latin="Ali Heydari", photo_url="https://p/1.jpg"),
+            make_ext("src_b", 2, name_farsi="سارا رضایی", name_latin="Sara Rezaei"),
+            make_ext("src_b", 3, name_latin="Sara Rezaei"),
+        ]
+        monkeypatch.setitem(sources._REGISTRY, "src_a", make_plugin("src_a", a))
+        monkeypatch.setitem(sources._REGISTRY, "src_b", make_plugin("src_b", b))
+
+        async def run():
+            return await asyncio.gather(
+                enrich_source(ctx, "src_a", str(tmp_path), dry_run=True),
+                enrich_source(ctx, "src_b", str(tmp_path), dry_run=True),
+            )
+
+        stats_a, stats_b = asyncio.run(run())
+
+        assert stats_a.processed == 2
+        assert stats_a.matched == 1
+        assert stats_a.unmatched == 1
+        assert stats_b.processed == 3
+        assert stats_b.matched == 3
+        # The shared photo is counted once across both sources
+        assert stats_a.photos_added + stats_b.photos_added == 1
+        assert ctx.photo_urls["v1"] == {"https://p/1.jpg"}
+
+    def test_source_urls_recorded_in_index(self, ctx, tmp_path, monkeypatch):
+        records = [
+            make_ext("src_c", 1, name_latin="Sara Rezaei"),
+            make_ext("src_c", 1, name_latin="Sara Rezaei"),
+        ]
+        monkeypatch.setitem(sources._REGISTRY, "src_c", make_plugin("src_c", records))
+
+        stats = asyncio.run(enrich_source(ctx, "src_c", str(tmp_path), dry_run=True))
+
+        assert stats.sources_added == 1
+        assert stats.no_new_data == 1
+        assert "https://src_c.example/1" in ctx.index.source_urls["v2"]
+
+
+class TestLimit:
+    def test_stream_closed_when_limit_reached(self, ctx, tmp_path, monkeypatch):
+        closed = []
+
+        class EndlessPlugin(make_plugin("endless", [])):
+            async def fetch_all(self):
+                n = 0
+                try:
+                    while True:
+                        n += 1
+                        yield make_ext("endless", n, name_latin="Nobody Known")
+                finally:
+                    closed.append(n)
+
+        monkeypatch.setitem(sources._REGISTRY, "endless", EndlessPlugin)
+
+        async def run():
+            stats = await enrich_source(
+                ctx, "endless", str(tmp_path), dry_run=True, limit=3
+            )
+            # Closed by the run itself, not later by the event loop
+            return stats, list(closed)
+
+        stats, closed_on_return = asyncio.run(run())
+
+        assert stats.processed == 3
+        assert closed_on_return == [4]
+
+
+class TestImportNew:
+    def test_new_victims_dedupe_within_source(self, ctx, tmp_path, monkeypatch):
+        records = [
+            make_ext("src_d", 1, name_latin="Reza Karimi", name_farsi="رضا کریمی"),
+            make_ext("src_d", 2, name_latin="Reza Karimi", name_farsi="رضا کریمی",
+                     age_at_death=24),
+        ]
+        monkeypatch.setitem(sources._REGISTRY, "src_d", make_plugin("src_d", records))
+
+        stats = asyncio.run(enrich_source(
+            ctx, "src_d", str(tmp_path), mode="import-new", dry_run=True,
+        ))
+
+        assert stats.unmatched == 1
+        assert stats.matched == 1
+        assert stats.enriched == 1  # second record fills age_at_death
+        victim = ctx.index.by_slug["karimi-reza"]
+        assert victim["id"] == "dry-run:karimi-reza"
+        assert ctx.index.by_id["dry-run:karimi-reza"] is victim
+        assert not ctx.pending_victims
+
+    def test_enrich_mode_does_not_index_unmatched(self, ctx, tmp_path, monkeypatch):
+        records = [make_ext("src_e", 1, name_latin="Reza Karimi")]
+        monkeypatch.setitem(sources._REGISTRY, "src_e", make_plugin("src_e", records))
+
+        asyncio.run(enrich_source(ctx, "src_e", str(tmp_path), dry_run=True))
+
+        assert "karimi-reza" not in ctx.index.by_slug
+
+
+class FakeConn:
+    """Records statements and whether they ran inside a transaction."""
+
+    def __init__(self, log):
+        self.log = log
+        self.in_tx = False
+
+    def transaction(self):
+        conn = self
+
+        class Tx:
+            async def __aenter__(self):
+                conn.in_tx = True
+                conn.log.append(("BEGIN", None))
+
+            async def __aexit__(self, *exc):
+                conn.in_tx = False
+                conn.log.append(("COMMIT" if exc[0] is None else "ROLLBACK", None))
+
+        return Tx()
+
+    async def executemany(self, query, rows):
+        self.log.append((_stmt(query), self.in_tx))
+
+    async def execute(self, query, *args):
+        self.log.append((_stmt(query), self.in_tx))
+
+    async def fetchrow(self, query, *args):
+        self.log.append((_stmt(query), self.in_tx))
+        return {"id": f"new-{args[0]}"}
+
+
+class FakePool:
+    def __init__(self):
+        self.log = []
+
+    def acquire(self):
+        conn = FakeConn(self.log)
+
+        class Acquire:
+            async def __aenter__(self):
+                return conn
+
+            async def __aexit__(self, *exc):
+                return None
+
+        return Acquire()
+
+
+def _stmt(query):
+    return " ".join(query.split()[:3])
+
+
+class TestTransactionalFlush:
+    def test_progress_written_in_flush_transaction(self, ctx, tmp_path, monkeypatch):
+        pool = FakePool()
+        ctx.pool = pool
+        records = [
+            make_ext("src_f", 1, name_latin="Ali Heydari", age_at_death=30),
+            make_ext("src_f", 2, name_latin="Reza Karimi"),
+        ]
+        monkeypatch.setitem(sources._REGISTRY, "src_f", make_plugin("src_f", records))
+
+        stats = asyncio.run(enrich_source(
+            ctx, "src_f", str(tmp_path), mode="full", resume=False,
+        ))
+
+        assert stats.new_imported == 1
+        # First transaction is the reset (resume=False), second the flush
+        begin = len(pool.log) - 1 - pool.log[::-1].index(("BEGIN", None))
+        commit = len(pool.log) - 1
+        in_tx = [stmt for stmt, tx in pool.log[begin + 1:commit]]
+        assert any(s.startswith("UPDATE victims SET") for s in in_tx)
+        assert any(s.startswith("INSERT INTO victims") for s in in_tx)
+        assert any("enricher_progress" in s for s in in_tx)
+        assert any("enricher_checkpoints" in s for s in in_tx)
+        assert all(tx for _, tx in pool.log[begin + 1:commit])
+
+
+class SlowConn(FakeConn):
+    """FakeConn whose statements take a while; records durable progress ids."""
+
+    async def executemany(self, query, rows):
+        await asyncio.sleep(0.01)
+        if query == queries.INSERT_PROGRESS_ID:
+            self.durable.extend(sid for _, sid in rows)
+        await super().executemany(query, rows)
+
+    async def execute(self, query, *args):
+        await asyncio.sleep(0.01)
+        await super().execute(query, *args)
+
+
+class SlowPool(FakePool):
+    def __init__(self):
+        super().__init__()
+        self.durable = []
+
+    def acquire(self):
+        conn = SlowConn(self.log)
+        conn.durable = self.durable
+
+        class Acquire:
+            async def __aenter__(self):
+                return conn
+
+            async def __aexit__(self, *exc):
+                return None
+
+        return Acquire()
+
+
+class TestOverlappingFlush:
+    def test_pending_ids_survive_overlapping_flushes(self, ctx, tmp_path):
+        """A second flush (e.g. from _match_flushed) while one is in flight."""
+        pool = SlowPool()
+        ctx.pool = pool
+        progress = ProgressTracker("src", str(tmp_path))
+        writer = BatchWriter(ctx, "src", RunStats(), progress)
+
+        async def run():
+            progress.mark_processed("src_1")
+            first = asyncio.create_task(writer.flush())
+            await asyncio.sleep(0.005)
+            progress.mark_processed("src_2")
+            second = asyncio.create_task(writer.flush())
+            await asyncio.sleep(0.005)
+            progress.mark_processed("src_3")
+            await first
+            progress.mark_processed("src_4")
+            await second
+
+        asyncio.run(run())
+
+        # Every id is either durable or still pending — none is lost
+        assert sorted(pool.durable + progress.pending_ids) == [
+            "src_1", "src_2", "src_3", "src_4",
+        ]
+        assert len(pool.durable) == len(set(pool.durable))
+
+
+class FailingPool(FakePool):
+    """FakePool whose victim INSERT fails (e.g. a constraint violation)."""
+
+    def acquire(self):
+        conn = FakeConn(self.log)
+
+        async def fetchrow(query, *args):
+            raise RuntimeError("insert failed")
+
+        conn.fetchrow = fetchrow
+
+        class Acquire:
+            async def __aenter__(self):
+                return conn
+
+            async def __aexit__(self, *exc):
+                return None
+
+        return Acquire()
+
+
+class TestFailedFlush:
+    def queue(self, ctx, tmp_path, pool):
+        ctx.pool = pool
+        writer = BatchWriter(
+            ctx, "src_a", RunStats(), ProgressTracker("src_a", str(tmp_path))
+        )
+        assert writer.add_new_victim(make_ext("src_a", 1, name_latin="Reza Karimi"))
+        probe = make_ext("src_b", 1, name_latin="Reza Karimi")
+        assert match(probe, ctx.index).victim["id"] is None
+        return writer, probe
+
+    def match_bounded(self, writer, probe, ctx):
+        """_match_flushed, failing instead of spinning on the same flush."""
+        flush, calls = writer.flush, []
+
+        async def counted():
+            calls.append(1)
+            if len(calls) > 2:
+                pytest.fail("_match_flushed keeps flushing")
+            await flush()
+
+        writer.flush = counted
+        return asyncio.run(_match_flushed(probe, ctx))
+
+    def test_failed_flush_forgets_queued_victims(self, ctx, tmp_path):
+        writer, probe = self.queue(ctx, tmp_path, FailingPool())
+        slug = writer.victims[0][0]["slug"]
+        assert slug in ctx.index.by_slug
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(writer.flush())
+
+        assert ctx.pending_victims == {}
+        assert slug not in ctx.index.by_slug
+        assert not self.match_bounded(writer, probe, ctx).matched
+
+    def test_match_stops_when_flush_writes_nothing(self, ctx, tmp_path):
+        writer, probe = self.queue(ctx, tmp_path, FakePool())
+        writer.victims = []  # queued, but no longer in the writer's buffers
+
+        assert not self.match_bounded(writer, probe, ctx).matched
+        assert ctx.pending_victims == {}
+
+
+class TestOfflineMissAcrossSources:
+    def test_other_sources_stopped_before_teardown(self, tmp_path, monkeypatch):
+        events = []
+
+        async def get_pool(url):
+            return FakePool()
+
+        async def close_pool():
+            events.append("close_pool")
+
+        async def load_context(pool):
+            return EnrichmentContext(
+                pool=pool, index=build_index([], {}), photo_urls={},
+                city_resolver={},
+            )
+
+        async def fake_enrich(ctx, name, state_dir, **kwargs):
+            if name == "missing":
+                await asyncio.sleep(0)
+                raise OfflineMiss("https://x/1")
+            try:
+                while True:
+                    await asyncio.sleep(0)
+            except asyncio.CancelledError:
+                events.append("cancelled")
+                raise
+
+        monkeypatch.setattr(orchestrator, "get_pool", get_pool)
+        monkeypatch.setattr(orchestrator, "close_pool", close_pool)
+        monkeypatch.setattr(orchestrator, "load_context", load_context)
+        monkeypatch.setattr(orchestrator, "enrich_source", fake_enrich)
+        monkeypatch.setattr(
+            orchestrator, "list_plugins", lambda: ["missing", "slow"]
+        )
+
+        with pytest.raises(OfflineMiss):
+            asyncio.run(run_all_sources("postgresql://", str(tmp_path), concurrency=2))
+        assert events == ["cancelled", "close_pool"]
@@ -0,0 +1,82 @@
+"""The single-scan extractors must return what the old regex extractors did."""
+
+from pathlib import Path
+
+import pytest
+
+from tools.enricher.benchmarks import legacy_parsers
+from tools.enricher.benchmarks.parse_bench import standin_pages
+from tools.enricher.sources.boroumand import parse_detail_en
+from tools.enricher.sources.telegram_rtn import extract_posts
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def fixture(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+class TestDetailPage:
+    @pytest.mark.parametrize(
+        "name", ["boroumand_story_en.html", "boroumand_story_sparse.html"]
+    )
+    def test_fixture_pages(self, name):
+        html = fixture(name)
+        assert parse_detail_en(html) == legacy_parsers.parse_detail_en(html)
+
+    def test_fixture_fields(self):
+        data = parse_detail_en(fixture("boroumand_story_en.html"))
+        assert data["name"] == "Mehdi Hazrati"
+        assert data["photo_url"] == "/actorphotos/18342.jpg"
+        assert data["location"] == "Karaj, Alborz Province, Iran"
+        assert "occupation" not in data
+        assert "Hadis Najafi" in data["narrative"]
+        assert "Correct" not in data["narrative"]
+        assert "<" not in data["narrative"]
+
+    def test_standin_pages(self):
+        for html in standin_pages("boroumand", 20, 4):
+            assert parse_detail_en(html) == legacy_parsers.parse_detail_en(html)
+
+    @pytest.mark.parametrize("html", [
+        "",
+        "<h2>About this Case</h2> no end",
+        "<h1 class='page-top'>A</h1><h1 class='page-top'>B</h1>",
+        "<p><em>Age:</em> 3</p><p><em>Age:</em> ---</p>",
+    ])
+    def test_edge_cases(self, html):
+        assert parse_detail_en(html) == legacy_parsers.parse_detail_en(html)
+
+
+class TestChannelPage:
+    def test_fixture_page(self):
+        html = fixture("telegram_channel.html")
+        assert extract_posts(html) == legacy_parsers.extract_posts(html)
+
+    def test_fixture_posts(self):
+        posts = extract_posts(fixture("telegram_channel.html"))
+        assert [p["post_number"] for p in posts] == [120, 121, 122, 124]
+        assert posts[0]["text"].startswith("۱۱۸. محمد حسن‌زاده\n")
+        assert "رشت & لاهیجان" in posts[0]["text"]
+        assert posts[1]["text"] == (
+            'Mohammad "Mamad" Rezaei <19>\n'
+            "Shot in Tehran's Sattarkhan St. — report"
+        )
+        assert posts[2]["photo_url"].endswith("kR9o-122a.jpg")
+        assert posts[3] == {"post_number": 124, "text": "", "photo_url": None}
+
+    def test_standin_pages(self):
+        for html in standin_pages("telegram_rtn", 20, 4):
+            assert extract_posts(html) == legacy_parsers.extract_posts(html)
+
+    def test_other_entities_now_decoded(self):
+        # Intended difference: the old parser only knew five entities
+        html = (
+            '<div data-post="RememberTheirNames/9">'
+            '<div class="tgme_widget_message_text" dir="auto">'
+            "Ali&nbsp;Reza &#8211; Tehran</div>"
+        )
+        assert legacy_parsers.extract_posts(html)[0]["text"] == (
+            "Ali&nbsp;Reza &#8211; Tehran"
+        )
+        assert extract_posts(html)[0]["text"] == "Ali\xa0Reza – Tehran"
@@ -0,0 +1,29 @@
+"""Tests for the optional parse process pool."""
+
+import asyncio
+import os
+
+from tools.enricher.utils import parsing
+from tools.enricher.utils.metrics import RunMetrics, use_metrics
+
+
+class TestParsePool:
+    def test_inline_without_pool(self):
+        m = RunMetrics("test")
+        with use_metrics(m):
+            pid = asyncio.run(parsing.parse(os.getpid))
+        assert pid == os.getpid()
+        assert m.stages["parse"].calls == 1
+
+    def test_runs_in_worker_processes(self):
+        parsing.start_pool(2)
+        try:
+            async def run():
+                return await asyncio.gather(
+                    *(parsing.parse(os.getpid) for _ in range(4))
+                )
+            pids = asyncio.run(run())
+        finally:
+            parsing.shutdown_pool()
+        assert os.getpid() not in pids
+        assert parsing._pool is None
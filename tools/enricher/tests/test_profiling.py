@@ -0,0 +1,83 @@
+"""Tests for the run profiler — pstats and collapsed-stack output."""
+
+import pstats
+import time
+import tracemalloc
+
+import pytest
+
+from tools.enricher.utils.profiling import Profiler, collapse_pstats
+
+
+def busy_match_loop(seconds=0.05):
+    end = time.perf_counter() + seconds
+    n = 0
+    while time.perf_counter() < end:
+        n += sum(range(200))
+    return n
+
+
+def read_collapsed(path):
+    rows = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            stack, value = line.rstrip("\n").rsplit(" ", 1)
+            rows[stack] = int(value)
+    return rows
+
+
+class TestProfiler:
+    @pytest.mark.parametrize("mode", ["cprofile", "sampling"])
+    def test_writes_pstats_and_collapsed(self, tmp_path, mode):
+        p = Profiler(mode, str(tmp_path), label="boroumand", interval=0.001)
+        p.start()
+        busy_match_loop()
+        paths = p.stop()
+
+        prof = next(x for x in paths if x.endswith(".prof"))
+        collapsed = next(x for x in paths if x.endswith(".collapsed"))
+        assert "/profiles/boroumand-" in prof
+
+        stats = pstats.Stats(prof)
+        assert any(f[2] == "busy_match_loop" for f in stats.stats)
+
+        rows = read_collapsed(collapsed)
+        assert rows
+        assert any("busy_match_loop (test_profiling.py:" in s for s in rows)
+
+    def test_rejects_unknown_mode(self, tmp_path):
+        with pytest.raises(ValueError):
+            Profiler("perf", str(tmp_path), label="x")
+
+    def test_memory_snapshots(self, tmp_path):
+        p = Profiler("sampling", str(tmp_path), label="all", memory=True)
+        p.start()
+        data = [str(i) * 10 for i in range(1000)]
+        p.snapshot("index_load")
+        paths = p.stop()
+        assert len(data) == 1000
+
+        mem = [x for x in paths if x.endswith(".tracemalloc")]
+        assert len(mem) == 2  # index_load + end
+        assert tracemalloc.Snapshot.load(mem[0]).traces
+        assert not tracemalloc.is_tracing()
+
+
+class TestCollapsePstats:
+    def test_splits_time_across_callers(self):
+        a = ("a.py", 1, "a")
+        b = ("b.py", 1, "b")
+        leaf = ("c.py", 1, "leaf")
+        stats = {
+            a: (1, 1, 0.0, 0.3, {}),
+            b: (1, 1, 0.0, 0.1, {}),
+            leaf: (2, 2, 0.4, 0.4, {a: (1, 1, 0.3, 0.3), b: (1, 1, 0.1, 0.1)}),
+        }
+        out = collapse_pstats(stats)
+        assert out["a (a.py:1);leaf (c.py:1)"] == pytest.approx(300_000)
+        assert out["b (b.py:1);leaf (c.py:1)"] == pytest.approx(100_000)
+
+    def test_cuts_recursion(self):
+        f = ("f.py", 1, "f")
+        stats = {f: (3, 1, 0.2, 0.2, {f: (2, 2, 0.1, 0.1)})}
+        assert collapse_pstats(stats) == {"f (f.py:1)": pytest.approx(200_000)}
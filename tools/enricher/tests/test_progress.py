@@ -0,0 +1,154 @@
+"""Tests for ProgressTracker — pending ids, commit, restore and storage."""
+
+import json
+import os
+
+import pytest
+
+from tools.enricher.db.models import RunStats
+from tools.enricher.utils import progress
+from tools.enricher.utils.progress import ProgressTracker, Watermark, read_status
+
+
+class TestPending:
+    def test_marked_ids_are_pending_until_commit(self, tmp_path):
+        p = ProgressTracker("src", str(tmp_path))
+        p.mark_processed("src_1")
+        p.mark_processed("src_2")
+        assert p.pending_ids == ["src_1", "src_2"]
+        assert p.is_processed("src_1")
+
+        p.commit(["src_1"])
+        assert p.pending_ids == ["src_2"]
+
+    def test_remarking_is_noop(self, tmp_path):
+        p = ProgressTracker("src", str(tmp_path))
+        p.mark_processed("src_1")
+        p.mark_processed("src_1")
+        assert p.pending_ids == ["src_1"]
+        assert p.processed_count == 1
+
+    def test_restore_replaces_state(self, tmp_path):
+        p = ProgressTracker("src", str(tmp_path))
+        p.mark_processed("src_9")
+        p.set_checkpoint("browse_page", 9)
+
+        p.restore(["src_1", "src_2"], {"browse_page": 3})
+
+        assert p.processed_count == 2
+        assert not p.is_processed("src_9")
+        assert p.get_checkpoint("browse_page") == 3
+        assert p.pending_ids == []
+
+    def test_checkpoint_is_a_copy(self, tmp_path):
+        p = ProgressTracker("src", str(tmp_path))
+        p.set_checkpoint("page", 1)
+        snapshot = p.checkpoint
+        p.set_checkpoint("page", 2)
+        assert snapshot == {"page": 1}
+
+    def test_save_and_reload(self, tmp_path):
+        p = ProgressTracker("src", str(tmp_path))
+        p.mark_processed("src_1")
+        p.save(RunStats(processed=1))
+
+        again = ProgressTracker("src", str(tmp_path))
+        assert again.is_processed("src_1")
+        assert again.pending_ids == []
+
+
+class TestStorage:
+    def test_save_appends_only_new_ids(self, tmp_path):
+        p = ProgressTracker("src", str(tmp_path))
+        p.mark_processed("src_1")
+        p.save()
+        p.mark_processed("src_2")
+        p.save()
+        p.save()
+        assert open(p.ids_path).read() == "src_1\nsrc_2\n"
+
+    def test_status_reads_count_from_header(self, tmp_path):
+        p = ProgressTracker("src", str(tmp_path))
+        for i in range(5):
+            p.mark_processed(f"src_{i}")
+        p.save(RunStats(processed=5))
+        header = read_status(p.file_path)
+        assert header["processed_count"] == 5
+        assert "processed_ids" not in header
+
+    def test_restore_rewrites_ids(self, tmp_path):
+        p = ProgressTracker("src", str(tmp_path))
+        p.mark_processed("src_9")
+        p.save()
+        p.restore(["src_1"], {})
+        p.save()
+        assert not ProgressTracker("src", str(tmp_path)).is_processed("src_9")
+
+    def test_partial_last_line_ignored(self, tmp_path):
+        p = ProgressTracker("src", str(tmp_path))
+        p.mark_processed("src_12")
+        p.save()
+        with open(p.ids_path, "a") as f:
+            f.write("src_1")  # crash mid-append of "src_123"
+        again = ProgressTracker("src", str(tmp_path))
+        assert again.is_processed("src_12")
+        assert not again.is_processed("src_1")
+        again.mark_processed("src_5")
+        again.save()
+        assert sorted(ProgressTracker("src", str(tmp_path))._processed) == [
+            "src_12", "src_5",
+        ]
+
+    def test_log_compacted_into_snapshot(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(progress, "COMPACT_AFTER", 3)
+        p = ProgressTracker("src", str(tmp_path))
+        for i in range(5):
+            p.mark_processed(f"src_{i}")
+            p.save()
+        assert os.path.exists(p.snap_path)
+        assert len(open(p.ids_path).read().split()) < 3
+        again = ProgressTracker("src", str(tmp_path))
+        assert again.processed_count == 5
+        assert all(again.is_processed(f"src_{i}") for i in range(5))
+
+    def test_failed_save_keeps_header_and_no_temp_file(self, tmp_path, monkeypatch):
+        p = ProgressTracker("src", str(tmp_path))
+        p.mark_processed("src_1")
+        p.save(RunStats(processed=1))
+        before = open(p.file_path).read()
+
+        def fail(src, dst):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(os, "replace", fail)
+        p.mark_processed("src_2")
+        with pytest.raises(OSError):
+            p.save(RunStats(processed=2))
+        assert open(p.file_path).read() == before
+        assert not os.path.exists(p.file_path + ".tmp")
+
+    def test_legacy_file_migrated(self, tmp_path):
+        path = tmp_path / "progress" / "src.json"
+        path.parent.mkdir()
+        path.write_text(json.dumps({
+            "source": "src", "last_run": None, "processed_ids": ["src_1", "src_2"],
+            "stats": {}, "checkpoint": {"page": 4},
+        }))
+        assert read_status(str(path))["processed_count"] == 2
+
+        p = ProgressTracker("src", str(tmp_path))
+        assert p.is_processed("src_2")
+        assert p.get_checkpoint("page") == 4
+        p.save()
+        assert "processed_ids" not in json.loads(path.read_text())
+        assert ProgressTracker("src", str(tmp_path)).processed_count == 2
+
+
+class TestWatermark:
+    def test_advances_over_contiguous_units_only(self):
+        w = Watermark(2)
+        assert w.complete(4) == 2
+        assert w.complete(5) == 2
+        assert w.complete(3) == 5
+        assert w.complete(2) == 5  # already below the watermark
+        assert w.complete(6) == 6
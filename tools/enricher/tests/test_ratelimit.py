@@ -0,0 +1,231 @@
+"""Tests for the per-host rate limiter and its use in fetch_with_retry."""
+
+import asyncio
+import time
+
+import pytest
+
+from tools.enricher.utils import ratelimit
+from tools.enricher.utils.cache import close_stores
+from tools.enricher.utils.http import _write_cache, fetch_with_retry
+from tools.enricher.utils.ratelimit import (
+    AIMDController,
+    HostLimit,
+    HostLimiter,
+    configure_host,
+    limiter_for,
+    parse_retry_after,
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry():
+    ratelimit.reset_limiters()
+    yield
+    ratelimit.reset_limiters()
+    close_stores()
+
+
+async def timed_requests(limiter, n, duration=0.0):
+    starts = []
+
+    async def one():
+        async with limiter.acquire():
+            starts.append(time.monotonic())
+            await asyncio.sleep(duration)
+
+    t0 = time.monotonic()
+    await asyncio.gather(*(one() for _ in range(n)))
+    return [s - t0 for s in starts]
+
+
+class TestHostLimiter:
+    def test_rate_spaces_requests(self):
+        limiter = HostLimiter("h", HostLimit(rate=50, burst=1, max_in_flight=10))
+        starts = asyncio.run(timed_requests(limiter, 5))
+        # First token is available immediately, then one every 20ms
+        assert starts[-1] >= 0.07
+
+    def test_burst_is_immediate(self):
+        limiter = HostLimiter("h", HostLimit(rate=1, burst=3, max_in_flight=10))
+        starts = asyncio.run(timed_requests(limiter, 3))
+        assert max(starts) < 0.05
+
+    def test_window_caps_in_flight(self):
+        limiter = HostLimiter("h", HostLimit(rate=1000, burst=10, max_in_flight=4))
+        limiter.control.window = 2.0
+        peak = 0
+
+        async def one():
+            nonlocal peak
+            async with limiter.acquire():
+                peak = max(peak, limiter.in_flight)
+                await asyncio.sleep(0.01)
+
+        async def run():
+            await asyncio.gather(*(one() for _ in range(6)))
+
+        asyncio.run(run())
+        assert peak == 2
+        assert limiter.in_flight == 0
+
+    def test_successes_open_the_window(self):
+        limiter = HostLimiter("h", HostLimit(rate=1000, burst=10, max_in_flight=4))
+        peak = 0
+
+        async def one():
+            nonlocal peak
+            async with limiter.acquire() as slot:
+                peak = max(peak, limiter.in_flight)
+                await asyncio.sleep(0.005)
+                slot.done(200)
+
+        async def run():
+            await asyncio.gather(*(one() for _ in range(30)))
+
+        asyncio.run(run())
+        assert limiter.window == 4
+        assert peak == 4
+
+    def test_survives_new_event_loop(self):
+        limiter = HostLimiter("h", HostLimit(rate=1000, burst=5))
+        asyncio.run(timed_requests(limiter, 2))
+        asyncio.run(timed_requests(limiter, 2))
+
+
+class TestAIMDController:
+    def grown(self, n=20, max_window=8):
+        c = AIMDController(max_window)
+        for _ in range(n):
+            c.on_success(0.1)
+        return c
+
+    def test_additive_increase_up_to_max(self):
+        c = AIMDController(8)
+        c.on_success(0.1)
+        assert c.window == 2.0
+        assert self.grown(200).window == 8
+
+    def test_throttle_halves_window_and_rate(self):
+        c = self.grown()
+        window = c.window
+        c.on_throttle()
+        assert c.window == pytest.approx(window / 2)
+        assert c.rate_scale == 0.5
+
+    def test_decrease_at_most_once_per_round_trip(self):
+        c = self.grown()
+        window = c.window
+        c.on_throttle()
+        c.on_throttle()
+        assert c.window == pytest.approx(window / 2)
+
+    def test_never_below_one(self):
+        c = AIMDController(4)
+        c.on_throttle()
+        assert c.window == 1.0
+
+    def test_latency_spike_counts_as_congestion(self):
+        c = self.grown()
+        window = c.window
+        c.on_success(1.0)  # 10× the baseline
+        assert c.window < window
+
+    def test_retry_after_pauses_host(self):
+        c = AIMDController(4)
+        c.on_throttle(retry_after=30)
+        assert c.paused_until - time.monotonic() == pytest.approx(30, abs=1)
+
+
+class TestRetryAfter:
+    def test_seconds(self):
+        assert parse_retry_after({"Retry-After": "120"}) == 120
+
+    def test_http_date(self):
+        wait = parse_retry_after({"Retry-After": "Thu, 01 Jan 2099 00:00:00 GMT"})
+        assert wait > 0
+
+    def test_missing_or_garbage(self):
+        assert parse_retry_after({}) is None
+        assert parse_retry_after({"Retry-After": "soon"}) is None
+
+
+class TestRegistry:
+    def test_limiter_shared_per_host(self):
+        a = limiter_for("https://www.iranrights.org/memorial/story/1")
+        b = limiter_for("https://WWW.iranrights.org/fa/memorial/story/1")
+        assert a is b
+        assert limiter_for("https://t.me/s/x") is not a
+
+    def test_configure_updates_existing(self):
+        limiter = limiter_for("https://t.me/s/x")
+        assert configure_host("t.me", HostLimit(rate=0.5)) is limiter
+        assert limiter.limit.rate == 0.5
+
+    def test_from_config_overrides_defaults(self):
+        limit = HostLimit.from_config(
+            {"requests_per_second": 2, "max_in_flight": 8},
+            HostLimit(rate=1.0, burst=2),
+        )
+        assert limit == HostLimit(rate=2.0, burst=2, max_in_flight=8)
+
+    @pytest.mark.parametrize("config", [
+        {"requests_per_second": 0},
+        {"requests_per_second": -1},
+        {"requests_per_second": float("nan")},
+        {"burst": 0},
+        {"max_in_flight": 0},
+    ])
+    def test_from_config_rejects_unusable_limits(self, config):
+        with pytest.raises(ValueError):
+            HostLimit.from_config(config, HostLimit(rate=1.0))
+
+
+class TestFetchWithRetry:
+    def test_cache_hit_bypasses_limiter(self, tmp_path):
+        url = "https://slow.example/page"
+        _write_cache(str(tmp_path), url, "<html>cached</html>")
+        # One request per 100s: a network fetch would block the test
+        configure_host("slow.example", HostLimit(rate=0.01, burst=1))
+
+        async def run():
+            return [
+                await fetch_with_retry(None, url, cache_dir=str(tmp_path))
+                for _ in range(3)
+            ]
+
+        t0 = time.monotonic()
+        assert asyncio.run(run()) == ["<html>cached</html>"] * 3
+        assert time.monotonic() - t0 < 0.5
+
+    def test_server_errors_feed_the_controller(self):
+        class Resp:
+            def __init__(self, status):
+                self.status = status
+                self.headers = {}
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return None
+
+            async def read(self):
+                return b"ok"
+
+            async def text(self):
+                return "ok"
+
+        class Session:
+            def __init__(self):
+                self.statuses = [503, 200]
+
+            def get(self, url, headers=None):
+                return Resp(self.statuses.pop(0))
+
+        limiter = configure_host("busy.example", HostLimit(rate=1000, burst=5))
+        result = asyncio.run(fetch_with_retry(
+            Session(), "https://busy.example/x", backoff_base=0
+        ))
+        assert result == "ok"
+        assert limiter.control.rate_scale < 1
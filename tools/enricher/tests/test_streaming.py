@@ -0,0 +1,286 @@
+"""Tests for streamed downloads and the incremental CSV/JSON parsers."""
+
+import asyncio
+import csv
+import io
+import json
+import os
+from functools import partial
+
+import aiohttp
+import pytest
+
+from tools.enricher.sources import iranvictims
+from tools.enricher.sources.iranvictims import CSV_URL, IranvictimsPlugin
+from tools.enricher.utils import http, ratelimit
+from tools.enricher.utils.http import (
+    CachePolicy,
+    StreamInterrupted,
+    fetch_stream,
+    set_cache_policy,
+)
+from tools.enricher.utils.progress import ProgressTracker
+from tools.enricher.utils.streaming import (
+    iter_csv_dicts,
+    iter_csv_records,
+    iter_json_array,
+)
+
+URL = "https://origin.example/dump.csv"
+
+
+async def chunked(text, size):
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+
+def collect(agen):
+    async def run():
+        return [item async for item in agen]
+    return asyncio.run(run())
+
+
+class FakeContent:
+    def __init__(self, body, fail_after=None):
+        self.body = body
+        self.fail_after = fail_after
+
+    async def iter_chunked(self, size):
+        for n, i in enumerate(range(0, len(self.body), size)):
+            if self.fail_after is not None and n >= self.fail_after:
+                raise aiohttp.ClientPayloadError("connection reset")
+            yield self.body[i:i + size]
+
+
+class StreamResponse:
+    def __init__(self, status, body=b"", headers=None, fail_after=None):
+        self.status = status
+        self.headers = headers or {}
+        self.charset = "utf-8"
+        self.content = FakeContent(body, fail_after)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return None
+
+
+class FakeSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None):
+        self.requests.append((url, headers or {}))
+        return self.responses.pop(0)
+
+
+@pytest.fixture(autouse=True)
+def fast_limiter():
+    ratelimit.reset_limiters()
+    ratelimit.configure_host("origin.example", ratelimit.HostLimit(rate=1000, burst=10))
+    yield
+    ratelimit.reset_limiters()
+    http._cache_policies.clear()
+
+
+def stream(session, cache_dir=None, chunk_size=7):
+    return collect(fetch_stream(
+        session, URL, cache_dir=cache_dir, backoff_base=0,
+        chunk_size=chunk_size,
+    ))
+
+
+CSV_TEXT = (
+    'Card ID,Name,Notes\r\n'
+    '1,Ali,"line one\r\nline two"\r\n'
+    '2,"Sara ""S""",plain\r\n'
+    '\r\n'
+    '3,Reza,"comma, inside"\r\n'
+)
+
+
+class TestCsvStreaming:
+    @pytest.mark.parametrize("size", [1, 2, 5, 13, 1000])
+    def test_matches_csv_module_at_any_chunk_size(self, size):
+        expected = list(csv.DictReader(io.StringIO(CSV_TEXT)))
+        assert collect(iter_csv_dicts(chunked(CSV_TEXT, size))) == expected
+
+    def test_no_trailing_newline(self):
+        rows = collect(iter_csv_records(chunked("a,b\n1,2", 3)))
+        assert rows == [["a", "b"], ["1", "2"]]
+
+    def test_persian_text(self):
+        text = "Card ID,Persian Name\n1,علی\n"
+        rows = collect(iter_csv_dicts(chunked(text, 4)))
+        assert rows == [{"Card ID": "1", "Persian Name": "علی"}]
+
+    def test_extra_and_missing_fields_like_dictreader(self):
+        text = "a,b,c\n1,2,3,4,5\n1\n"
+        expected = list(csv.DictReader(io.StringIO(text)))
+        assert collect(iter_csv_dicts(chunked(text, 3))) == expected
+        assert expected == [
+            {"a": "1", "b": "2", "c": "3", None: ["4", "5"]},
+            {"a": "1", "b": None, "c": None},
+        ]
+
+    def test_interrupted_stream_drops_partial_last_row(self):
+        async def broken():
+            yield "Card ID,English Name\n1,Ali\n2,Moham"
+            raise StreamInterrupted("connection reset")
+
+        rows = []
+
+        async def run():
+            async for row in iter_csv_dicts(broken()):
+                rows.append(row)
+
+        with pytest.raises(StreamInterrupted):
+            asyncio.run(run())
+        assert rows == [{"Card ID": "1", "English Name": "Ali"}]
+
+
+class TestJsonArrayStreaming:
+    @pytest.mark.parametrize("size", [1, 3, 8, 1000])
+    def test_yields_elements(self, size):
+        data = [{"id": 1, "name": "a]"}, 12345, "x", None, [1, 2], -1.5e3]
+        text = " " + json.dumps(data) + "\n"
+        assert collect(iter_json_array(chunked(text, size))) == data
+
+    def test_empty_array(self):
+        assert collect(iter_json_array(chunked("[ ]", 1))) == []
+
+    def test_not_an_array(self):
+        with pytest.raises(ValueError):
+            collect(iter_json_array(chunked('{"a": 1}', 2)))
+
+    def test_truncated(self):
+        with pytest.raises(ValueError):
+            collect(iter_json_array(chunked('[{"a": 1}, {"b"', 4)))
+
+
+class TestFetchStream:
+    def test_streams_and_caches(self, tmp_path):
+        body = "Card ID\n1\nعلی\n".encode()
+        session = FakeSession(StreamResponse(200, body, {"ETag": '"v1"'}))
+        assert "".join(stream(session, str(tmp_path))) == body.decode()
+
+        # Fresh copy is served from disk without a request
+        set_cache_policy(str(tmp_path), CachePolicy(ttl=3600))
+        assert "".join(stream(FakeSession(), str(tmp_path))) == body.decode()
+
+    def test_multibyte_split_across_chunks(self):
+        body = "علی".encode()
+        session = FakeSession(StreamResponse(200, body))
+        assert "".join(stream(session, chunk_size=1)) == "علی"
+
+    def test_stale_copy_revalidated(self, tmp_path):
+        stream(FakeSession(StreamResponse(200, b"old", {"ETag": '"v1"'})), str(tmp_path))
+        set_cache_policy(str(tmp_path), CachePolicy(ttl=0))
+
+        session = FakeSession(StreamResponse(304))
+        assert "".join(stream(session, str(tmp_path))) == "old"
+        assert session.requests[0][1]["If-None-Match"] == '"v1"'
+
+    def test_interrupted_download_raises_and_is_not_kept(self, tmp_path):
+        session = FakeSession(StreamResponse(200, b"a" * 50, fail_after=2))
+        chunks = []
+
+        async def run():
+            async for text in fetch_stream(
+                session, URL, cache_dir=str(tmp_path), backoff_base=0,
+                chunk_size=7,
+            ):
+                chunks.append(text)
+
+        with pytest.raises(StreamInterrupted):
+            asyncio.run(run())
+        assert "".join(chunks) == "a" * 14
+        assert len(session.requests) == 1  # no retry once data was yielded
+        assert os.listdir(tmp_path / "downloads") == []
+
+    def test_retries_before_first_chunk(self):
+        session = FakeSession(StreamResponse(503), StreamResponse(200, b"ok"))
+        assert "".join(stream(session)) == "ok"
+
+    def test_not_found_yields_nothing(self):
+        assert stream(FakeSession(StreamResponse(404))) == []
+
+    def test_early_close_frees_host_slot(self):
+        session = FakeSession(StreamResponse(200, b"a" * 50))
+        limiter = ratelimit.get_limiter("origin.example")
+
+        async def run():
+            chunks = fetch_stream(session, URL, chunk_size=7)
+            await anext(chunks)
+            held = limiter.in_flight
+            await chunks.aclose()
+            return held, limiter.in_flight
+
+        assert asyncio.run(run()) == (1, 0)
+
+
+class TestIranvictimsInterrupted:
+    def test_partial_row_neither_yielded_nor_processed(self, tmp_path, monkeypatch):
+        body = (
+            "Card ID,English Name,Status\n"
+            "1,Ali Example,killed\n"
+            "2,Mohammad Example,killed\n"
+        ).encode()
+        # Breaks off after "...\n2,Moham"
+        session = FakeSession(StreamResponse(200, body, fail_after=1))
+        monkeypatch.setattr(iranvictims, "fetch_stream", partial(
+            fetch_stream, chunk_size=body.index(b"2,Moham") + 7,
+        ))
+        ratelimit.configure_host(
+            "iranvictims.com", ratelimit.HostLimit(rate=1000, burst=10)
+        )
+
+        async def run():
+            plugin = IranvictimsPlugin()
+            progress = ProgressTracker("iranvictims", str(tmp_path))
+            await plugin.setup(
+                config={"requests_per_second": 1000, "burst": 10},
+                http_session=session, progress=progress,
+            )
+            names = []
+            async for ext in plugin.fetch_all():
+                names.append(ext.name_latin)
+            return names, progress
+
+        names, progress = asyncio.run(run())
+        assert names == ["Ali Example"]
+        assert progress.is_processed("iranvictims_1")
+        assert not progress.is_processed("iranvictims_2")
+        assert session.requests[0][0] == CSV_URL
+
+
+class TestIranvictimsStoppedEarly:
+    def test_closing_fetch_all_frees_host_slot(self, tmp_path):
+        # The --limit break: the download must not keep its slot until GC
+        body = "".join(
+            f"{n},Person {n},killed\n" for n in range(1, 300)
+        ).encode()
+        session = FakeSession(
+            StreamResponse(200, b"Card ID,English Name,Status\n" + body)
+        )
+        ratelimit.configure_host(
+            "iranvictims.com", ratelimit.HostLimit(rate=1000, burst=10)
+        )
+        limiter = ratelimit.get_limiter("iranvictims.com")
+
+        async def run():
+            plugin = IranvictimsPlugin()
+            await plugin.setup(
+                config={"requests_per_second": 1000, "burst": 10},
+                http_session=session,
+                progress=ProgressTracker("iranvictims", str(tmp_path)),
+            )
+            records = plugin.fetch_all()
+            await anext(records)
+            held = limiter.in_flight
+            await records.aclose()
+            return held, limiter.in_flight
+
+        assert asyncio.run(run()) == (1, 0)
@@ -11,6 +11,7 @@ from tools.enricher.sources.telegram_rtn import (
     parse_post_text,
     extract_posts,
     extract_prev_link,
+    extract_next_link,
     farsi_city_to_latin,
 )
 
@@ -246,6 +247,14 @@ class TestExtractPosts:
         assert "<a " not in text
         assert "داریوش انصاری" in text
 
+    def test_entities_decoded(self):
+        html = (
+            '<div data-post="RememberTheirNames/7">'
+            '<div class="tgme_widget_message_text" dir="auto">'
+            'Ali &amp; Reza<br>&quot;Tehran&quot;</div>'
+        )
+        assert extract_posts(html)[0]["text"] == 'Ali & Reza\n"Tehran"'
+
     def test_empty_html(self):
         assert extract_posts("") == []
 
@@ -267,6 +276,19 @@ class TestExtractPrevLink:
         assert extract_prev_link(html) is None
 
 
+class TestExtractNextLink:
+    def test_finds_next(self):
+        html = (
+            '<link rel="prev" href="/s/RememberTheirNames?before=2856">'
+            '<link rel="next" href="/s/RememberTheirNames?after=2875">'
+        )
+        assert extract_next_link(html) == "/s/RememberTheirNames?after=2875"
+
+    def test_newest_page_no_next(self):
+        html = '<link rel="prev" href="/s/RememberTheirNames?before=2856">'
+        assert extract_next_link(html) is None
+
+
 # --- farsi_city_to_latin ---
 
 
@@ -0,0 +1,761 @@
+"""HTTP response cache stores — one JSON file per URL, or packed SQLite.
+
+Entries are dicts: ``url``, ``body``, ``fetched_at`` and, if the origin
+sent them, ``etag`` / ``last_modified``.
+
+    files   <cache_dir>/<sha256(url)[:16]>.json — the original layout
+    sqlite  <cache_dir>/cache.sqlite — URL-indexed, compressed bodies
+
+Streamed downloads (http.fetch_stream) are kept as raw files next to
+either store, whatever the backend, so they can be read back in chunks:
+
+    <cache_dir>/downloads/<sha256(url)[:16]> + .meta.json
+
+SQLite bodies are compressed with zstd when the ``zstandard`` package is
+installed, zlib otherwise; the codec is stored per row, so a cache stays
+readable either way. A files cache is moved into SQLite the first time
+the sqlite backend opens its directory (or with ``enricher cache migrate``).
+
+Both stores track when an entry was last read (at most one write per
+entry per ACCESS_RESOLUTION). ``prune`` expires entries fetched too long
+ago or unread for too long, and evicts least-recently-used ones down to a
+byte cap.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+
+from .files import atomic_write
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+log = logging.getLogger("enricher.cache")
+
+BACKENDS = ("sqlite", "files")
+DEFAULT_BACKEND = "sqlite"
+SQLITE_FILENAME = "cache.sqlite"
+# Access times are only rewritten when older than this (seconds)
+ACCESS_RESOLUTION = 3600.0
+
+
+@dataclass
+class CacheStats:
+    """Size of one cache store."""
+
+    backend: str
+    entries: int = 0
+    body_bytes: int = 0  # uncompressed response bodies
+    stored_bytes: int = 0  # bytes on disk
+
+    @property
+    def ratio(self) -> float:
+        return self.body_bytes / self.stored_bytes if self.stored_bytes else 0.0
+
+
+class CacheStore(ABC):
+    """Storage for cached HTTP responses, keyed by URL."""
+
+    backend: str
+
+    @abstractmethod
+    def get(self, url: str) -> Optional[dict]:
+        """Entry for ``url``, or None."""
+
+    @abstractmethod
+    def put(
+        self,
+        url: str,
+        body: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        fetched_at: Optional[float] = None,
+    ) -> None:
+        """Store (or replace) the entry for ``url``."""
+
+    def put_many(self, entries: Iterable[dict]) -> int:
+        """Store many entries; returns how many were written."""
+        n = 0
+        for e in entries:
+            self.put(
+                e["url"], e["body"], e.get("etag"), e.get("last_modified"),
+                e.get("fetched_at"),
+            )
+            n += 1
+        return n
+
+    def touch(
+        self,
+        url: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        fetched_at: Optional[float] = None,
+    ) -> bool:
+        """Refresh the fetch time and validators of an entry, keeping its
+        body; validators left None keep their stored value. False if
+        ``url`` is not cached."""
+        entry = self.get(url)
+        if entry is None:
+            return False
+        self.put(
+            url, entry["body"], etag or entry.get("etag"),
+            last_modified or entry.get("last_modified"), fetched_at,
+        )
+        return True
+
+    @abstractmethod
+    def entries(self) -> Iterator[dict]:
+        """Iterate over all entries."""
+
+    @abstractmethod
+    def stats(self) -> CacheStats:
+        ...
+
+    @abstractmethod
+    def usage(self) -> Iterator[tuple[str, int, float, float]]:
+        """(key, bytes on disk, last access, fetch time) per entry, for
+        expiry and eviction."""
+
+    @abstractmethod
+    def delete(self, keys: Iterable[str]) -> int:
+        """Remove entries by ``usage()`` key; returns how many."""
+
+    @abstractmethod
+    def verify(self) -> list[tuple[str, str]]:
+        """(key, problem) for every entry that cannot be read back."""
+
+    def compact(self) -> None:
+        """Give space freed by deletes back to the filesystem."""
+
+    def close(self) -> None:
+        pass
+
+
+def _entry(
+    url: str,
+    body: str,
+    etag: Optional[str],
+    last_modified: Optional[str],
+    fetched_at: Optional[float],
+) -> dict:
+    entry = {
+        "url": url,
+        "body": body,
+        "fetched_at": time.time() if fetched_at is None else fetched_at,
+    }
+    if etag:
+        entry["etag"] = etag
+    if last_modified:
+        entry["last_modified"] = last_modified
+    return entry
+
+
+# ─── Files ───────────────────────────────────────────────────────────────────
+
+
+class FileCache(CacheStore):
+    """One JSON file per URL (the original cache layout)."""
+
+    backend = "files"
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, url: str) -> Optional[dict]:
+        path = self.path(url)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        entry = self._load(path)
+        now = time.time()
+        if st.st_atime < now - ACCESS_RESOLUTION:
+            # Explicit atime: works on noatime/relatime mounts too
+            os.utime(path, (now, st.st_mtime))
+        return entry
+
+    def put(self, url, body, etag=None, last_modified=None, fetched_at=None):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = _entry(url, body, etag, last_modified, fetched_at)
+        path = self.path(url)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        # mtime is the fetch time, so usage() need not parse the file
+        os.utime(path, (time.time(), entry["fetched_at"]))
+
+    def entries(self) -> Iterator[dict]:
+        for path in self._files():
+            try:
+                entry = self._load(path)
+            except (OSError, ValueError) as e:
+                log.warning(f"Skipping unreadable cache file {path}: {e}")
+                continue
+            if "url" in entry:
+                yield entry
+
+    def stats(self) -> CacheStats:
+        st = CacheStats(self.backend)
+        for path in self._files():
+            size = os.path.getsize(path)
+            st.entries += 1
+            st.stored_bytes += size
+            st.body_bytes += size  # bodies are stored as (escaped) JSON text
+        return st
+
+    def usage(self) -> Iterator[tuple[str, int, float, float]]:
+        for path in self._files():
+            st = os.stat(path)
+            yield path, st.st_size, st.st_atime, st.st_mtime
+
+    def delete(self, keys: Iterable[str]) -> int:
+        n = 0
+        for path in keys:
+            try:
+                os.remove(path)
+                n += 1
+            except FileNotFoundError:
+                pass
+        return n
+
+    def verify(self) -> list[tuple[str, str]]:
+        problems = []
+        for path in self._files():
+            try:
+                entry = self._load(path)
+            except (OSError, ValueError) as e:
+                problems.append((path, f"unreadable: {e}"))
+                continue
+            if not isinstance(entry.get("body"), str) or "url" not in entry:
+                problems.append((path, "missing url or body"))
+            elif self.path(entry["url"]) != path:
+                problems.append((path, "file name does not match url"))
+        return problems
+
+    def _files(self) -> Iterator[str]:
+        if not os.path.isdir(self.cache_dir):
+            return
+        with os.scandir(self.cache_dir) as it:
+            for e in it:
+                if e.name.endswith(".json") and e.is_file():
+                    yield e.path
+
+    @staticmethod
+    def _load(path: str) -> dict:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        if "fetched_at" not in entry:
+            # Entries written before revalidation existed
+            entry["fetched_at"] = os.path.getmtime(path)
+        return entry
+
+
+# ─── SQLite ──────────────────────────────────────────────────────────────────
+
+
+class SQLiteCache(CacheStore):
+    """All entries of a source in one SQLite file, bodies compressed."""
+
+    backend = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            url           TEXT PRIMARY KEY,
+            body          BLOB NOT NULL,
+            codec         TEXT NOT NULL,
+            size          INTEGER NOT NULL,
+            etag          TEXT,
+            last_modified TEXT,
+            fetched_at    REAL NOT NULL,
+            accessed_at   REAL
+        ) WITHOUT ROWID
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, SQLITE_FILENAME)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(self.SCHEMA)
+        columns = {r[1] for r in self.db.execute("PRAGMA table_info(entries)")}
+        if "accessed_at" not in columns:
+            self.db.execute("ALTER TABLE entries ADD COLUMN accessed_at REAL")
+        self.db.commit()
+        self._zc = zstandard.ZstdCompressor(level=6) if zstandard else None
+        self._zd = zstandard.ZstdDecompressor() if zstandard else None
+
+    def get(self, url: str) -> Optional[dict]:
+        row = self.db.execute(
+            "SELECT body, codec, etag, last_modified, fetched_at, accessed_at "
+            "FROM entries WHERE url = ?",
+            (url,),
+        ).fetchone()
+        if row is None:
+            return None
+        blob, codec, etag, last_modified, fetched_at, accessed_at = row
+        now = time.time()
+        if (accessed_at or 0) < now - ACCESS_RESOLUTION:
+            self.db.execute(
+                "UPDATE entries SET accessed_at = ? WHERE url = ?", (now, url)
+            )
+            self.db.commit()
+        return _entry(url, self._decode(blob, codec), etag, last_modified, fetched_at)
+
+    def put(self, url, body, etag=None, last_modified=None, fetched_at=None):
+        self._insert(url, body, etag, last_modified, fetched_at)
+        self.db.commit()
+
+    def touch(self, url, etag=None, last_modified=None, fetched_at=None):
+        # Metadata only: the compressed body is not read or rewritten
+        now = time.time()
+        cur = self.db.execute(
+            "UPDATE entries SET etag = COALESCE(?, etag), "
+            "last_modified = COALESCE(?, last_modified), "
+            "fetched_at = ?, accessed_at = ? WHERE url = ?",
+            (
+                etag or None, last_modified or None,
+                now if fetched_at is None else fetched_at, now, url,
+            ),
+        )
+        self.db.commit()
+        return cur.rowcount > 0
+
+    def put_many(self, entries: Iterable[dict]) -> int:
+        n = 0
+        with self.db:
+            for e in entries:
+                self._insert(
+                    e["url"], e["body"], e.get("etag"),
+                    e.get("last_modified"), e.get("fetched_at"),
+                )
+                n += 1
+        return n
+
+    def entries(self) -> Iterator[dict]:
+        rows = self.db.execute(
+            "SELECT url, body, codec, etag, last_modified, fetched_at FROM entries"
+        )
+        for url, blob, codec, etag, last_modified, fetched_at in rows:
+            yield _entry(
+                url, self._decode(blob, codec), etag, last_modified, fetched_at
+            )
+
+    def stats(self) -> CacheStats:
+        entries, body = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        on_disk = sum(
+            os.path.getsize(self.path + suffix)
+            for suffix in ("", "-wal")
+            if os.path.exists(self.path + suffix)
+        )
+        return CacheStats(self.backend, entries, body, on_disk)
+
+    def usage(self) -> Iterator[tuple[str, int, float, float]]:
+        yield from self.db.execute(
+            "SELECT url, LENGTH(body) + LENGTH(url), "
+            "COALESCE(accessed_at, fetched_at), fetched_at FROM entries"
+        )
+
+    def delete(self, keys: Iterable[str]) -> int:
+        with self.db:
+            cur = self.db.executemany(
+                "DELETE FROM entries WHERE url = ?", ((k,) for k in keys)
+            )
+        return cur.rowcount
+
+    def verify(self) -> list[tuple[str, str]]:
+        problems = [
+            (self.path, f"integrity: {msg}")
+            for (msg,) in self.db.execute("PRAGMA quick_check")
+            if msg != "ok"
+        ]
+        rows = self.db.execute("SELECT url, body, codec, size FROM entries")
+        for url, blob, codec, size in rows:
+            try:
+                body = self._decode(blob, codec)
+            except Exception as e:
+                problems.append((url, f"cannot decode ({codec}): {e}"))
+                continue
+            if len(body.encode("utf-8")) != size:
+                problems.append((url, "size mismatch"))
+        return problems
+
+    def compact(self) -> None:
+        self.db.execute("VACUUM")
+
+    def close(self) -> None:
+        self.db.close()
+
+    def _insert(self, url, body, etag, last_modified, fetched_at) -> None:
+        raw = body.encode("utf-8")
+        codec, blob = self._encode(raw)
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO entries (url, body, codec, size, etag, "
+            "last_modified, fetched_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                url, blob, codec, len(raw), etag, last_modified,
+                now if fetched_at is None else fetched_at, now,
+            ),
+        )
+
+    def _encode(self, raw: bytes) -> tuple[str, bytes]:
+        if self._zc is not None:
+            return "zstd", self._zc.compress(raw)
+        return "zlib", zlib.compress(raw, 6)
+
+    def _decode(self, blob: bytes, codec: str) -> str:
+        if codec == "zstd":
+            if self._zd is None:
+                raise RuntimeError(
+                    "Cache entry is zstd-compressed; install 'zstandard'"
+                )
+            raw = self._zd.decompress(blob)
+        elif codec == "zlib":
+            raw = zlib.decompress(blob)
+        else:
+            raw = blob
+        return raw.decode("utf-8")
+
+
+# ─── Streamed downloads ──────────────────────────────────────────────────────
+
+
+class DownloadCache(CacheStore):
+    """Raw bodies of streamed downloads, one file plus metadata per URL.
+
+    fetch_stream writes and reads the files directly (``paths``,
+    ``read_meta``, ``write_meta``); the CacheStore methods are there so
+    that stats, prune and verify cover downloads like other entries.
+    """
+
+    backend = "downloads"
+    META_SUFFIX = ".meta.json"
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.dir = os.path.join(cache_dir, "downloads")
+
+    def paths(self, url: str) -> tuple[str, str]:
+        """(body, metadata) file of ``url``."""
+        key = hashlib.sha256(url.encode()).hexdigest()[:16]
+        body_path = os.path.join(self.dir, key)
+        return body_path, body_path + self.META_SUFFIX
+
+    def read_meta(self, url: str) -> Optional[dict]:
+        """Metadata of a complete download of ``url``, or None; counts as
+        a read for eviction."""
+        body_path, meta_path = self.paths(url)
+        try:
+            st = os.stat(body_path)
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        now = time.time()
+        if st.st_atime < now - ACCESS_RESOLUTION:
+            os.utime(body_path, (now, st.st_mtime))
+        return meta
+
+    def write_meta(
+        self,
+        url: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        charset: Optional[str] = None,
+        fetched_at: Optional[float] = None,
+    ) -> None:
+        meta = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "charset": charset,
+            "fetched_at": time.time() if fetched_at is None else fetched_at,
+        }
+        meta_path = self.paths(url)[1]
+        atomic_write(meta_path, json.dumps(meta))
+        # mtime is the fetch time, so usage() need not parse the file
+        os.utime(meta_path, (time.time(), meta["fetched_at"]))
+
+    def get(self, url: str) -> Optional[dict]:
+        meta = self.read_meta(url)
+        if meta is None:
+            return None
+        return self._entry(self.paths(url)[0], meta)
+
+    def put(self, url, body, etag=None, last_modified=None, fetched_at=None):
+        atomic_write(self.paths(url)[0], body.encode("utf-8"))
+        self.write_meta(url, etag, last_modified, "utf-8", fetched_at)
+
+    def entries(self) -> Iterator[dict]:
+        for body_path in self._bodies():
+            try:
+                with open(body_path + self.META_SUFFIX, encoding="utf-8") as f:
+                    meta = json.load(f)
+                yield self._entry(body_path, meta)
+            except (OSError, ValueError) as e:
+                log.warning(f"Skipping unreadable download {body_path}: {e}")
+
+    def stats(self) -> CacheStats:
+        st = CacheStats(self.backend)
+        for body_path, size, _, _ in self.usage():
+            st.entries += 1
+            st.body_bytes += os.path.getsize(body_path)
+            st.stored_bytes += size
+        return st
+
+    def usage(self) -> Iterator[tuple[str, int, float, float]]:
+        for body_path in self._bodies():
+            st = os.stat(body_path)
+            size, fetched = st.st_size, st.st_mtime
+            try:
+                meta = os.stat(body_path + self.META_SUFFIX)
+                size, fetched = size + meta.st_size, meta.st_mtime
+            except FileNotFoundError:
+                pass
+            yield body_path, size, st.st_atime, fetched
+
+    def delete(self, keys: Iterable[str]) -> int:
+        n = 0
+        for body_path in keys:
+            removed = False
+            for path in (body_path, body_path + self.META_SUFFIX):
+                try:
+                    os.remove(path)
+                    removed = True
+                except FileNotFoundError:
+                    pass
+            n += removed
+        return n
+
+    def verify(self) -> list[tuple[str, str]]:
+        problems = []
+        bodies = set(self._bodies())
+        for body_path in sorted(bodies):
+            try:
+                with open(body_path + self.META_SUFFIX, encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError) as e:
+                problems.append((body_path, f"metadata unreadable: {e}"))
+                continue
+            if "url" not in meta or "fetched_at" not in meta:
+                problems.append((body_path, "metadata missing url or fetched_at"))
+            elif self.paths(meta["url"])[0] != body_path:
+                problems.append((body_path, "file name does not match url"))
+        for name in self._names():
+            if name.endswith(self.META_SUFFIX):
+                body_path = os.path.join(self.dir, name[: -len(self.META_SUFFIX)])
+                if body_path not in bodies:
+                    problems.append((body_path, "metadata without body"))
+        return problems
+
+    def _entry(self, body_path: str, meta: dict) -> dict:
+        with open(body_path, "rb") as f:
+            body = f.read().decode(meta.get("charset") or "utf-8", "replace")
+        return _entry(
+            meta["url"], body, meta.get("etag"), meta.get("last_modified"),
+            meta.get("fetched_at"),
+        )
+
+    def _bodies(self) -> Iterator[str]:
+        for name in self._names():
+            # .part: a download in progress; .tmp: atomic_write in progress
+            if not name.endswith((self.META_SUFFIX, ".part", ".tmp")):
+                yield os.path.join(self.dir, name)
+
+    def _names(self) -> list[str]:
+        if not os.path.isdir(self.dir):
+            return []
+        return sorted(
+            e.name for e in os.scandir(self.dir) if e.is_file()
+        )
+
+
+# ─── Registry ────────────────────────────────────────────────────────────────
+
+_backend = DEFAULT_BACKEND
+_stores: dict[str, CacheStore] = {}
+
+
+def set_backend(name: str) -> None:
+    """Select the store type for caches opened from now on."""
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown cache backend: {name}")
+    _backend = name
+
+
+def open_store(cache_dir: str, backend: Optional[str] = None) -> CacheStore:
+    """Open a store of the given (or configured) type for ``cache_dir``."""
+    backend = backend or _backend
+    if backend == "sqlite":
+        if any(FileCache(cache_dir)._files()):
+            # Left over from the files backend: move it over once instead
+            # of refetching every page
+            n = migrate(cache_dir, delete=True)
+            log.info(f"Migrated {n} files cache entries in {cache_dir} to SQLite")
+        return SQLiteCache(cache_dir)
+    return FileCache(cache_dir)
+
+
+def get_store(cache_dir: str) -> CacheStore:
+    """Shared store for ``cache_dir`` (opened on first use)."""
+    store = _stores.get(cache_dir)
+    if store is None:
+        store = _stores[cache_dir] = open_store(cache_dir)
+    return store
+
+
+def close_stores() -> None:
+    """Close all shared stores (end of run, tests)."""
+    for store in _stores.values():
+        store.close()
+    _stores.clear()
+
+
+def migrate(cache_dir: str, delete: bool = False) -> int:
+    """Copy a files cache in ``cache_dir`` into its SQLite store.
+
+    Returns the number of entries copied. With ``delete`` the JSON files
+    are removed once the copy is committed.
+    """
+    files = FileCache(cache_dir)
+    paths = list(files._files())
+    if not paths:
+        return 0
+    store = SQLiteCache(cache_dir)
+    try:
+        n = store.put_many(files.entries())
+    finally:
+        store.close()
+    if delete:
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # removed by a concurrent migration
+    return n
+
+
+# ─── Maintenance ─────────────────────────────────────────────────────────────
+
+
+def cache_dirs(cache_root: str) -> list[tuple[str, str]]:
+    """(source, cache_dir) for every source cache under ``cache_root``."""
+    if not os.path.isdir(cache_root):
+        return []
+    return [
+        (name, os.path.join(cache_root, name))
+        for name in sorted(os.listdir(cache_root))
+        if os.path.isdir(os.path.join(cache_root, name))
+    ]
+
+
+def existing_stores(cache_dir: str) -> list[CacheStore]:
+    """Open every store that has data in ``cache_dir`` (caller closes)."""
+    stores: list[CacheStore] = []
+    files = FileCache(cache_dir)
+    if any(files._files()):
+        stores.append(files)
+    if os.path.exists(os.path.join(cache_dir, SQLITE_FILENAME)):
+        stores.append(SQLiteCache(cache_dir))
+    downloads = DownloadCache(cache_dir)
+    if downloads._names():
+        stores.append(downloads)
+    return stores
+
+
+@dataclass
+class PruneResult:
+    """Outcome of ``prune`` for one source."""
+
+    expired: int = 0
+    evicted: int = 0
+    freed_bytes: int = 0
+    kept: int = 0
+    kept_bytes: int = 0
+
+
+def prune(
+    cache_root: str,
+    max_bytes: int = 0,
+    max_age: float = 0,
+    max_idle: float = 0,
+    now: Optional[float] = None,
+) -> dict[str, PruneResult]:
+    """Expire and evict cache entries across all sources under ``cache_root``.
+
+    Entries fetched more than ``max_age`` seconds ago, or not read for
+    ``max_idle`` seconds, are removed first; then, if the total still
+    exceeds ``max_bytes``, the least recently used entries of any source
+    go until it fits. 0 disables a limit.
+    """
+    now = time.time() if now is None else now
+    results: dict[str, PruneResult] = {}
+    stores: list[tuple[str, CacheStore]] = []
+    # (accessed_at, bytes, key, store index)
+    items: list[tuple[float, int, str, int]] = []
+    doomed: dict[int, list[str]] = {}
+
+    try:
+        for source, cache_dir in cache_dirs(cache_root):
+            results[source] = PruneResult()
+            for store in existing_stores(cache_dir):
+                i = len(stores)
+                stores.append((source, store))
+                for key, size, accessed, fetched in store.usage():
+                    if (max_age and fetched < now - max_age) or (
+                        max_idle and accessed < now - max_idle
+                    ):
+                        doomed.setdefault(i, []).append(key)
+                        results[source].expired += 1
+                        results[source].freed_bytes += size
+                    else:
+                        items.append((accessed, size, key, i))
+
+        total = sum(size for _, size, _, _ in items)
+        if max_bytes and total > max_bytes:
+            items.sort()
+            cut = 0
+            while cut < len(items) and total > max_bytes:
+                _, size, key, i = items[cut]
+                doomed.setdefault(i, []).append(key)
+                res = results[stores[i][0]]
+                res.evicted += 1
+                res.freed_bytes += size
+                total -= size
+                cut += 1
+            items = items[cut:]
+
+        for _, size, _, i in items:
+            res = results[stores[i][0]]
+            res.kept += 1
+            res.kept_bytes += size
+
+        for i, keys in doomed.items():
+            store = stores[i][1]
+            store.delete(keys)
+            store.compact()
+    finally:
+        for _, store in stores:
+            store.close()
+    return results
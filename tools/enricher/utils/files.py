@@ -0,0 +1,30 @@
+"""File helpers shared by the progress tracker, metrics writers and caches."""
+
+from __future__ import annotations
+
+import os
+from typing import Union
+
+
+def atomic_write(path: str, data: Union[str, bytes]) -> None:
+    """Write via a temp file + rename so readers never see partial files.
+
+    If the write fails, ``path`` keeps its old content and the temp file
+    is removed.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    try:
+        if isinstance(data, bytes):
+            with open(tmp, "wb") as f:
+                f.write(data)
+        else:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
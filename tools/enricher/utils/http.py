@@ -1,16 +1,27 @@
-"""Async HTTP client with retry, rate limiting, and caching."""
+"""Async HTTP client with retry, rate limiting, and caching (see utils.cache)."""
 
 from __future__ import annotations
 
 import asyncio
-import hashlib
+import codecs
 import json
+import logging
 import os
-import random
+import re
 import ssl
-from typing import Optional
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncIterator, Mapping, Optional
 
 import aiohttp
+from multidict import CIMultiDict
+
+from .cache import DownloadCache, get_store
+from .metrics import host_stats, incr, stage
+from .ratelimit import HostLimiter, host_of, limiter_for, parse_retry_after
+
+log = logging.getLogger("enricher.http")
 
 USER_AGENT = (
     "iran-memorial/2.0 "
@@ -20,10 +31,14 @@ USER_AGENT = (
 
 def create_session(
     max_connections: int = 10,
-    per_host: int = 4,
+    per_host: int = 0,
     timeout_sec: int = 30,
 ) -> aiohttp.ClientSession:
-    """Create an aiohttp session with sensible defaults."""
+    """Create an aiohttp session with sensible defaults.
+
+    Per-host concurrency is left to the adaptive host limiters
+    (utils.ratelimit); ``per_host`` = 0 means no connector cap.
+    """
     ssl_ctx = ssl.create_default_context()
     ssl_ctx.check_hostname = False
     ssl_ctx.verify_mode = ssl.CERT_NONE
@@ -46,59 +61,547 @@ def create_session(
     )
 
 
+DAY = 86400
+
+# Seconds; retries sleep multiples of this (see _fetch)
+BACKOFF_BASE = 5.0
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """When cached responses must be revalidated with the origin.
+
+    ``ttl`` is the age in seconds after which an entry is revalidated
+    (None = cached bodies never expire). ``rules`` override it for URLs
+    matching a regex, first match wins.
+    """
+
+    ttl: Optional[float] = None
+    rules: tuple[tuple[str, Optional[float]], ...] = ()
+
+    def ttl_for(self, url: str) -> Optional[float]:
+        for pattern, ttl in self.rules:
+            if re.search(pattern, url):
+                return ttl
+        return self.ttl
+
+
+# cache_dir → policy, set by each plugin's setup()
+_cache_policies: dict[str, CachePolicy] = {}
+
+
+def set_cache_policy(cache_dir: str, policy: CachePolicy) -> None:
+    _cache_policies[cache_dir] = policy
+
+
+# Offline replay: serve every cached entry regardless of age and never
+# touch the network — misses return None at once (no retries, no limiter),
+# or raise OfflineMiss in strict mode
+_offline = False
+_offline_strict = False
+_offline_misses = 0
+
+
+class OfflineMiss(Exception):
+    """A URL requested in strict offline mode is not in the cache."""
+
+
+def set_offline(enabled: bool, strict: bool = False) -> None:
+    global _offline, _offline_strict, _offline_misses
+    _offline = enabled
+    _offline_strict = enabled and strict
+    _offline_misses = 0
+
+
+def offline_misses() -> int:
+    """URLs requested but not cached since set_offline(True)."""
+    return _offline_misses
+
+
+# ─── In-memory layer ─────────────────────────────────────────────────────────
+
+# Short-lived LRU of recently returned bodies, in front of the disk cache
+MEMORY_ENTRIES = 256
+MEMORY_TTL = 300.0
+_memory: OrderedDict[tuple[str, str], tuple[str, float]] = OrderedDict()
+
+# Requests currently on their way, so identical concurrent calls share one
+_inflight: dict[tuple, asyncio.Future] = {}
+
+
+def _memory_get(cache_dir: str, url: str) -> Optional[str]:
+    key = (cache_dir, url)
+    item = _memory.get(key)
+    if item is None:
+        return None
+    body, expires = item
+    if time.time() >= expires:
+        del _memory[key]
+        return None
+    _memory.move_to_end(key)
+    return body
+
+
+def _memory_put(cache_dir: str, url: str, body: str, expires: float) -> None:
+    key = (cache_dir, url)
+    _memory[key] = (body, expires)
+    _memory.move_to_end(key)
+    while len(_memory) > MEMORY_ENTRIES:
+        _memory.popitem(last=False)
+
+
+def clear_memory_cache() -> None:
+    _memory.clear()
+
+
 async def fetch_with_retry(
     session: aiohttp.ClientSession,
     url: str,
     retries: int = 3,
-    backoff_base: float = 5.0,
-    rate_limit: tuple[float, float] = (0.8, 1.2),
+    backoff_base: Optional[float] = None,
     cache_dir: Optional[str] = None,
     extra_headers: Optional[dict[str, str]] = None,
+    limiter: Optional[HostLimiter] = None,
+) -> Optional[str]:
+    """Fetch a URL with retry, rate limiting, and optional disk cache.
+
+    Bodies served from or written to the disk cache are kept in a small
+    in-memory LRU for a few minutes. Concurrent calls for the same URL
+    (and cache/headers) share one request: followers await the leader.
+    See _fetch for the network and disk-cache behaviour.
+    """
+    if backoff_base is None:
+        backoff_base = BACKOFF_BASE
+    if cache_dir:
+        body = _memory_get(cache_dir, url)
+        if body is not None:
+            _cache_event(url, "memory_hit")
+            return body
+
+    key = (url, cache_dir, tuple(sorted((extra_headers or {}).items())))
+    leader = _inflight.get(key)
+    if leader is not None:
+        incr("http.coalesced")
+        try:
+            return await asyncio.shield(leader)
+        except asyncio.CancelledError:
+            if leader.cancelled() and not asyncio.current_task().cancelling():
+                # The leader was cancelled, not us — fetch it ourselves
+                return await fetch_with_retry(
+                    session, url, retries, backoff_base, cache_dir,
+                    extra_headers, limiter,
+                )
+            raise
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        body = await _fetch(
+            session, url, retries, backoff_base, cache_dir, extra_headers,
+            limiter,
+        )
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except BaseException as e:
+        future.set_exception(e)
+        future.exception()  # mark retrieved when nobody was waiting
+        raise
+    else:
+        future.set_result(body)
+        return body
+    finally:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+async def _fetch(
+    session: aiohttp.ClientSession,
+    url: str,
+    retries: int,
+    backoff_base: float,
+    cache_dir: Optional[str],
+    extra_headers: Optional[dict[str, str]],
+    limiter: Optional[HostLimiter],
 ) -> Optional[str]:
-    """Fetch a URL with retry, rate limiting, and optional disk cache."""
+    """Fetch a URL with retry, rate limiting, and optional disk cache.
+
+    Network requests go through the host's limiter (see utils.ratelimit),
+    which adapts the host's concurrency to the responses reported here;
+    fresh cache hits return without waiting for it. Entries older than
+    the cache policy's TTL are revalidated with a conditional GET: a 304
+    refreshes the entry and returns the cached body, and if the origin
+    cannot be reached the stale body is returned. Offline (set_offline),
+    any cached body is returned as is and misses return None.
+    """
     # Check cache first
+    entry = None
+    headers = dict(extra_headers or {})
     if cache_dir:
-        cached = _read_cache(cache_dir, url)
-        if cached is not None:
-            return cached
+        with stage("cache_read"):
+            entry = _read_cache_entry(cache_dir, url)
+        if entry is not None:
+            policy = _cache_policies.get(cache_dir, CachePolicy())
+            ttl = policy.ttl_for(url)
+            if (
+                _offline or ttl is None
+                or time.time() - entry["fetched_at"] < ttl
+            ):
+                _cache_event(url, "hit")
+                _remember(cache_dir, url, entry["body"], entry["fetched_at"])
+                return entry["body"]
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        else:
+            _cache_event(url, "offline_miss" if _offline else "miss")
+    if _offline:
+        _offline_miss(url)
+        return None
 
+    limiter = limiter or limiter_for(url)
     for attempt in range(retries):
+        if attempt:
+            _host_add(url, retries=1)
         try:
-            async with session.get(url, headers=extra_headers) as resp:
-                if resp.status == 200:
-                    text = await resp.text()
-                    await asyncio.sleep(random.uniform(*rate_limit))
-                    if cache_dir:
-                        _write_cache(cache_dir, url, text)
-                    return text
-                elif resp.status == 429:
-                    wait = backoff_base * (2**attempt)
-                    await asyncio.sleep(wait)
-                elif resp.status >= 500:
-                    await asyncio.sleep(backoff_base * (attempt + 1))
-                else:
-                    return None  # 404 etc — don't retry
+            async with limiter.acquire() as slot:
+                with stage("http_fetch"):
+                    async with session.get(url, headers=headers or None) as resp:
+                        status = resp.status
+                        if status == 200:
+                            # text() decodes the body read() buffered
+                            size = len(await resp.read())
+                            text = await resp.text()
+                        resp_headers = resp.headers
+                slot.done(status, resp_headers)
+            validators = _validators(resp_headers)
+            if status == 200:
+                _host_add(url, bytes=size)
+                if cache_dir:
+                    if entry is not None:
+                        _cache_event(url, "revalidated_changed")
+                    with stage("cache_write"):
+                        _write_cache(cache_dir, url, text, **validators)
+                    _remember(cache_dir, url, text, time.time())
+                return text
+            elif status == 304 and entry is not None:
+                _cache_event(url, "revalidated_unchanged")
+                with stage("cache_write"):
+                    get_store(cache_dir).touch(url, **validators)
+                _remember(cache_dir, url, entry["body"], time.time())
+                return entry["body"]
+            elif status == 429:
+                # With Retry-After the limiter pauses the whole host
+                if not parse_retry_after(resp_headers):
+                    await _backoff(url, backoff_base * (2**attempt))
+            elif status >= 500:
+                await _backoff(url, backoff_base * (attempt + 1))
+            else:
+                return None  # 404 etc — don't retry
         except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
             if attempt < retries - 1:
-                await asyncio.sleep(backoff_base * (attempt + 1))
+                await _backoff(url, backoff_base * (attempt + 1))
+
+    if entry is not None:
+        _cache_event(url, "stale_served")
+        return entry["body"]
+    return None
+
+
+async def fetch_head(
+    session: aiohttp.ClientSession,
+    url: str,
+    retries: int = 3,
+    backoff_base: Optional[float] = None,
+    extra_headers: Optional[dict[str, str]] = None,
+    cache_dir: Optional[str] = None,
+) -> Optional[Mapping[str, str]]:
+    """Response headers of a HEAD request, with retry and rate limiting.
 
+    For metadata that only the headers carry (e.g. the row count in a
+    PostgREST ``Content-Range``). Always asks the origin; with
+    ``cache_dir`` the headers are recorded (as ``HEAD <url>``) for
+    offline replay only. None on a non-2xx answer, once the retries are
+    used up, or offline without a recorded answer.
+    """
+    if backoff_base is None:
+        backoff_base = BACKOFF_BASE
+    key = f"HEAD {url}"
+    if _offline:
+        entry = _read_cache_entry(cache_dir, key) if cache_dir else None
+        if entry is not None:
+            _cache_event(url, "hit")
+            return CIMultiDict(json.loads(entry["body"]))
+        _cache_event(url, "offline_miss")
+        _offline_miss(key)
+        return None
+
+    limiter = limiter_for(url)
+    for attempt in range(retries):
+        if attempt:
+            _host_add(url, retries=1)
+        try:
+            async with limiter.acquire() as slot:
+                with stage("http_fetch"):
+                    async with session.head(url, headers=extra_headers) as resp:
+                        status = resp.status
+                        resp_headers = resp.headers
+                slot.done(status, resp_headers)
+            if 200 <= status < 300:
+                if cache_dir:
+                    with stage("cache_write"):
+                        _write_cache(
+                            cache_dir, key, json.dumps(list(resp_headers.items()))
+                        )
+                return resp_headers
+            elif status == 429:
+                if not parse_retry_after(resp_headers):
+                    await _backoff(url, backoff_base * (2**attempt))
+            elif status >= 500:
+                await _backoff(url, backoff_base * (attempt + 1))
+            else:
+                return None
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+            if attempt < retries - 1:
+                await _backoff(url, backoff_base * (attempt + 1))
     return None
 
 
-def _cache_key(url: str) -> str:
-    return hashlib.sha256(url.encode()).hexdigest()[:16]
+def _cache_event(url: str, event: str) -> None:
+    incr(f"cache.{event}")
+    hs = host_stats(host_of(url))
+    if hs is not None:
+        hs.cache_event(event)
+
+
+def _offline_miss(url: str) -> None:
+    global _offline_misses
+    _offline_misses += 1
+    if _offline_strict:
+        raise OfflineMiss(f"Offline: {url} not cached")
+    log.debug(f"Offline: {url} not cached")
+
+
+def _host_add(url: str, **deltas: float) -> None:
+    """Add to the run's HostStats fields (retries, bytes, ...) for url's host."""
+    hs = host_stats(host_of(url))
+    if hs is not None:
+        for name, value in deltas.items():
+            setattr(hs, name, getattr(hs, name) + value)
+
+
+async def _backoff(url: str, seconds: float) -> None:
+    with stage("backoff_sleep"):
+        await asyncio.sleep(seconds)
+    _host_add(url, backoff_seconds=seconds)
+
+
+def _remember(cache_dir: str, url: str, body: str, fetched_at: float) -> None:
+    """Keep a fresh body in memory, never past its disk-cache TTL."""
+    expires = time.time() + MEMORY_TTL
+    ttl = _cache_policies.get(cache_dir, CachePolicy()).ttl_for(url)
+    if ttl is not None:
+        expires = min(expires, fetched_at + ttl)
+    _memory_put(cache_dir, url, body, expires)
+
+
+def _validators(headers) -> dict[str, Optional[str]]:
+    return {
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+    }
+
+
+def _read_cache_entry(cache_dir: str, url: str) -> Optional[dict]:
+    """Cached entry for ``url``: body, validators and ``fetched_at``."""
+    return get_store(cache_dir).get(url)
 
 
 def _read_cache(cache_dir: str, url: str) -> Optional[str]:
-    path = os.path.join(cache_dir, _cache_key(url) + ".json")
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f).get("body")
-    return None
+    entry = _read_cache_entry(cache_dir, url)
+    return entry.get("body") if entry else None
+
+
+def _write_cache(
+    cache_dir: str,
+    url: str,
+    body: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+) -> None:
+    get_store(cache_dir).put(url, body, etag, last_modified)
+
+
+# ─── Streaming downloads ─────────────────────────────────────────────────────
+
+STREAM_CHUNK = 64 * 1024
+
+
+class StreamInterrupted(Exception):
+    """A streamed download broke off after its first chunk was yielded."""
+
+
+async def fetch_stream(
+    session: aiohttp.ClientSession,
+    url: str,
+    retries: int = 3,
+    backoff_base: Optional[float] = None,
+    cache_dir: Optional[str] = None,
+    extra_headers: Optional[dict[str, str]] = None,
+    chunk_size: int = STREAM_CHUNK,
+) -> AsyncIterator[str]:
+    """Stream a large download as decoded text chunks.
+
+    For bulk dumps that should not be held in memory as one string (feed
+    the chunks to utils.streaming). With a cache_dir the raw bytes are
+    written to ``<cache_dir>/downloads/`` as they arrive and the file is
+    only kept once complete; fresh copies are streamed from disk, stale
+    ones are revalidated like fetch_with_retry does. Failures before the
+    first chunk are retried; a connection lost mid-stream raises
+    StreamInterrupted, since the consumer has already seen the start and
+    must not take the last (partial) chunk for the end of the data.
+
+    The response holds a host limiter slot until the generator finishes:
+    a consumer that may stop early should close it, e.g. with
+    ``contextlib.aclosing``.
+    """
+    if backoff_base is None:
+        backoff_base = BACKOFF_BASE
+    meta = None
+    headers = dict(extra_headers or {})
+    if cache_dir:
+        downloads = DownloadCache(cache_dir)
+        body_path, _ = downloads.paths(url)
+        meta = downloads.read_meta(url)
+        if meta is not None:
+            ttl = _cache_policies.get(cache_dir, CachePolicy()).ttl_for(url)
+            if (
+                _offline or ttl is None
+                or time.time() - meta["fetched_at"] < ttl
+            ):
+                _cache_event(url, "hit")
+                async for text in _stream_file(body_path, meta, chunk_size):
+                    yield text
+                return
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        else:
+            _cache_event(url, "offline_miss" if _offline else "miss")
+    if _offline:
+        _offline_miss(url)
+        return
+
+    limiter = limiter_for(url)
+    for attempt in range(retries):
+        if attempt:
+            _host_add(url, retries=1)
+        started = False
+        try:
+            async with limiter.acquire() as slot:
+                async with session.get(url, headers=headers or None) as resp:
+                    status = resp.status
+                    resp_headers = resp.headers
+                    slot.done(status, resp_headers)
+                    if status == 200:
+                        if meta is not None:
+                            _cache_event(url, "revalidated_changed")
+                        started = True
+                        async for text in _stream_response(
+                            resp, url, cache_dir, chunk_size,
+                        ):
+                            yield text
+                        return
+            if status == 304 and meta is not None:
+                _cache_event(url, "revalidated_unchanged")
+                validators = _validators(resp_headers)
+                downloads.write_meta(
+                    url,
+                    etag=validators["etag"] or meta.get("etag"),
+                    last_modified=(
+                        validators["last_modified"] or meta.get("last_modified")
+                    ),
+                    charset=meta.get("charset"),
+                )
+                async for text in _stream_file(body_path, meta, chunk_size):
+                    yield text
+                return
+            elif status == 429:
+                if not parse_retry_after(resp_headers):
+                    await _backoff(url, backoff_base * (2**attempt))
+            elif status >= 500:
+                await _backoff(url, backoff_base * (attempt + 1))
+            else:
+                return  # 404 etc — don't retry
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            if started:
+                raise StreamInterrupted(f"Download of {url} interrupted: {e}") from e
+            if attempt < retries - 1:
+                await _backoff(url, backoff_base * (attempt + 1))
+
+    if meta is not None:
+        _cache_event(url, "stale_served")
+        async for text in _stream_file(body_path, meta, chunk_size):
+            yield text
+
+
+async def _stream_response(
+    resp, url: str, cache_dir: Optional[str], chunk_size: int,
+) -> AsyncIterator[str]:
+    """Decode a 200 response chunk by chunk, teeing the bytes to disk."""
+    decoder = codecs.getincrementaldecoder(resp.charset or "utf-8")("replace")
+    if not cache_dir:
+        async for chunk in resp.content.iter_chunked(chunk_size):
+            _host_add(url, bytes=len(chunk))
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+        return
+
+    downloads = DownloadCache(cache_dir)
+    body_path, _ = downloads.paths(url)
+    part_path = body_path + ".part"
+    os.makedirs(os.path.dirname(body_path), exist_ok=True)
+    complete = False
+    try:
+        with open(part_path, "wb") as f:
+            async for chunk in resp.content.iter_chunked(chunk_size):
+                _host_add(url, bytes=len(chunk))
+                f.write(chunk)
+                text = decoder.decode(chunk)
+                if text:
+                    yield text
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+        complete = True
+    finally:
+        if complete:
+            with stage("cache_write"):
+                os.replace(part_path, body_path)
+                validators = _validators(resp.headers)
+                downloads.write_meta(url, charset=resp.charset, **validators)
+        elif os.path.exists(part_path):
+            os.remove(part_path)
 
 
-def _write_cache(cache_dir: str, url: str, body: str) -> None:
-    os.makedirs(cache_dir, exist_ok=True)
-    path = os.path.join(cache_dir, _cache_key(url) + ".json")
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump({"url": url, "body": body}, f, ensure_ascii=False)
+async def _stream_file(
+    path: str, meta: dict, chunk_size: int
+) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder(
+        meta.get("charset") or "utf-8"
+    )("replace")
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+            await asyncio.sleep(0)  # let other sources run between chunks
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
@@ -0,0 +1,212 @@
+"""Compact set of source ids — integer bitmaps per prefix, strings otherwise.
+
+Most source ids are a prefix plus an integer (``boroumand_1234``,
+``telegram_rtn_5678``). IdSet stores those as a roaring-style bitmap per
+prefix and keeps only the rest (UUIDs, names) as strings:
+
+    ids = IdSet(["boroumand_7", "iranrevolution_ab12-..."])
+    "boroumand_7" in ids
+
+IntBitmap splits integers into 2^16-wide chunks; a chunk is a sorted
+uint16 array while sparse and an 8 KiB bitmap once it holds more than
+4096 values (the same trade-off as Roaring). ``dumps``/``loads`` give a
+run-length encoded, zlib-compressed snapshot for the progress files.
+"""
+
+from __future__ import annotations
+
+import json
+import zlib
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator, Optional, Union
+
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+ARRAY_MAX = 4096  # above this a chunk is cheaper as a bitmap
+
+
+Container = Union[array, bytearray]
+
+
+class IntBitmap:
+    """Set of integers (negative too) in roaring-style chunks."""
+
+    def __init__(self, values: Iterable[int] = ()):
+        self._chunks: dict[int, Container] = {}
+        self._len = 0
+        for v in values:
+            self.add(v)
+
+    def __contains__(self, value: int) -> bool:
+        chunk = self._chunks.get(value >> CHUNK_BITS)
+        if chunk is None:
+            return False
+        low = value & CHUNK_MASK
+        if isinstance(chunk, bytearray):
+            return bool(chunk[low >> 3] & (1 << (low & 7)))
+        i = bisect_left(chunk, low)
+        return i < len(chunk) and chunk[i] == low
+
+    def add(self, value: int) -> bool:
+        """Add ``value``; True if it was not present yet."""
+        high, low = value >> CHUNK_BITS, value & CHUNK_MASK
+        chunk = self._chunks.get(high)
+        if chunk is None:
+            self._chunks[high] = array("H", [low])
+        elif isinstance(chunk, bytearray):
+            byte, bit = low >> 3, 1 << (low & 7)
+            if chunk[byte] & bit:
+                return False
+            chunk[byte] |= bit
+        else:
+            i = bisect_left(chunk, low)
+            if i < len(chunk) and chunk[i] == low:
+                return False
+            chunk.insert(i, low)
+            if len(chunk) > ARRAY_MAX:
+                self._chunks[high] = _to_bitmap(chunk)
+        self._len += 1
+        return True
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[int]:
+        """Values in ascending order."""
+        for high in sorted(self._chunks):
+            base = high << CHUNK_BITS
+            chunk = self._chunks[high]
+            if isinstance(chunk, bytearray):
+                for byte_i, byte in enumerate(chunk):
+                    if byte:
+                        for bit in range(8):
+                            if byte & (1 << bit):
+                                yield base + (byte_i << 3) + bit
+            else:
+                for low in chunk:
+                    yield base + low
+
+    def runs(self) -> list[int]:
+        """Run-length encoding: flat [gap, length, gap, length, ...]."""
+        out: list[int] = []
+        prev_end = 0  # one past the end of the previous run
+        start = None
+        last = None
+        for v in self:
+            if start is not None and v == last + 1:
+                last = v
+                continue
+            if start is not None:
+                out += [start - prev_end, last - start + 1]
+                prev_end = last + 1
+            start = last = v
+        if start is not None:
+            out += [start - prev_end, last - start + 1]
+        return out
+
+    @classmethod
+    def from_runs(cls, runs: list[int]) -> "IntBitmap":
+        bitmap = cls()
+        pos = 0
+        for i in range(0, len(runs), 2):
+            start = pos + runs[i]
+            pos = start + runs[i + 1]
+            for v in range(start, pos):
+                bitmap.add(v)
+        return bitmap
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the containers."""
+        return sum(
+            len(c) if isinstance(c, bytearray) else c.itemsize * len(c)
+            for c in self._chunks.values()
+        )
+
+
+class IdSet:
+    """Set of source id strings, stored per prefix as IntBitmaps."""
+
+    def __init__(self, ids: Iterable[str] = ()):
+        self._ints: dict[str, IntBitmap] = {}
+        self._strings: set[str] = set()
+        for source_id in ids:
+            self.add(source_id)
+
+    def __contains__(self, source_id: str) -> bool:
+        split = split_id(source_id)
+        if split is None:
+            return source_id in self._strings
+        bitmap = self._ints.get(split[0])
+        return bitmap is not None and split[1] in bitmap
+
+    def add(self, source_id: str) -> bool:
+        """Add ``source_id``; True if it was not present yet."""
+        split = split_id(source_id)
+        if split is None:
+            if source_id in self._strings:
+                return False
+            self._strings.add(source_id)
+            return True
+        bitmap = self._ints.get(split[0])
+        if bitmap is None:
+            bitmap = self._ints[split[0]] = IntBitmap()
+        return bitmap.add(split[1])
+
+    def __len__(self) -> int:
+        return len(self._strings) + sum(len(b) for b in self._ints.values())
+
+    def __iter__(self) -> Iterator[str]:
+        for prefix, bitmap in self._ints.items():
+            for value in bitmap:
+                yield f"{prefix}{value}"
+        yield from self._strings
+
+    def dumps(self) -> bytes:
+        """Compact snapshot (run-length encoded ints, zlib-compressed)."""
+        doc = {
+            "ints": {p: b.runs() for p, b in self._ints.items()},
+            "strings": sorted(self._strings),
+        }
+        return zlib.compress(json.dumps(doc, separators=(",", ":")).encode(), 6)
+
+    @classmethod
+    def loads(cls, data: bytes) -> "IdSet":
+        doc = json.loads(zlib.decompress(data))
+        ids = cls()
+        ids._strings = set(doc["strings"])
+        for prefix, runs in doc["ints"].items():
+            bitmap = IntBitmap.from_runs(runs)
+            if prefix.endswith("_") and next(iter(bitmap), 0) >= 0:
+                ids._ints[prefix] = bitmap
+            else:
+                # Written when ids split at the last digit run: re-split
+                for value in bitmap:
+                    ids.add(f"{prefix}{value}")
+        return ids
+
+
+def split_id(source_id: str) -> Optional[tuple[str, int]]:
+    """``"boroumand_1234"`` → ``("boroumand_", 1234)``; None if not prefix+int.
+
+    The id is split at its last ``_`` and the whole rest must be a
+    canonical non-negative integer (ASCII digits, no sign, no leading
+    zeros), so the id is rebuilt exactly as ``f"{prefix}{value}"``. UUIDs,
+    slugs and names that merely end in digits stay strings.
+    """
+    head, sep, digits = source_id.rpartition("_")
+    if (
+        not sep
+        or not digits.isascii()
+        or not digits.isdigit()
+        or (digits[0] == "0" and len(digits) > 1)
+    ):
+        return None
+    return head + sep, int(digits)
+
+
+def _to_bitmap(chunk: array) -> bytearray:
+    bits = bytearray(1 << (CHUNK_BITS - 3))
+    for low in chunk:
+        bits[low >> 3] |= 1 << (low & 7)
+    return bits
@@ -0,0 +1,441 @@
+"""Lightweight run instrumentation — stage timings, counters, queue depths.
+
+Each source run gets a RunMetrics bound to a context variable, so code deep
+in the pipeline (HTTP layer, plugin parsers) can record into the metrics of
+whichever source task it is running in:
+
+    with stage("parse"):
+        entries = parse_browse_page(html)
+
+Wall time is exact. CPU time is process-wide, so for stages that ``await``
+(HTTP fetch, DB writes) it also includes other tasks running meanwhile.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Iterator, Optional
+
+from .files import atomic_write
+
+
+@dataclass
+class StageTiming:
+    """Accumulated timing for one pipeline stage."""
+
+    calls: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+
+
+@dataclass
+class GaugeStats:
+    """Sampled gauge (e.g. a queue depth): last, max and mean value."""
+
+    last: float = 0
+    max: float = 0
+    samples: int = 0
+    total: float = 0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.samples if self.samples else 0.0
+
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+@dataclass
+class Histogram:
+    """Fixed-bucket histogram; ``bounds`` are upper bounds (+Inf implied)."""
+
+    bounds: tuple[float, ...] = LATENCY_BUCKETS
+    counts: list[int] = field(default_factory=list)
+    count: int = 0
+    sum: float = 0.0
+
+    def __post_init__(self) -> None:
+        if not self.counts:
+            self.counts = [0] * (len(self.bounds) + 1)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding quantile ``q`` (inf if last)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds + (float("inf"),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        """(le, count) pairs as Prometheus expects them."""
+        out = []
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            out.append((f"{bound:g}", seen))
+        out.append(("+Inf", self.count))
+        return out
+
+
+@dataclass
+class HostStats:
+    """HTTP client activity against one host during a run."""
+
+    requests: int = 0
+    statuses: dict[str, int] = field(default_factory=dict)
+    bytes: int = 0
+    retries: int = 0
+    backoff_seconds: float = 0.0
+    wait_seconds: float = 0.0
+    cache: dict[str, int] = field(default_factory=dict)
+    latency: Histogram = field(default_factory=Histogram)
+
+    def response(self, status: Optional[int], latency: float) -> None:
+        """One request finished; ``status`` None = connection error."""
+        key = str(status) if status is not None else "error"
+        self.requests += 1
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+        self.latency.observe(latency)
+
+    def cache_event(self, event: str) -> None:
+        self.cache[event] = self.cache.get(event, 0) + 1
+
+    def report(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "statuses": dict(sorted(self.statuses.items())),
+            "bytes": self.bytes,
+            "retries": self.retries,
+            "backoff_seconds": round(self.backoff_seconds, 3),
+            "wait_seconds": round(self.wait_seconds, 3),
+            "cache": dict(sorted(self.cache.items())),
+            "latency": {
+                "mean": (
+                    round(self.latency.sum / self.latency.count, 4)
+                    if self.latency.count else 0.0
+                ),
+                "p50": self.latency.quantile(0.5),
+                "p90": self.latency.quantile(0.9),
+                "p99": self.latency.quantile(0.99),
+                "buckets": dict(self.latency.cumulative()),
+            },
+        }
+
+
+@dataclass
+class RunMetrics:
+    """Timings, counters and gauges for one source run (or shared setup)."""
+
+    source: str
+    started: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+    stages: dict[str, StageTiming] = field(default_factory=dict)
+    counters: dict[str, float] = field(default_factory=dict)
+    gauges: dict[str, GaugeStats] = field(default_factory=dict)
+    hosts: dict[str, HostStats] = field(default_factory=dict)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a block as stage ``name``."""
+        w0 = time.perf_counter()
+        c0 = time.process_time()
+        try:
+            yield
+        finally:
+            self.observe(
+                name, time.perf_counter() - w0, time.process_time() - c0
+            )
+
+    def observe(self, name: str, wall: float, cpu: float = 0.0) -> None:
+        """Add one timed call to stage ``name``."""
+        timing = self.stages.get(name)
+        if timing is None:
+            timing = self.stages[name] = StageTiming()
+        timing.calls += 1
+        timing.wall_seconds += wall
+        timing.cpu_seconds += cpu
+
+    def incr(self, name: str, n: float = 1) -> None:
+        """Increment counter ``name``."""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name: str, value: float) -> None:
+        """Record a sample of gauge ``name``."""
+        g = self.gauges.get(name)
+        if g is None:
+            g = self.gauges[name] = GaugeStats()
+        g.last = value
+        g.max = max(g.max, value)
+        g.samples += 1
+        g.total += value
+
+    def host(self, name: str) -> HostStats:
+        """HTTP stats for host ``name`` (created on first use)."""
+        hs = self.hosts.get(name)
+        if hs is None:
+            hs = self.hosts[name] = HostStats()
+        return hs
+
+    def finish(self) -> None:
+        if self.finished is None:
+            self.finished = time.time()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.time()) - self.started
+
+    def report(self, stats: Any = None) -> dict[str, Any]:
+        """Serializable summary, including RunStats counters if given."""
+        data: dict[str, Any] = {
+            "source": self.source,
+            "started_at": _iso(self.started),
+            "finished_at": _iso(self.finished) if self.finished else None,
+            "wall_seconds": round(self.elapsed, 3),
+            "stages": {
+                name: {
+                    "calls": t.calls,
+                    "wall_seconds": round(t.wall_seconds, 4),
+                    "cpu_seconds": round(t.cpu_seconds, 4),
+                }
+                for name, t in sorted(self.stages.items())
+            },
+            "counters": dict(sorted(self.counters.items())),
+            "gauges": {
+                name: {"last": g.last, "max": g.max, "mean": round(g.mean, 2)}
+                for name, g in sorted(self.gauges.items())
+            },
+        }
+        if self.hosts:
+            data["hosts"] = {
+                name: hs.report() for name, hs in sorted(self.hosts.items())
+            }
+        if stats is not None:
+            data["stats"] = asdict(stats)
+            processed = getattr(stats, "processed", 0)
+            data["records_per_second"] = (
+                round(processed / self.elapsed, 2) if self.elapsed > 0 else 0.0
+            )
+        return data
+
+
+_current: ContextVar[Optional[RunMetrics]] = ContextVar(
+    "enricher_metrics", default=None
+)
+
+
+def current_metrics() -> Optional[RunMetrics]:
+    """Metrics of the source run executing in this task, if any."""
+    return _current.get()
+
+
+@contextmanager
+def use_metrics(metrics: Optional[RunMetrics]) -> Iterator[Optional[RunMetrics]]:
+    """Make ``metrics`` current for this task (and tasks it spawns)."""
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block into the current run's metrics; no-op when unbound."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    with metrics.stage(name):
+        yield
+
+
+def incr(name: str, n: float = 1) -> None:
+    """Increment a counter on the current run's metrics, if bound."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.incr(name, n)
+
+
+def host_stats(host: str) -> Optional[HostStats]:
+    """HTTP stats for ``host`` in the current run, if bound."""
+    metrics = _current.get()
+    return metrics.host(host) if metrics is not None else None
+
+
+def write_run_report(
+    state_dir: str,
+    shared: RunMetrics,
+    sources: dict[str, tuple[RunMetrics, Any]],
+) -> str:
+    """Write the run report to ``state_dir/reports`` and return its path.
+
+    ``latest.json`` is overwritten on every run so regressions can be
+    diffed against the previous timestamped report.
+    """
+    shared.finish()
+    report = {
+        "started_at": _iso(shared.started),
+        "finished_at": _iso(shared.finished),
+        "wall_seconds": round(shared.elapsed, 3),
+        "shared": shared.report(),
+        "sources": {
+            name: metrics.report(stats)
+            for name, (metrics, stats) in sources.items()
+        },
+    }
+    reports_dir = os.path.join(state_dir, "reports")
+    os.makedirs(reports_dir, exist_ok=True)
+    stamp = datetime.fromtimestamp(shared.started, timezone.utc)
+    path = os.path.join(reports_dir, f"run-{stamp:%Y%m%dT%H%M%SZ}.json")
+    for target in (path, os.path.join(reports_dir, "latest.json")):
+        atomic_write(target, json.dumps(report, indent=2, ensure_ascii=False))
+    return path
+
+
+def write_prometheus_textfile(
+    path: str,
+    shared: RunMetrics,
+    sources: dict[str, tuple[RunMetrics, Any]],
+) -> None:
+    """Write metrics in Prometheus text format (node_exporter textfile)."""
+    families: dict[str, tuple[str, str, list[str]]] = {}
+
+    def add(
+        name: str, kind: str, help_: str, labels: dict, value: float,
+        suffix: str = "",
+    ) -> None:
+        fam = families.setdefault(name, (kind, help_, []))
+        label_str = ",".join(
+            f'{k}="{_escape_label(str(v))}"' for k, v in labels.items()
+        )
+        fam[2].append(f"{name}{suffix}{{{label_str}}} {value}")
+
+    runs = [(shared, None)] + list(sources.values())
+    for metrics, stats in runs:
+        src = metrics.source
+        add(
+            "enricher_run_duration_seconds", "gauge",
+            "Wall-clock duration of the last run.",
+            {"source": src}, round(metrics.elapsed, 3),
+        )
+        for name, t in metrics.stages.items():
+            labels = {"source": src, "stage": name}
+            add(
+                "enricher_stage_calls_total", "counter",
+                "Timed calls per pipeline stage.", labels, t.calls,
+            )
+            add(
+                "enricher_stage_wall_seconds_total", "counter",
+                "Wall-clock seconds per pipeline stage.",
+                labels, round(t.wall_seconds, 4),
+            )
+            add(
+                "enricher_stage_cpu_seconds_total", "counter",
+                "Process CPU seconds per pipeline stage.",
+                labels, round(t.cpu_seconds, 4),
+            )
+        for name, value in metrics.counters.items():
+            add(
+                "enricher_events_total", "counter",
+                "Pipeline event counters.",
+                {"source": src, "event": name}, value,
+            )
+        for name, g in metrics.gauges.items():
+            add(
+                "enricher_queue_depth_max", "gauge",
+                "Maximum observed queue depth.",
+                {"source": src, "queue": name}, g.max,
+            )
+        for host, hs in metrics.hosts.items():
+            labels = {"source": src, "host": host}
+            for status, n in hs.statuses.items():
+                add(
+                    "enricher_http_requests_total", "counter",
+                    "HTTP requests per host and status (error = no response).",
+                    {**labels, "status": status}, n,
+                )
+            for le, n in hs.latency.cumulative():
+                add(
+                    "enricher_http_request_duration_seconds", "histogram",
+                    "HTTP request latency per host.",
+                    {**labels, "le": le}, n, suffix="_bucket",
+                )
+            add(
+                "enricher_http_request_duration_seconds", "histogram", "",
+                labels, round(hs.latency.sum, 4), suffix="_sum",
+            )
+            add(
+                "enricher_http_request_duration_seconds", "histogram", "",
+                labels, hs.latency.count, suffix="_count",
+            )
+            add(
+                "enricher_http_response_bytes_total", "counter",
+                "Response body bytes received per host.", labels, hs.bytes,
+            )
+            add(
+                "enricher_http_retries_total", "counter",
+                "Retried HTTP requests per host.", labels, hs.retries,
+            )
+            add(
+                "enricher_http_backoff_seconds_total", "counter",
+                "Seconds slept in retry backoff per host.",
+                labels, round(hs.backoff_seconds, 3),
+            )
+            add(
+                "enricher_http_limiter_wait_seconds_total", "counter",
+                "Seconds spent waiting for the host's rate limiter.",
+                labels, round(hs.wait_seconds, 3),
+            )
+            for event, n in hs.cache.items():
+                add(
+                    "enricher_http_cache_total", "counter",
+                    "HTTP cache lookups per host and result.",
+                    {**labels, "result": event}, n,
+                )
+        if stats is not None:
+            for key, value in asdict(stats).items():
+                add(
+                    "enricher_records_total", "counter",
+                    "Records per outcome (RunStats).",
+                    {"source": src, "outcome": key}, value,
+                )
+            elapsed = metrics.elapsed
+            add(
+                "enricher_records_per_second", "gauge",
+                "Processed records per second over the run.",
+                {"source": src},
+                round(stats.processed / elapsed, 3) if elapsed > 0 else 0,
+            )
+
+    lines = []
+    for name, (kind, help_, samples) in families.items():
+        lines.append(f"# HELP {name} {help_}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples)
+    atomic_write(path, "\n".join(lines) + "\n")
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
@@ -0,0 +1,53 @@
+"""Optional process pool for CPU-bound page parsing (used by --offline)."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from .metrics import stage
+
+log = logging.getLogger("enricher.parsing")
+
+T = TypeVar("T")
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def start_pool(workers: Optional[int] = None) -> None:
+    """Parse in ``workers`` processes (default: CPU count) until shutdown.
+
+    Workers are started right away, before the run spawns any threads,
+    so forking them is safe.
+    """
+    global _pool
+    if _pool is not None:
+        return
+    workers = workers or os.cpu_count() or 1
+    _pool = ProcessPoolExecutor(max_workers=workers)
+    for future in [_pool.submit(int) for _ in range(workers)]:
+        future.result()
+    log.info(f"Parsing in {workers} worker processes")
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+async def parse(func: Callable[..., T], *args: Any) -> T:
+    """Run ``func(*args)`` as a "parse" stage, in the pool if one is running.
+
+    ``func`` must be a module-level function (it is pickled by reference).
+    Await several of these together to parse pages in parallel.
+    """
+    with stage("parse"):
+        if _pool is None:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_pool, func, *args)
@@ -0,0 +1,298 @@
+"""Run profiling — cProfile or stack sampling, plus tracemalloc snapshots.
+
+Both modes profile the thread running the event loop, so every task
+(fetching, parsing, the ``match()`` loop, DB flushes) shows up in one
+profile. Each run writes to ``state_dir/profiles/``:
+
+    <label>-<timestamp>.prof        pstats (``python -m pstats``, snakeviz)
+    <label>-<timestamp>.collapsed   collapsed stacks (flamegraph.pl, speedscope)
+
+cProfile is exact but slows the run down; sampling costs little and
+records the full stack, but its pstats file only has sample-based times
+and no call counts. With ``memory=True`` a tracemalloc snapshot is taken
+at each phase boundary (index load, end of every source).
+"""
+
+from __future__ import annotations
+
+import cProfile
+import logging
+import marshal
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+from types import FrameType
+from typing import Optional
+
+log = logging.getLogger("enricher.profiling")
+
+MODES = ("cprofile", "sampling")
+SAMPLE_INTERVAL = 0.005
+# Stack depth limit when unfolding cProfile's call graph into stacks
+MAX_DEPTH = 64
+
+# pstats function key: (filename, first line, function name)
+FuncKey = tuple[str, int, str]
+
+_active: Optional["Profiler"] = None
+
+
+class Profiler:
+    """Profile one enricher run and write the results to ``state_dir``."""
+
+    def __init__(
+        self,
+        mode: str,
+        state_dir: str,
+        label: str,
+        memory: bool = False,
+        interval: float = SAMPLE_INTERVAL,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.mode = mode
+        self.label = label
+        self.memory = memory
+        self.interval = interval
+        self.out_dir = os.path.join(state_dir, "profiles")
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        self.prefix = os.path.join(self.out_dir, f"{_safe(label)}-{stamp}")
+        self.paths: list[str] = []
+
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[_Sampler] = None
+        self._last_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._started_tracemalloc = False
+
+    def start(self) -> None:
+        """Start profiling the calling thread."""
+        global _active
+        os.makedirs(self.out_dir, exist_ok=True)
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            self._started_tracemalloc = True
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = _Sampler(threading.get_ident(), self.interval)
+            self._sampler.start()
+        _active = self
+        log.info(f"Profiling ({self.mode}) → {self.prefix}.*")
+
+    def stop(self) -> list[str]:
+        """Stop profiling, write all outputs and return their paths."""
+        global _active
+        if _active is self:
+            _active = None
+
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.create_stats()
+            stats = self._profile.stats
+            self._profile = None
+            self.paths.append(self._write_pstats(stats))
+            self.paths.append(
+                self._write_collapsed(collapse_pstats(stats), unit="µs")
+            )
+        if self._sampler is not None:
+            stacks = self._sampler.stop()
+            self._sampler = None
+            self.paths.append(
+                self._write_pstats(samples_to_pstats(stacks, self.interval))
+            )
+            self.paths.append(self._write_collapsed(
+                {_fold(s): n for s, n in stacks.items()}, unit="samples"
+            ))
+
+        if self.memory:
+            self.snapshot("end")
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+
+        for path in self.paths:
+            log.info(f"Profile written: {path}")
+        return self.paths
+
+    def snapshot(self, phase: str) -> Optional[str]:
+        """Take a tracemalloc snapshot labelled ``phase``.
+
+        Writes the raw snapshot (``tracemalloc.Snapshot.load``) and a text
+        summary of the top allocations and the growth since the previous
+        snapshot.
+        """
+        if not self.memory or not tracemalloc.is_tracing():
+            return None
+        snap = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        base = f"{self.prefix}-mem-{_safe(phase)}"
+        snap.dump(f"{base}.tracemalloc")
+
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [
+            f"phase: {phase}",
+            f"traced: {current / 1e6:.1f} MB (peak {peak / 1e6:.1f} MB)",
+            "",
+            "top allocations:",
+        ]
+        lines += [f"  {s}" for s in snap.statistics("lineno")[:25]]
+        if self._last_snapshot is not None:
+            lines += ["", "growth since previous snapshot:"]
+            lines += [
+                f"  {d}"
+                for d in snap.compare_to(self._last_snapshot, "lineno")[:25]
+            ]
+        with open(f"{base}.txt", "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+        self._last_snapshot = snap
+        self.paths.append(f"{base}.tracemalloc")
+        return f"{base}.tracemalloc"
+
+    def _write_pstats(self, stats: dict) -> str:
+        path = f"{self.prefix}.prof"
+        with open(path, "wb") as f:
+            marshal.dump(stats, f)
+        return path
+
+    def _write_collapsed(self, stacks: dict[str, float], unit: str) -> str:
+        path = f"{self.prefix}.collapsed"
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, value in sorted(stacks.items()):
+                if value >= 1:
+                    f.write(f"{stack} {int(value)}\n")
+        log.debug(f"{len(stacks)} stacks ({unit})")
+        return path
+
+
+def snapshot(phase: str) -> None:
+    """Take a tracemalloc snapshot on the active profiler; no-op otherwise."""
+    if _active is not None:
+        _active.snapshot(phase)
+
+
+# ─── Sampling ────────────────────────────────────────────────────────────────
+
+
+class _Sampler(threading.Thread):
+    """Samples one thread's stack every ``interval`` seconds."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="enricher-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[tuple[FuncKey, ...]] = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_stack(frame)] += 1
+
+    def stop(self) -> Counter[tuple[FuncKey, ...]]:
+        self._stop_event.set()
+        self.join()
+        return self.stacks
+
+
+def _stack(frame: Optional[FrameType]) -> tuple[FuncKey, ...]:
+    """Root-first stack of function keys for ``frame``."""
+    keys = []
+    while frame is not None:
+        code = frame.f_code
+        keys.append((code.co_filename, code.co_firstlineno, code.co_name))
+        frame = frame.f_back
+    keys.reverse()
+    return tuple(keys)
+
+
+def samples_to_pstats(
+    stacks: Counter[tuple[FuncKey, ...]], interval: float
+) -> dict:
+    """Build a pstats-compatible dict from stack samples.
+
+    Times are ``samples × interval``; call counts are sample counts.
+    """
+    own: Counter[FuncKey] = Counter()
+    total: Counter[FuncKey] = Counter()
+    edges: Counter[tuple[FuncKey, FuncKey]] = Counter()
+    for stack, n in stacks.items():
+        own[stack[-1]] += n
+        for func in set(stack):
+            total[func] += n
+        for edge in set(zip(stack, stack[1:])):
+            edges[edge] += n
+
+    callers: dict[FuncKey, dict] = {func: {} for func in total}
+    for (caller, callee), n in edges.items():
+        t = n * interval
+        callers[callee][caller] = (n, n, 0.0, t)
+
+    return {
+        func: (n, n, own[func] * interval, n * interval, callers[func])
+        for func, n in total.items()
+    }
+
+
+# ─── Collapsed stacks ────────────────────────────────────────────────────────
+
+
+def collapse_pstats(stats: dict) -> dict[str, float]:
+    """Unfold a cProfile call graph into collapsed stacks (µs of own time).
+
+    cProfile only records caller → callee edges, so a function's time is
+    split across its callers in proportion to each edge's cumulative time.
+    Recursive edges are cut.
+    """
+    children: dict[FuncKey, list[FuncKey]] = {}
+    roots = []
+    for func, (_, _, _, _, callers) in stats.items():
+        if not (callers.keys() - {func}):
+            roots.append(func)
+        for caller in callers:
+            children.setdefault(caller, []).append(func)
+
+    out: dict[str, float] = {}
+
+    def walk(func: FuncKey, path: list[FuncKey], scale: float) -> None:
+        _, _, tt, ct, _ = stats[func]
+        own = tt * scale * 1e6
+        if own >= 1:
+            key = _fold(path)
+            out[key] = out.get(key, 0) + own
+        if len(path) >= MAX_DEPTH:
+            return
+        for child in children.get(func, ()):
+            if child in path:
+                continue
+            child_ct = stats[child][3]
+            edge_ct = stats[child][4][func][3]
+            if child_ct <= 0 or edge_ct * scale * 1e6 < 1:
+                continue
+            walk(child, path + [child], scale * edge_ct / child_ct)
+
+    for root in roots:
+        walk(root, [root], 1.0)
+    return out
+
+
+def _fold(stack) -> str:
+    return ";".join(_frame_label(f) for f in stack)
+
+
+def _frame_label(func: FuncKey) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name  # builtins: "<built-in method ...>"
+    return f"{name} ({os.path.basename(filename)}:{line})".replace(";", ",")
+
+
+def _safe(label: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in label)
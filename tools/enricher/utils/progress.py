@@ -1,4 +1,20 @@
-"""JSON-based progress tracking with resume capability."""
+"""Progress tracking with resume capability.
+
+Processed ids are first *pending*: the orchestrator persists them together
+with the DB writes of a flush (see ``db.queries.save_progress``) and then
+calls ``commit()``. The files under ``state_dir/progress`` are a local
+mirror for ``status`` and for runs without a durable DB checkpoint:
+
+    <source>.json   small header — last run, stats, checkpoint, count
+    <source>.snap   compacted snapshot of processed ids (utils.idset)
+    <source>.ids    ids processed since the snapshot, one per line
+
+``save()`` appends only the ids marked since the previous save and
+rewrites the header, so a flush costs O(new ids) and ``status`` reads
+counts from the header alone. Once the log grows past COMPACT_AFTER
+lines (or after ``restore()``/``reset()``) it is folded into a new
+snapshot. In memory the ids are an IdSet: integer bitmaps per prefix.
+"""
 
 from __future__ import annotations
 
@@ -7,6 +23,11 @@ import os
 from datetime import datetime, timezone
 from typing import Any
 
+from .files import atomic_write
+from .idset import IdSet
+
+COMPACT_AFTER = 10_000  # log lines before they are folded into the snapshot
+
 
 class ProgressTracker:
     """Track processing progress per source for resume capability."""
@@ -14,46 +35,111 @@ class ProgressTracker:
     def __init__(self, source_name: str, state_dir: str):
         self.source_name = source_name
         self.file_path = os.path.join(state_dir, "progress", f"{source_name}.json")
-        self._data = self._load()
+        self.ids_path = os.path.join(state_dir, "progress", f"{source_name}.ids")
+        self.snap_path = os.path.join(state_dir, "progress", f"{source_name}.snap")
+        self._data = self._load_header()
+        self._processed = IdSet()
+        self._unsaved: list[str] = []
+        self._log_lines = 0
+        self._rewrite = False
+        self._load_ids()
+        self._pending: list[str] = []
 
-    def _load(self) -> dict[str, Any]:
+    def _load_header(self) -> dict[str, Any]:
         if os.path.exists(self.file_path):
             with open(self.file_path, "r", encoding="utf-8") as f:
                 return json.load(f)
         return {
             "source": self.source_name,
             "last_run": None,
-            "processed_ids": [],
+            "processed_count": 0,
             "stats": {},
             "checkpoint": {},
         }
 
+    def _load_ids(self) -> None:
+        legacy = self._data.pop("processed_ids", None)
+        if legacy is not None:
+            # Old single-file format: move the ids out on the next save
+            self._processed = IdSet(legacy)
+            self._rewrite = True
+            return
+        if os.path.exists(self.snap_path):
+            with open(self.snap_path, "rb") as f:
+                self._processed = IdSet.loads(f.read())
+        if not os.path.exists(self.ids_path):
+            return
+        with open(self.ids_path, "r", encoding="utf-8") as f:
+            lines = f.read().split("\n")
+        # The last element is "" after a complete write, or a line cut
+        # short by a crash mid-append — never trust it, and compact so
+        # the next append does not extend the broken line
+        for source_id in lines[:-1]:
+            if source_id:
+                self._processed.add(source_id)
+        self._log_lines = len(lines) - 1
+        self._rewrite = lines[-1] != ""
+
     def save(self, stats: Any = None) -> None:
-        """Save current progress to disk."""
+        """Append new ids and rewrite the (small) header."""
         self._data["last_run"] = datetime.now(timezone.utc).isoformat()
+        self._data["processed_count"] = len(self._processed)
         if stats:
-            self._data["stats"] = {
-                k: v for k, v in vars(stats).items() if isinstance(v, (int, float))
-            }
+            self._data["stats"] = stats_snapshot(stats)
         os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
-        with open(self.file_path, "w", encoding="utf-8") as f:
-            json.dump(self._data, f, indent=2, ensure_ascii=False)
+        if self._rewrite or self._log_lines + len(self._unsaved) > COMPACT_AFTER:
+            self._compact()
+        elif self._unsaved:
+            with open(self.ids_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{i}\n" for i in self._unsaved))
+            self._log_lines += len(self._unsaved)
+        self._unsaved = []
+        atomic_write(
+            self.file_path, json.dumps(self._data, indent=2, ensure_ascii=False)
+        )
+
+    def _compact(self) -> None:
+        """Replace snapshot + log with a fresh snapshot of all ids."""
+        # Empty the log first: a crash in between then forgets recent ids
+        # (they are re-processed) instead of resurrecting ids that
+        # restore() dropped
+        atomic_write(self.ids_path, "")
+        atomic_write(self.snap_path, self._processed.dumps())
+        self._log_lines = 0
+        self._rewrite = False
 
     def is_processed(self, source_id: str) -> bool:
         """Check if an entry has already been processed."""
-        return source_id in self._processed_set
+        return source_id in self._processed
+
+    def mark_processed(self, source_id: str) -> None:
+        """Mark an entry as processed (pending until the next commit)."""
+        if self._processed.add(source_id):
+            self._unsaved.append(source_id)
+            self._pending.append(source_id)
 
     @property
-    def _processed_set(self) -> set[str]:
-        if not hasattr(self, "_cached_set"):
-            self._cached_set = set(self._data.get("processed_ids", []))
-        return self._cached_set
+    def pending_ids(self) -> list[str]:
+        """Ids marked since the last commit, oldest first."""
+        return list(self._pending)
 
-    def mark_processed(self, source_id: str) -> None:
-        """Mark an entry as processed."""
-        if source_id not in self._processed_set:
-            self._processed_set.add(source_id)
-            self._data["processed_ids"].append(source_id)
+    @property
+    def checkpoint(self) -> dict[str, Any]:
+        """Copy of the current checkpoint values."""
+        return dict(self._data.get("checkpoint", {}))
+
+    def commit(self, ids: list[str]) -> None:
+        """Drop ``ids`` from pending_ids once they are durable."""
+        durable = set(ids)
+        self._pending = [i for i in self._pending if i not in durable]
+
+    def restore(self, processed_ids: list[str], checkpoint: dict[str, Any]) -> None:
+        """Replace state with a durable snapshot (e.g. loaded from the DB)."""
+        self._processed = IdSet(processed_ids)
+        self._data["checkpoint"] = dict(checkpoint)
+        self._pending = []
+        self._unsaved = []
+        self._rewrite = True
 
     def set_checkpoint(self, key: str, value: Any) -> None:
         """Save a checkpoint value (e.g. last page number)."""
@@ -69,11 +155,44 @@ class ProgressTracker:
 
     @property
     def processed_count(self) -> int:
-        return len(self._processed_set)
+        return len(self._processed)
 
     def reset(self) -> None:
         """Reset progress for a fresh run."""
-        self._data["processed_ids"] = []
-        self._data["checkpoint"] = {}
-        if hasattr(self, "_cached_set"):
-            del self._cached_set
+        self.restore([], {})
+
+
+class Watermark:
+    """Highest n such that every unit up to n is complete.
+
+    For units (e.g. browse pages) that finish out of order: checkpointing
+    ``value`` instead of the last finished unit means a resume never skips
+    a unit that was still in progress.
+    """
+
+    def __init__(self, done: int = 0):
+        self.value = done
+        self._ahead: set[int] = set()
+
+    def complete(self, n: int) -> int:
+        """Mark unit ``n`` complete; returns the new low watermark."""
+        if n > self.value:
+            self._ahead.add(n)
+        while self.value + 1 in self._ahead:
+            self.value += 1
+            self._ahead.remove(self.value)
+        return self.value
+
+
+def read_status(path: str) -> dict[str, Any]:
+    """Header of a progress file, without loading the processed ids."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if "processed_ids" in data:  # old single-file format
+        data["processed_count"] = len(data.pop("processed_ids"))
+    return data
+
+
+def stats_snapshot(stats: Any) -> dict[str, int | float]:
+    """Numeric fields of a RunStats, for JSON persistence."""
+    return {k: v for k, v in vars(stats).items() if isinstance(v, (int, float))}
@@ -0,0 +1,291 @@
+"""Per-host rate limiting — token bucket plus an adaptive in-flight window.
+
+One limiter exists per host and is shared by every session and source in
+the process, so politeness holds no matter how many tasks fetch from the
+same site. A request takes an in-flight slot, then a token; tokens refill
+at ``rate`` per second up to ``burst``. Cached responses never get here.
+
+The in-flight window and the token rate adapt per host (AIMD): every
+response with steady latency grows the window by ``1/window`` (so about
++1 per round trip of the whole window) and recovers the rate, while a
+429, a 5xx or a latency spike halves both. ``Retry-After`` pauses the
+host. The configured ``rate`` and ``max_in_flight`` are the ceilings.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Optional
+from urllib.parse import urlsplit
+
+from .metrics import host_stats, incr, stage
+
+# AIMD tuning
+DECREASE_FACTOR = 0.5
+MIN_RATE_SCALE = 0.05
+RATE_RECOVERY = 0.05  # rate scale regained per good response
+LATENCY_SPIKE = 3.0  # × baseline latency counts as congestion
+MAX_RETRY_AFTER = 600.0
+
+
+@dataclass(frozen=True)
+class HostLimit:
+    """Politeness policy (upper bounds) for one host."""
+
+    rate: float  # requests per second
+    burst: int = 1
+    max_in_flight: int = 4
+
+    def __post_init__(self):
+        # A rate of 0 would divide by zero in the token bucket
+        if not self.rate > 0:
+            raise ValueError(
+                f"requests_per_second must be > 0, got {self.rate}"
+            )
+        if self.burst < 1:
+            raise ValueError(f"burst must be >= 1, got {self.burst}")
+        if self.max_in_flight < 1:
+            raise ValueError(
+                f"max_in_flight must be >= 1, got {self.max_in_flight}"
+            )
+
+    @classmethod
+    def from_config(cls, config: dict, default: "HostLimit") -> "HostLimit":
+        """Override ``default`` from a source section in enricher.toml."""
+        return cls(
+            rate=float(config.get("requests_per_second", default.rate)),
+            burst=int(config.get("burst", default.burst)),
+            max_in_flight=int(config.get("max_in_flight", default.max_in_flight)),
+        )
+
+
+DEFAULT_LIMIT = HostLimit(rate=1.0)
+
+
+class AIMDController:
+    """Additive-increase / multiplicative-decrease of a host's window.
+
+    ``window`` is the allowed number of requests in flight, ``rate_scale``
+    the fraction of the configured rate currently used.
+    """
+
+    def __init__(self, max_window: int):
+        self.max_window = max_window
+        self.window = 1.0
+        self.rate_scale = 1.0
+        self.baseline: Optional[float] = None  # typical latency (seconds)
+        self.paused_until = 0.0
+        self._last_decrease = 0.0
+
+    def on_success(self, latency: float) -> None:
+        base = self.baseline
+        if base is not None and latency > LATENCY_SPIKE * base:
+            self._decrease()
+            return
+        # Baseline follows faster latencies quickly and slower ones slowly
+        if base is None:
+            self.baseline = latency
+        else:
+            alpha = 0.3 if latency < base else 0.02
+            self.baseline = base + alpha * (latency - base)
+        self.window = min(self.max_window, self.window + 1 / self.window)
+        self.rate_scale = min(1.0, self.rate_scale + RATE_RECOVERY)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        """429 / 5xx: back off, and pause the host for ``retry_after``."""
+        self._decrease()
+        if retry_after:
+            until = time.monotonic() + min(retry_after, MAX_RETRY_AFTER)
+            self.paused_until = max(self.paused_until, until)
+
+    def _decrease(self) -> None:
+        # Responses to requests sent before the last decrease reflect the
+        # old window; react at most once per round trip
+        now = time.monotonic()
+        if now - self._last_decrease < (self.baseline or 1.0):
+            return
+        self._last_decrease = now
+        self.window = max(1.0, self.window * DECREASE_FACTOR)
+        self.rate_scale = max(MIN_RATE_SCALE, self.rate_scale * DECREASE_FACTOR)
+
+
+class HostLimiter:
+    """Token bucket with an adaptive cap on concurrent requests.
+
+    Use as ``async with limiter.acquire() as slot:`` around one request
+    and report the outcome with ``slot.done(status, headers)``.
+    """
+
+    def __init__(self, host: str, limit: HostLimit):
+        self.host = host
+        self._tokens = float(limit.burst)
+        self._updated = time.monotonic()
+        self._in_flight = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.configure(limit)
+
+    def configure(self, limit: HostLimit) -> None:
+        """Apply a new policy (the adaptive state starts over)."""
+        self.limit = limit
+        self.control = AIMDController(limit.max_in_flight)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def window(self) -> int:
+        return int(self.control.window)
+
+    @property
+    def rate(self) -> float:
+        """Current token rate (requests per second)."""
+        return self.limit.rate * self.control.rate_scale
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator["Slot"]:
+        """Hold an in-flight slot and one token for the duration of a request."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._slot_freed = asyncio.Condition()
+        waited = time.monotonic()
+        with stage("rate_limit_wait"):
+            async with self._slot_freed:
+                await self._slot_freed.wait_for(
+                    lambda: self._in_flight < self.window
+                )
+                self._in_flight += 1
+            try:
+                await self._take_token()
+            except BaseException:
+                await self._release()
+                raise
+        hs = host_stats(self.host)
+        if hs is not None:
+            hs.wait_seconds += time.monotonic() - waited
+        slot = Slot(self)
+        try:
+            yield slot
+        except Exception:
+            slot.done(None)  # connection error / timeout
+            raise
+        finally:
+            await self._release()
+
+    async def _release(self) -> None:
+        async with self._slot_freed:
+            self._in_flight -= 1
+            self._slot_freed.notify_all()
+
+    def _feedback(self, status: Optional[int], latency: float, headers) -> None:
+        hs = host_stats(self.host)
+        if hs is not None:
+            hs.response(status, latency)
+        control = self.control
+        if status is None:
+            incr("http.connection_error")
+            control.on_throttle()
+        elif status == 429 or status >= 500:
+            incr("http.throttled" if status == 429 else "http.server_error")
+            control.on_throttle(parse_retry_after(headers))
+        else:
+            control.on_success(latency)
+        # Waiters re-check the (possibly grown) window when the slot is
+        # released right after this
+
+    async def _take_token(self) -> None:
+        # The lock keeps waiters in FIFO order instead of all waking at once
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                pause = self.control.paused_until - now
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                    continue
+                rate = self.rate
+                self._tokens = min(
+                    float(self.limit.burst),
+                    self._tokens + (now - self._updated) * rate,
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / rate)
+
+
+class Slot:
+    """One acquired request slot; reports the outcome to the controller."""
+
+    def __init__(self, limiter: HostLimiter):
+        self._limiter = limiter
+        self._started = time.monotonic()
+        self._reported = False
+
+    def done(self, status: Optional[int], headers=None) -> None:
+        """Report the response status (None = connection error)."""
+        if self._reported:
+            return
+        self._reported = True
+        self._limiter._feedback(
+            status, time.monotonic() - self._started, headers or {}
+        )
+
+
+def parse_retry_after(headers) -> Optional[float]:
+    """Seconds from a ``Retry-After`` header (delta-seconds or HTTP date)."""
+    value = headers.get("Retry-After") if headers else None
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+# ─── Registry ────────────────────────────────────────────────────────────────
+
+_limiters: dict[str, HostLimiter] = {}
+
+
+def host_of(url: str) -> str:
+    return (urlsplit(url).hostname or "").lower()
+
+
+def configure_host(host: str, limit: HostLimit) -> HostLimiter:
+    """Set the policy for ``host`` (creating its limiter if needed)."""
+    host = host.lower()
+    limiter = _limiters.get(host)
+    if limiter is None:
+        limiter = _limiters[host] = HostLimiter(host, limit)
+    elif limiter.limit != limit:
+        limiter.configure(limit)
+    return limiter
+
+
+def limiter_for(url: str) -> HostLimiter:
+    """Limiter for the URL's host; unknown hosts get DEFAULT_LIMIT."""
+    host = host_of(url)
+    limiter = _limiters.get(host)
+    if limiter is None:
+        limiter = _limiters[host] = HostLimiter(host, DEFAULT_LIMIT)
+    return limiter
+
+
+def get_limiter(host: str) -> Optional[HostLimiter]:
+    return _limiters.get(host.lower())
+
+
+def reset_limiters() -> None:
+    """Forget all limiters (tests, or a new event loop)."""
+    _limiters.clear()
@@ -0,0 +1,145 @@
+"""Incremental parsers for streamed downloads (see http.fetch_stream).
+
+Each takes an async iterator of decoded text chunks and yields records as
+soon as they are complete, so memory stays bounded by the largest record
+and the first record is available long before the download finishes.
+An exception from the chunks (e.g. http.StreamInterrupted) propagates
+before the unterminated last record is yielded.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+from typing import Any, AsyncIterator
+
+from .metrics import stage
+
+
+async def iter_lines(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Yield lines (with their ``\\n``) from text chunks."""
+    pending = ""
+    async for chunk in chunks:
+        lines = (pending + chunk).split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    if pending:
+        yield pending
+
+
+async def iter_csv_records(chunks: AsyncIterator[str]) -> AsyncIterator[list[str]]:
+    """Yield CSV records as field lists.
+
+    Lines are grouped into whole records first (a record ends on a line
+    where the running count of ``"`` is even, i.e. outside quotes), so
+    quoted fields with embedded newlines are never split across batches.
+    """
+    record: list[str] = []
+    quotes = 0
+    batch: list[str] = []
+    try:
+        async for line in iter_lines(chunks):
+            record.append(line)
+            quotes += line.count('"')
+            if quotes % 2 == 0:
+                batch.append("".join(record))
+                record = []
+                quotes = 0
+            if len(batch) >= 100:
+                rows = _parse_csv(batch)
+                batch = []
+                for row in rows:
+                    yield row
+    except Exception:
+        # Complete records before the failure still count; the partial
+        # one in ``record`` does not
+        for row in _parse_csv(batch):
+            yield row
+        raise
+    if record:
+        batch.append("".join(record))  # unterminated quote: let csv decide
+    for row in _parse_csv(batch):
+        yield row
+
+
+async def iter_csv_dicts(
+    chunks: AsyncIterator[str], restkey: Any = None, restval: Any = None
+) -> AsyncIterator[dict]:
+    """Like csv.DictReader: first record is the header, blank rows skipped.
+
+    Extra fields of a row are a list under ``restkey``; missing fields
+    are ``restval``.
+    """
+    fieldnames = None
+    async for row in iter_csv_records(chunks):
+        if not row:
+            continue
+        if fieldnames is None:
+            fieldnames = row
+            continue
+        record = dict(zip(fieldnames, row))
+        if len(row) > len(fieldnames):
+            record[restkey] = row[len(fieldnames):]
+        else:
+            for key in fieldnames[len(row):]:
+                record[key] = restval
+        yield record
+
+
+async def iter_json_array(chunks: AsyncIterator[str]) -> AsyncIterator[Any]:
+    """Yield the elements of a top-level JSON array one at a time."""
+    decoder = json.JSONDecoder()
+    it = chunks.__aiter__()
+    buf = ""
+    pos = 0
+    started = False
+    eof = False
+
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos == len(buf) or _may_be_truncated(buf[pos:], eof):
+            if eof:
+                raise ValueError("Truncated JSON array")
+            chunk = await anext(it, None)
+            if chunk is None:
+                eof = True
+            else:
+                buf, pos = buf[pos:] + chunk, 0
+            continue
+        if not started:
+            if buf[pos] != "[":
+                raise ValueError("Expected a JSON array")
+            started = True
+            pos += 1
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            with stage("parse"):
+                value, pos_end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Element continues in the next chunk
+            chunk = await anext(it, None)
+            if chunk is None:
+                eof = True
+            else:
+                buf, pos = buf[pos:] + chunk, 0
+            continue
+        pos = pos_end
+        yield value
+
+
+def _may_be_truncated(tail: str, eof: bool) -> bool:
+    """A bare number at the end of the buffer may continue in the next chunk."""
+    return not eof and tail.lstrip("-0123456789.eE+") == ""
+
+
+def _parse_csv(batch: list[str]) -> list[list[str]]:
+    if not batch:
+        return []
+    with stage("parse"):
+        return list(csv.reader(batch))